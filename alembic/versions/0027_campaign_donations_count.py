@@ -0,0 +1,47 @@
+"""campaigns.donations_count for incremental total maintenance
+
+Revision ID: 0027_campaign_donations_count
+Revises: 0026_task_activity_system
+"""
+
+from alembic import op
+
+revision = "0027_campaign_donations_count"
+down_revision = "0026_task_activity_system"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE campaigns
+        ADD COLUMN IF NOT EXISTS donations_count INTEGER NOT NULL DEFAULT 0;
+        """
+    )
+    # Backfill from donations so incremental updates start from the true totals.
+    op.execute(
+        """
+        UPDATE campaigns c
+        SET total_raised = (s.cents / 100.0)::numeric(12,2),
+            donations_count = s.cnt
+        FROM (
+          SELECT campaign_id, COALESCE(SUM(amount_cents), 0) AS cents, COUNT(*)::int AS cnt
+          FROM donations
+          WHERE status = 'succeeded'
+          GROUP BY campaign_id
+        ) s
+        WHERE s.campaign_id = c.id;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_campaigns_updated_at
+        ON campaigns(updated_at DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_campaigns_updated_at;")
+    op.execute("ALTER TABLE campaigns DROP COLUMN IF EXISTS donations_count;")
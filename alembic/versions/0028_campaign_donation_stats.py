@@ -0,0 +1,151 @@
+"""campaign_donation_stats rollup maintained by a donations trigger
+
+Revision ID: 0028_campaign_donation_stats
+Revises: 0027_campaign_donations_count
+"""
+
+from alembic import op
+
+revision = "0028_campaign_donation_stats"
+down_revision = "0027_campaign_donations_count"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS campaign_donation_stats (
+            campaign_id                  uuid PRIMARY KEY REFERENCES campaigns(id) ON DELETE CASCADE,
+            donations_count              INTEGER NOT NULL DEFAULT 0,
+            last_donation_at             timestamptz NULL,
+            gross_raised_cents           BIGINT NOT NULL DEFAULT 0,
+            stripe_fee_cents             BIGINT NOT NULL DEFAULT 0,
+            platform_fee_cents           BIGINT NOT NULL DEFAULT 0,
+            donor_covered_fee_cents      BIGINT NOT NULL DEFAULT 0,
+            platform_absorbed_fee_cents  BIGINT NOT NULL DEFAULT 0,
+            net_payout_cents             BIGINT NOT NULL DEFAULT 0,
+            updated_at                   timestamptz NOT NULL DEFAULT now()
+        );
+        """
+    )
+
+    # Succeeded donations add their amounts, leaving 'succeeded' (refund,
+    # dispute) or changing fees subtracts the old row first. Runs inside the
+    # statement that changed the donation, so the rollup commits with it.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION trg_donations_campaign_stats()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'succeeded' THEN
+                UPDATE campaign_donation_stats
+                SET donations_count = GREATEST(donations_count - 1, 0),
+                    gross_raised_cents = gross_raised_cents - COALESCE(OLD.amount_cents, 0),
+                    stripe_fee_cents = stripe_fee_cents - COALESCE(OLD.stripe_processing_fee_cents, 0),
+                    platform_fee_cents = platform_fee_cents - COALESCE(OLD.platform_fee_cents, 0),
+                    donor_covered_fee_cents = donor_covered_fee_cents - COALESCE(OLD.donor_fee_cents, 0),
+                    platform_absorbed_fee_cents = platform_absorbed_fee_cents - COALESCE(OLD.platform_absorbed_fee_cents, 0),
+                    net_payout_cents = net_payout_cents - COALESCE(OLD.net_to_org_cents, 0),
+                    updated_at = now()
+                WHERE campaign_id = OLD.campaign_id;
+            END IF;
+
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'succeeded'
+               AND NEW.campaign_id IS NOT NULL THEN
+                INSERT INTO campaign_donation_stats AS s (
+                    campaign_id, donations_count, last_donation_at,
+                    gross_raised_cents, stripe_fee_cents, platform_fee_cents,
+                    donor_covered_fee_cents, platform_absorbed_fee_cents, net_payout_cents
+                )
+                VALUES (
+                    NEW.campaign_id, 1, NEW.created_at,
+                    COALESCE(NEW.amount_cents, 0),
+                    COALESCE(NEW.stripe_processing_fee_cents, 0),
+                    COALESCE(NEW.platform_fee_cents, 0),
+                    COALESCE(NEW.donor_fee_cents, 0),
+                    COALESCE(NEW.platform_absorbed_fee_cents, 0),
+                    COALESCE(NEW.net_to_org_cents, 0)
+                )
+                ON CONFLICT (campaign_id) DO UPDATE
+                SET donations_count = s.donations_count + 1,
+                    last_donation_at = GREATEST(s.last_donation_at, EXCLUDED.last_donation_at),
+                    gross_raised_cents = s.gross_raised_cents + EXCLUDED.gross_raised_cents,
+                    stripe_fee_cents = s.stripe_fee_cents + EXCLUDED.stripe_fee_cents,
+                    platform_fee_cents = s.platform_fee_cents + EXCLUDED.platform_fee_cents,
+                    donor_covered_fee_cents = s.donor_covered_fee_cents + EXCLUDED.donor_covered_fee_cents,
+                    platform_absorbed_fee_cents = s.platform_absorbed_fee_cents + EXCLUDED.platform_absorbed_fee_cents,
+                    net_payout_cents = s.net_payout_cents + EXCLUDED.net_payout_cents,
+                    updated_at = now();
+            END IF;
+
+            -- The newest succeeded donation left the set: look up the next one.
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'succeeded'
+               AND (TG_OP = 'DELETE'
+                    OR NEW.status <> 'succeeded'
+                    OR NEW.campaign_id IS DISTINCT FROM OLD.campaign_id) THEN
+                UPDATE campaign_donation_stats
+                SET last_donation_at = (
+                    SELECT MAX(created_at) FROM donations
+                    WHERE campaign_id = OLD.campaign_id AND status = 'succeeded'
+                )
+                WHERE campaign_id = OLD.campaign_id
+                  AND last_donation_at <= OLD.created_at;
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_donations_campaign_stats ON donations;
+        CREATE TRIGGER trg_donations_campaign_stats
+        AFTER INSERT OR DELETE OR UPDATE OF
+            status, campaign_id, amount_cents, stripe_processing_fee_cents,
+            platform_fee_cents, donor_fee_cents, platform_absorbed_fee_cents,
+            net_to_org_cents
+        ON donations
+        FOR EACH ROW EXECUTE FUNCTION trg_donations_campaign_stats();
+        """
+    )
+
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_succeeded
+        ON donations(campaign_id, created_at DESC)
+        WHERE status = 'succeeded';
+        """
+    )
+
+    op.execute(
+        """
+        INSERT INTO campaign_donation_stats (
+            campaign_id, donations_count, last_donation_at,
+            gross_raised_cents, stripe_fee_cents, platform_fee_cents,
+            donor_covered_fee_cents, platform_absorbed_fee_cents, net_payout_cents
+        )
+        SELECT campaign_id,
+               COUNT(*)::int,
+               MAX(created_at),
+               COALESCE(SUM(amount_cents), 0),
+               COALESCE(SUM(stripe_processing_fee_cents), 0),
+               COALESCE(SUM(platform_fee_cents), 0),
+               COALESCE(SUM(donor_fee_cents), 0),
+               COALESCE(SUM(platform_absorbed_fee_cents), 0),
+               COALESCE(SUM(net_to_org_cents), 0)
+        FROM donations
+        WHERE status = 'succeeded' AND campaign_id IS NOT NULL
+        GROUP BY campaign_id
+        ON CONFLICT (campaign_id) DO NOTHING;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_donations_campaign_stats ON donations;")
+    op.execute("DROP FUNCTION IF EXISTS trg_donations_campaign_stats();")
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_succeeded;")
+    op.execute("DROP TABLE IF EXISTS campaign_donation_stats;")
@@ -0,0 +1,76 @@
+"""stripe_events processing state for async webhook ingestion
+
+Revision ID: 0029_stripe_events_queue
+Revises: 0028_campaign_donation_stats
+"""
+
+from alembic import op
+
+revision = "0029_stripe_events_queue"
+down_revision = "0028_campaign_donation_stats"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows (and the synchronous webhook path) are already processed.
+    op.execute(
+        """
+        ALTER TABLE stripe_events
+        ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'processed',
+        ADD COLUMN IF NOT EXISTS ordering_key TEXT NULL,
+        ADD COLUMN IF NOT EXISTS event_created_at timestamptz NULL,
+        ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS next_attempt_at timestamptz NULL,
+        ADD COLUMN IF NOT EXISTS last_error TEXT NULL,
+        ADD COLUMN IF NOT EXISTS processed_at timestamptz NULL;
+        """
+    )
+    op.execute(
+        """
+        DO $$
+        BEGIN
+          IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint WHERE conname = 'stripe_events_status_check'
+          ) THEN
+            ALTER TABLE stripe_events
+            ADD CONSTRAINT stripe_events_status_check
+            CHECK (status IN ('pending', 'processed', 'dead'));
+          END IF;
+        END$$;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_stripe_events_pending
+        ON stripe_events(ordering_key, event_created_at, created_at)
+        WHERE status = 'pending';
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_stripe_events_dead
+        ON stripe_events(created_at DESC)
+        WHERE status = 'dead';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_stripe_events_dead;")
+    op.execute("DROP INDEX IF EXISTS ix_stripe_events_pending;")
+    op.execute(
+        "ALTER TABLE stripe_events DROP CONSTRAINT IF EXISTS stripe_events_status_check;"
+    )
+    op.execute(
+        """
+        ALTER TABLE stripe_events
+        DROP COLUMN IF EXISTS processed_at,
+        DROP COLUMN IF EXISTS last_error,
+        DROP COLUMN IF EXISTS next_attempt_at,
+        DROP COLUMN IF EXISTS attempts,
+        DROP COLUMN IF EXISTS event_created_at,
+        DROP COLUMN IF EXISTS ordering_key,
+        DROP COLUMN IF EXISTS status;
+        """
+    )
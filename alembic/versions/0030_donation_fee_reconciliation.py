@@ -0,0 +1,53 @@
+"""donations.stripe_fee_reconciled_at/_checked_at for deferred Stripe fee reconciliation
+
+Revision ID: 0030_donation_fee_reconciliation
+Revises: 0029_stripe_events_queue
+"""
+
+from alembic import op
+
+revision = "0030_donation_fee_reconciliation"
+down_revision = "0029_stripe_events_queue"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL = stripe_processing_fee_cents is still the webhook-time estimate.
+    op.execute(
+        """
+        ALTER TABLE donations
+        ADD COLUMN IF NOT EXISTS stripe_fee_reconciled_at timestamptz NULL;
+        """
+    )
+    # Balance transactions created before this were already searched for the
+    # donation without a match, so the next reconciliation run starts here.
+    op.execute(
+        """
+        ALTER TABLE donations
+        ADD COLUMN IF NOT EXISTS stripe_fee_checked_at timestamptz NULL;
+        """
+    )
+    # Rows that already carry a balance transaction id used the actual fee.
+    op.execute(
+        """
+        UPDATE donations
+        SET stripe_fee_reconciled_at = updated_at
+        WHERE stripe_balance_transaction_id IS NOT NULL
+          AND stripe_processing_fee_cents > 0
+          AND stripe_fee_reconciled_at IS NULL;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_fee_unreconciled
+        ON donations(created_at)
+        WHERE status = 'succeeded' AND stripe_fee_reconciled_at IS NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_donations_fee_unreconciled;")
+    op.execute("ALTER TABLE donations DROP COLUMN IF EXISTS stripe_fee_checked_at;")
+    op.execute("ALTER TABLE donations DROP COLUMN IF EXISTS stripe_fee_reconciled_at;")
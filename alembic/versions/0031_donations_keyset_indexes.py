@@ -0,0 +1,56 @@
+"""(campaign_id, sort key, id) indexes for keyset pagination of donations
+
+Revision ID: 0031_donations_keyset_indexes
+Revises: 0030_donation_fee_reconciliation
+"""
+
+from alembic import op
+
+revision = "0031_donations_keyset_indexes"
+down_revision = "0030_donation_fee_reconciliation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Each matches an ORDER BY of list_donations_paginated, so a page is an
+    # index range scan starting at the cursor whatever its depth.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_created_id
+        ON donations(campaign_id, created_at, id);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_amount_id
+        ON donations(campaign_id, amount_cents, id);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_email_id
+        ON donations(campaign_id, (COALESCE(donor_email, '')), id);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_status_id
+        ON donations(campaign_id, status, id);
+        """
+    )
+    # Superseded by idx_donations_campaign_created_id.
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign;")
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign
+        ON donations(campaign_id, created_at);
+        """
+    )
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_status_id;")
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_email_id;")
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_amount_id;")
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_created_id;")
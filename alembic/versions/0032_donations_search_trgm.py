@@ -0,0 +1,35 @@
+"""pg_trgm indexes for donor email / message search
+
+Revision ID: 0032_donations_search_trgm
+Revises: 0031_donations_keyset_indexes
+"""
+
+from alembic import op
+
+revision = "0032_donations_search_trgm"
+down_revision = "0031_donations_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    # Expressions must match _SEARCH_MATCH / _RELEVANCE_SQL in
+    # app/models/donation.py for the planner to use these indexes.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_email_trgm
+        ON donations USING gin (lower(COALESCE(donor_email::text, '')) gin_trgm_ops);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_message_trgm
+        ON donations USING gin (COALESCE(message, '') gin_trgm_ops);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_donations_message_trgm;")
+    op.execute("DROP INDEX IF EXISTS idx_donations_email_trgm;")
@@ -0,0 +1,107 @@
+"""donation_exports jobs and a per-campaign donations rows_version
+
+Revision ID: 0033_donation_exports
+Revises: 0032_donations_search_trgm
+"""
+
+from alembic import op
+
+revision = "0033_donation_exports"
+down_revision = "0032_donations_search_trgm"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Bumped whenever a succeeded donation (the rows exports contain)
+    # appears, changes or goes away, so an export artifact stamped with the
+    # version can be reused until then. Pending checkout rows never touch
+    # the stats row, so creating them does not queue behind it.
+    op.execute(
+        """
+        ALTER TABLE campaign_donation_stats
+        ADD COLUMN IF NOT EXISTS rows_version BIGINT NOT NULL DEFAULT 0;
+        """
+    )
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION trg_donations_rows_version()
+        RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'succeeded'
+               AND NEW.campaign_id IS NOT NULL THEN
+                INSERT INTO campaign_donation_stats AS s (campaign_id, rows_version)
+                VALUES (NEW.campaign_id, 1)
+                ON CONFLICT (campaign_id) DO UPDATE
+                SET rows_version = s.rows_version + 1;
+            END IF;
+            IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.status = 'succeeded'
+               AND (TG_OP = 'DELETE'
+                    OR NEW.status IS DISTINCT FROM 'succeeded'
+                    OR OLD.campaign_id IS DISTINCT FROM NEW.campaign_id) THEN
+                UPDATE campaign_donation_stats
+                SET rows_version = rows_version + 1
+                WHERE campaign_id = OLD.campaign_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+    op.execute(
+        """
+        DROP TRIGGER IF EXISTS trg_donations_rows_version_ins ON donations;
+        DROP TRIGGER IF EXISTS trg_donations_rows_version ON donations;
+        CREATE TRIGGER trg_donations_rows_version_ins
+        AFTER INSERT ON donations
+        FOR EACH ROW WHEN (NEW.status = 'succeeded')
+        EXECUTE FUNCTION trg_donations_rows_version();
+        CREATE TRIGGER trg_donations_rows_version
+        AFTER DELETE OR UPDATE OF
+            campaign_id, amount_cents, currency, donor_email, status, fee_option,
+            stripe_processing_fee_cents, platform_fee_cents, donor_fee_cents,
+            platform_absorbed_fee_cents, net_to_org_cents
+        ON donations
+        FOR EACH ROW EXECUTE FUNCTION trg_donations_rows_version();
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS donation_exports (
+            id                    uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+            campaign_id           uuid NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+            requested_by_user_id  uuid NULL,
+            format                TEXT NOT NULL CHECK (format IN ('csv', 'parquet')),
+            status                TEXT NOT NULL DEFAULT 'queued'
+                                  CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+            rows_version          BIGINT NOT NULL,
+            rows_total            INTEGER NULL,
+            rows_written          INTEGER NOT NULL DEFAULT 0,
+            progress_percent      INTEGER NOT NULL DEFAULT 0,
+            s3_key                TEXT NULL,
+            size_bytes            BIGINT NULL,
+            error_message         TEXT NULL,
+            created_at            timestamptz NOT NULL DEFAULT now(),
+            updated_at            timestamptz NOT NULL DEFAULT now(),
+            completed_at          timestamptz NULL
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donation_exports_reuse
+        ON donation_exports(campaign_id, format, rows_version)
+        WHERE status <> 'failed';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS donation_exports;")
+    op.execute("DROP TRIGGER IF EXISTS trg_donations_rows_version_ins ON donations;")
+    op.execute("DROP TRIGGER IF EXISTS trg_donations_rows_version ON donations;")
+    op.execute("DROP FUNCTION IF EXISTS trg_donations_rows_version();")
+    op.execute(
+        "ALTER TABLE campaign_donation_stats DROP COLUMN IF EXISTS rows_version;"
+    )
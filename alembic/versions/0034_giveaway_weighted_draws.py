@@ -0,0 +1,53 @@
+"""giveaway_logs: weighting parameters and multi-winner draws
+
+Revision ID: 0034_giveaway_weighted_draws
+Revises: 0033_donation_exports
+"""
+
+from alembic import op
+
+revision = "0034_giveaway_weighted_draws"
+down_revision = "0033_donation_exports"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per winner; rows of the same draw share draw_id and are
+    # ordered by winner_rank. The parameters are recorded so the population
+    # hash can be recomputed later.
+    op.execute(
+        """
+        ALTER TABLE giveaway_logs
+            ADD COLUMN IF NOT EXISTS draw_id uuid NULL,
+            ADD COLUMN IF NOT EXISTS winner_rank INTEGER NOT NULL DEFAULT 1,
+            ADD COLUMN IF NOT EXISTS weighting TEXT NOT NULL DEFAULT 'uniform',
+            ADD COLUMN IF NOT EXISTS min_amount_cents INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS cents_per_entry INTEGER NULL,
+            ADD COLUMN IF NOT EXISTS max_entries INTEGER NULL,
+            ADD COLUMN IF NOT EXISTS total_entries BIGINT NULL;
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_giveaway_draw
+        ON giveaway_logs (draw_id, winner_rank)
+        WHERE draw_id IS NOT NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_giveaway_draw;")
+    op.execute(
+        """
+        ALTER TABLE giveaway_logs
+            DROP COLUMN IF EXISTS total_entries,
+            DROP COLUMN IF EXISTS max_entries,
+            DROP COLUMN IF EXISTS cents_per_entry,
+            DROP COLUMN IF EXISTS min_amount_cents,
+            DROP COLUMN IF EXISTS weighting,
+            DROP COLUMN IF EXISTS winner_rank,
+            DROP COLUMN IF EXISTS draw_id;
+        """
+    )
@@ -0,0 +1,63 @@
+"""giveaway seed commitments and draw population snapshots for verification
+
+Revision ID: 0035_giveaway_draw_commitments
+Revises: 0034_giveaway_weighted_draws
+"""
+
+from alembic import op
+
+revision = "0035_giveaway_draw_commitments"
+down_revision = "0034_giveaway_weighted_draws"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A commitment fixes a secret seed and the population cutoff before the
+    # draw: seed_sha256 and population_cutoff are published at once, the seed
+    # only once draw_id is set.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS giveaway_commitments (
+            id                  uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+            org_id              uuid NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+            campaign_id         uuid NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+            created_by_user_id  uuid NOT NULL REFERENCES users(id),
+            seed_hex            TEXT NOT NULL,
+            seed_sha256         TEXT NOT NULL,
+            population_cutoff   timestamptz NOT NULL DEFAULT now(),
+            draw_id             uuid NULL UNIQUE,
+            created_at          timestamptz NOT NULL DEFAULT now(),
+            used_at             timestamptz NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_giveaway_commitments_campaign
+            ON giveaway_commitments(campaign_id, created_at DESC);
+        """
+    )
+    # The seed drives a deterministic RNG, so with the population (donations
+    # up to population_cutoff) a draw can be replayed. Rows from before this
+    # migration stay NULL (not replayable); commitment_id is NULL for draws
+    # made without a prior commitment.
+    op.execute(
+        """
+        ALTER TABLE giveaway_logs
+            ADD COLUMN IF NOT EXISTS draw_algorithm TEXT NULL,
+            ADD COLUMN IF NOT EXISTS seed_hex TEXT NULL,
+            ADD COLUMN IF NOT EXISTS commitment_id uuid NULL
+                REFERENCES giveaway_commitments(id) ON DELETE SET NULL,
+            ADD COLUMN IF NOT EXISTS population_cutoff timestamptz NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE giveaway_logs
+            DROP COLUMN IF EXISTS population_cutoff,
+            DROP COLUMN IF EXISTS commitment_id,
+            DROP COLUMN IF EXISTS seed_hex,
+            DROP COLUMN IF EXISTS draw_algorithm;
+        """
+    )
+    op.execute("DROP TABLE IF EXISTS giveaway_commitments;")
@@ -0,0 +1,51 @@
+"""campaign_update_sends: checkpointed chunks of update notification fan-out
+
+Revision ID: 0036_campaign_update_sends
+Revises: 0035_giveaway_draw_commitments
+"""
+
+from alembic import op
+
+revision = "0036_campaign_update_sends"
+down_revision = "0035_giveaway_draw_commitments"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One row per chunk of donor emails: those after after_email (NULL for
+    # the first chunk) up to and including last_email, in LOWER(donor_email)
+    # order. last_sent_email is the checkpoint a retried chunk resumes after.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS campaign_update_sends (
+            update_id        uuid NOT NULL REFERENCES campaign_updates(id) ON DELETE CASCADE,
+            chunk_index      INTEGER NOT NULL,
+            after_email      TEXT NULL,
+            last_email       TEXT NOT NULL,
+            recipients       INTEGER NOT NULL,
+            status           TEXT NOT NULL DEFAULT 'queued'
+                             CHECK (status IN ('queued', 'sending', 'done')),
+            last_sent_email  TEXT NULL,
+            sent_count       INTEGER NOT NULL DEFAULT 0,
+            failed_count     INTEGER NOT NULL DEFAULT 0,
+            last_error       TEXT NULL,
+            created_at       timestamptz NOT NULL DEFAULT now(),
+            updated_at       timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (update_id, chunk_index)
+        );
+        """
+    )
+    # Distinct donor emails of a campaign in order, for planning and chunks.
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_donations_campaign_donor_email
+        ON donations(campaign_id, (LOWER(donor_email::text)))
+        WHERE status = 'succeeded' AND donor_email IS NOT NULL;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_donations_campaign_donor_email;")
+    op.execute("DROP TABLE IF EXISTS campaign_update_sends;")
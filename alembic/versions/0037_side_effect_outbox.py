@@ -0,0 +1,52 @@
+"""outbox_events: side effects recorded in the same transaction as a change
+
+Revision ID: 0037_side_effect_outbox
+Revises: 0036_campaign_update_sends
+"""
+
+from alembic import op
+
+revision = "0037_side_effect_outbox"
+down_revision = "0036_campaign_update_sends"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A pending row is due at next_attempt_at; claiming it pushes
+    # next_attempt_at forward by a lease, so a dispatcher that dies mid-batch
+    # leaves its rows to be claimed again once the lease runs out.
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS outbox_events (
+            id               BIGSERIAL PRIMARY KEY,
+            kind             TEXT NOT NULL,
+            payload          JSONB NOT NULL DEFAULT '{}'::jsonb,
+            status           TEXT NOT NULL DEFAULT 'pending'
+                             CHECK (status IN ('pending', 'done', 'dead')),
+            attempts         INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at  timestamptz NOT NULL DEFAULT now(),
+            last_error       TEXT NULL,
+            created_at       timestamptz NOT NULL DEFAULT now(),
+            processed_at     timestamptz NULL
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_outbox_events_due
+        ON outbox_events(next_attempt_at, id)
+        WHERE status = 'pending';
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_outbox_events_processed
+        ON outbox_events(processed_at)
+        WHERE status = 'done';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS outbox_events;")
@@ -97,11 +97,12 @@ def create_app():
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=30)
     JWTManager(app)
 
-    # Rate limiting middleware (in-memory; see app.utils.rate_limit)
+    # Rate limiting middleware (Redis, in-memory fallback; see app.utils.rate_limit)
     from app.utils.rate_limit import (
         rate_limit_key,
-        is_rate_limited,
+        check_rate_limit,
         rate_limit_exceeded_response,
+        rate_limit_headers,
     )
 
     default_limit = int(os.getenv("RATE_LIMIT_PER_MINUTE", "200"))
@@ -111,6 +112,25 @@ def create_app():
         g.request_started_at = time.time()
         g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
 
+    if os.getenv("DB_REQUEST_UNIT_OF_WORK", "0") == "1":
+        # One connection + one transaction per request (see app.utils.db.unit_of_work).
+        from app.utils.db import begin_unit_of_work, end_unit_of_work
+
+        @app.before_request
+        def _db_unit_of_work_begin():
+            g.db_unit_of_work = begin_unit_of_work()
+
+        @app.after_request
+        def _db_unit_of_work_commit(response):
+            handle = g.pop("db_unit_of_work", None)
+            end_unit_of_work(handle, commit=response.status_code < 500)
+            return response
+
+        @app.teardown_request
+        def _db_unit_of_work_cleanup(_exc):
+            handle = g.pop("db_unit_of_work", None)
+            end_unit_of_work(handle, commit=False)
+
     @app.before_request
     def _rate_limit():
         if os.getenv("RATE_LIMIT_ENABLED", "1") != "1" or default_limit <= 0:
@@ -118,9 +138,11 @@ def create_app():
         if request.path == "/webhooks/stripe":
             return  # exempt Stripe webhooks
         key = f"global:{rate_limit_key()}"
-        if is_rate_limited(key, default_limit):
+        result = check_rate_limit(key, default_limit)
+        if result.limited:
             RATE_LIMIT_HITS.labels(path=request.path).inc()
-            return rate_limit_exceeded_response(default_limit)
+            return rate_limit_exceeded_response(default_limit, result)
+        g.rate_limit = result
 
     @app.after_request
     def _request_end(response):
@@ -134,6 +156,10 @@ def create_app():
             method=request.method, path=request.path, status=str(response.status_code)
         ).inc()
         response.headers["X-Request-ID"] = getattr(g, "request_id", "")
+        rate_limit = getattr(g, "rate_limit", None)
+        if rate_limit is not None:
+            for name, value in rate_limit_headers(rate_limit).items():
+                response.headers.setdefault(name, value)
 
         # Security headers
         response.headers.setdefault("X-Frame-Options", "DENY")
@@ -233,5 +259,38 @@ def create_app():
             )
         _logger.info("================")
 
+    if os.getenv("SCHEDULE_PERIODIC_JOBS", "1") == "1":
+        try:
+            from app.tasks import schedule_periodic_jobs
+
+            schedule_periodic_jobs()
+        except Exception as e:
+            _logger.warning("periodic job scheduling skipped: %s", e)
+
+    try:
+        from app.utils.local_cache import start_invalidation_listener
+
+        start_invalidation_listener()
+    except Exception as e:
+        _logger.warning("l1 cache invalidation listener not started: %s", e)
+
+    try:
+        from app.services.outbox_service import start_outbox_dispatcher
+
+        start_outbox_dispatcher()
+    except Exception as e:
+        _logger.warning("outbox dispatcher not started: %s", e)
+
+    try:
+        from app.realtime.aggregator import donation_broadcasts
+
+        donation_broadcasts.start()
+    except Exception as e:
+        _logger.warning("donation broadcast flusher not started: %s", e)
+
+    from app.realtime.presence import presence
+
+    presence.start()
+
     init_socketio(app)
     return app
@@ -1,4 +1,5 @@
-from app.utils.db import get_db_connection
+from app.utils.db import after_commit, get_db_connection
+from app.utils.public_resolver import invalidate_campaign_slug
 from typing import Any
 from app.utils.slug import slugify, slugify_with_fallback
 
@@ -138,6 +139,8 @@ def create_campaign(
         )
         row = cur.fetchone()
         conn.commit()
+        # The slug may be cached as unknown from an earlier lookup.
+        after_commit(lambda: invalidate_campaign_slug(org_id, slug))
         cols = [
             "id",
             "org_id",
@@ -362,11 +365,20 @@ def update_campaign(
     sql = f"UPDATE campaigns SET {', '.join(sets)} WHERE id = %s RETURNING id, org_id, title, slug, goal, status, custom_domain, total_raised, fee_option, fee_policy_version, platform_fee_cents, platform_fee_percent, platform_fee_recorded_at, giveaway_prize_cents, page_layout, ai_site_recipe, created_at, updated_at"
     params.append(campaign_id)
     with get_db_connection() as conn, conn.cursor() as cur:
+        previous = None
+        if slug is not None:
+            cur.execute(
+                "SELECT org_id, slug FROM campaigns WHERE id = %s", (campaign_id,)
+            )
+            previous = cur.fetchone()
         cur.execute(sql, tuple(params))
         row = cur.fetchone()
         conn.commit()
         if not row:
             return None
+        if previous and previous[1] != row[3]:
+            after_commit(lambda: invalidate_campaign_slug(previous[0], previous[1]))
+            after_commit(lambda: invalidate_campaign_slug(row[1], row[3]))
         cols = [
             "id",
             "org_id",
@@ -395,32 +407,136 @@ def update_campaign(
 
 def delete_campaign(campaign_id: str) -> bool:
     with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute("DELETE FROM campaigns WHERE id = %s", (campaign_id,))
+        cur.execute(
+            "DELETE FROM campaigns WHERE id = %s RETURNING org_id, slug",
+            (campaign_id,),
+        )
+        row = cur.fetchone()
         conn.commit()
-        return cur.rowcount > 0
+    if not row:
+        return False
+    from app.utils.public_campaign_cache import invalidate_public_campaign_cache
 
+    after_commit(lambda: invalidate_campaign_slug(row[0], row[1]))
+    after_commit(lambda: invalidate_public_campaign_cache(campaign_id))
+    return True
 
-def recompute_total_raised(campaign_id: str) -> dict[str, Any]:
+
+def _succeeded_delta(previous_status: str | None, new_status: str | None) -> int:
+    """+1 when a donation enters 'succeeded', -1 when it leaves it, else 0."""
+    was = (previous_status or "") == "succeeded"
+    now = (new_status or "") == "succeeded"
+    if now and not was:
+        return 1
+    if was and not now:
+        return -1
+    return 0
+
+
+def get_campaign_totals(campaign_id: str) -> dict[str, Any] | None:
+    sql = "SELECT total_raised, donations_count FROM campaigns WHERE id = %s"
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {"total_raised": row[0], "donations_count": int(row[1] or 0)}
+
+
+def apply_donation_transition(
+    campaign_id: str,
+    *,
+    previous_status: str | None,
+    new_status: str | None,
+    amount_cents: int,
+) -> dict[str, Any] | None:
     """
-    Sets campaigns.total_raised to SUM(donations.amount_cents where succeeded) / 100.
-    Returns {"total_raised": Decimal(...)}.
+    Incrementally maintain campaigns.total_raised / donations_count for one
+    donation status change: add on entering 'succeeded', subtract on leaving it
+    (refund, dispute). Run in the same transaction as the status update.
+    Returns {"total_raised": Decimal, "donations_count": int}.
     """
+    sign = _succeeded_delta(previous_status, new_status)
+    if sign == 0:
+        return get_campaign_totals(campaign_id)
     sql = """
     UPDATE campaigns
-    SET total_raised = (
-      SELECT COALESCE(SUM(amount_cents),0) / 100.0
-      FROM donations
-      WHERE campaign_id = %s AND status = 'succeeded'
-    )::numeric(12,2),
-    updated_at = now()
+    SET total_raised = (total_raised + %s / 100.0)::numeric(12,2),
+        donations_count = GREATEST(donations_count + %s, 0),
+        updated_at = now()
     WHERE id = %s
-    RETURNING total_raised
+    RETURNING total_raised, donations_count
     """
     with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute(sql, (campaign_id, campaign_id))
+        cur.execute(sql, (sign * int(amount_cents or 0), sign, campaign_id))
         row = cur.fetchone()
         conn.commit()
-        return {"total_raised": row[0]}
+        if not row:
+            return None
+        return {"total_raised": row[0], "donations_count": int(row[1] or 0)}
+
+
+def recompute_total_raised(campaign_id: str) -> dict[str, Any]:
+    """
+    Sets campaigns.total_raised to SUM(donations.amount_cents where succeeded) / 100
+    and donations_count to the matching COUNT. Full scan of the campaign's
+    donations: used by the drift verifier, not on the webhook path. Writes
+    (and bumps updated_at, which selects campaigns for the next verifier
+    run) only when the stored values have drifted.
+    Returns {"total_raised": Decimal(...), "donations_count": int,
+             "previous_total_raised": Decimal(...), "previous_donations_count": int}.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        # Lock the campaign row before aggregating so a concurrent incremental
+        # update cannot land between the SUM snapshot and the write.
+        cur.execute(
+            "SELECT total_raised, donations_count FROM campaigns WHERE id = %s FOR UPDATE",
+            (campaign_id,),
+        )
+        prev = cur.fetchone()
+        if not prev:
+            conn.commit()
+            return {"total_raised": None, "donations_count": 0}
+        cur.execute(
+            """
+            UPDATE campaigns
+            SET total_raised = s.cents / 100.0,
+                donations_count = s.cnt,
+                updated_at = now()
+            FROM (
+              SELECT COALESCE(SUM(amount_cents), 0) AS cents, COUNT(*)::int AS cnt
+              FROM donations
+              WHERE campaign_id = %s AND status = 'succeeded'
+            ) s
+            WHERE id = %s
+              AND (campaigns.total_raised IS DISTINCT FROM s.cents / 100.0
+                   OR campaigns.donations_count IS DISTINCT FROM s.cnt)
+            RETURNING total_raised, donations_count
+            """,
+            (campaign_id, campaign_id),
+        )
+        row = cur.fetchone() or prev
+        conn.commit()
+        return {
+            "total_raised": row[0],
+            "donations_count": int(row[1] or 0),
+            "previous_total_raised": prev[0],
+            "previous_donations_count": int(prev[1] or 0),
+        }
+
+
+def list_recently_updated_campaign_ids(
+    since_seconds: int, limit: int = 500
+) -> list[str]:
+    sql = """
+      SELECT id FROM campaigns
+      WHERE updated_at >= now() - make_interval(secs => %s)
+      ORDER BY updated_at DESC
+      LIMIT %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (int(since_seconds), int(limit)))
+        return [str(r[0]) for r in cur.fetchall()]
 
 
 def complete_campaign_if_goal_reached(campaign_id: str) -> bool:
@@ -457,6 +573,32 @@ def get_campaign_by_id(campaign_id: str) -> dict[str, Any] | None:
     return get_campaign(campaign_id)
 
 
+_GIVEAWAY_LOG_COLS = [
+    "id",
+    "org_id",
+    "campaign_id",
+    "winner_donation_id",
+    "created_by_user_id",
+    "mode",
+    "population_count",
+    "population_hash",
+    "notes",
+    "draw_id",
+    "winner_rank",
+    "weighting",
+    "min_amount_cents",
+    "cents_per_entry",
+    "max_entries",
+    "total_entries",
+    "draw_algorithm",
+    "seed_hex",
+    "commitment_id",
+    "population_cutoff",
+    "created_at",
+]
+_GIVEAWAY_LOG_RETURNING = ", ".join(_GIVEAWAY_LOG_COLS)
+
+
 def insert_giveaway_log(
     *,
     org_id: str,
@@ -467,8 +609,19 @@ def insert_giveaway_log(
     population_count: int,
     population_hash: str,
     notes: str | None = None,
+    draw_id: str | None = None,
+    winner_rank: int = 1,
+    weighting: str = "uniform",
+    min_amount_cents: int = 0,
+    cents_per_entry: int | None = None,
+    max_entries: int | None = None,
+    total_entries: int | None = None,
+    draw_algorithm: str | None = None,
+    seed_hex: str | None = None,
+    commitment_id: str | None = None,
+    population_cutoff: Any = None,
 ) -> dict[str, Any]:
-    sql = """
+    sql = f"""
     INSERT INTO giveaway_logs (
         org_id,
         campaign_id,
@@ -477,12 +630,22 @@ def insert_giveaway_log(
         mode,
         population_count,
         population_hash,
-        notes
+        notes,
+        draw_id,
+        winner_rank,
+        weighting,
+        min_amount_cents,
+        cents_per_entry,
+        max_entries,
+        total_entries,
+        draw_algorithm,
+        seed_hex,
+        commitment_id,
+        population_cutoff
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    RETURNING
-        id, org_id, campaign_id, winner_donation_id,
-        created_by_user_id, mode, population_count, population_hash, notes, created_at
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
+            %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    RETURNING {_GIVEAWAY_LOG_RETURNING}
     """
     with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute(
@@ -496,23 +659,105 @@ def insert_giveaway_log(
                 population_count,
                 population_hash,
                 notes,
+                draw_id,
+                winner_rank,
+                weighting,
+                min_amount_cents,
+                cents_per_entry,
+                max_entries,
+                total_entries,
+                draw_algorithm,
+                seed_hex,
+                commitment_id,
+                population_cutoff,
             ),
         )
         row = cur.fetchone()
         conn.commit()
-        cols = [
-            "id",
-            "org_id",
-            "campaign_id",
-            "winner_donation_id",
-            "created_by_user_id",
-            "mode",
-            "population_count",
-            "population_hash",
-            "notes",
-            "created_at",
-        ]
-        return dict(zip(cols, row))
+        return dict(zip(_GIVEAWAY_LOG_COLS, row))
+
+
+_GIVEAWAY_COMMITMENT_COLS = [
+    "id",
+    "org_id",
+    "campaign_id",
+    "created_by_user_id",
+    "seed_hex",
+    "seed_sha256",
+    "population_cutoff",
+    "draw_id",
+    "created_at",
+    "used_at",
+]
+_GIVEAWAY_COMMITMENT_RETURNING = ", ".join(_GIVEAWAY_COMMITMENT_COLS)
+
+
+def create_giveaway_commitment(
+    *,
+    org_id: str,
+    campaign_id: str,
+    created_by_user_id: str,
+    seed_hex: str,
+    seed_sha256: str,
+) -> dict[str, Any]:
+    """Record a seed and fix the population cutoff (database now()) for a later draw."""
+    sql = f"""
+    INSERT INTO giveaway_commitments
+        (org_id, campaign_id, created_by_user_id, seed_hex, seed_sha256)
+    VALUES (%s, %s, %s, %s, %s)
+    RETURNING {_GIVEAWAY_COMMITMENT_RETURNING}
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql, (org_id, campaign_id, created_by_user_id, seed_hex, seed_sha256)
+        )
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_GIVEAWAY_COMMITMENT_COLS, row))
+
+
+def get_giveaway_commitment(
+    campaign_id: str, commitment_id: str
+) -> dict[str, Any] | None:
+    sql = f"""
+    SELECT {_GIVEAWAY_COMMITMENT_RETURNING}
+    FROM giveaway_commitments
+    WHERE campaign_id = %s AND id = %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id, commitment_id))
+        row = cur.fetchone()
+        return dict(zip(_GIVEAWAY_COMMITMENT_COLS, row)) if row else None
+
+
+def use_giveaway_commitment(
+    campaign_id: str, commitment_id: str, draw_id: str
+) -> dict[str, Any] | None:
+    """Bind an unused commitment to draw_id; None if it is missing or already used."""
+    sql = f"""
+    UPDATE giveaway_commitments
+    SET draw_id = %s, used_at = now()
+    WHERE campaign_id = %s AND id = %s AND draw_id IS NULL
+    RETURNING {_GIVEAWAY_COMMITMENT_RETURNING}
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (draw_id, campaign_id, commitment_id))
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_GIVEAWAY_COMMITMENT_COLS, row)) if row else None
+
+
+def get_giveaway_draw(campaign_id: str, draw_id: str) -> list[dict[str, Any]]:
+    """The giveaway_logs rows of one draw, in winner_rank order."""
+    sql = f"""
+    SELECT {_GIVEAWAY_LOG_RETURNING}
+    FROM giveaway_logs
+    WHERE campaign_id = %s AND draw_id = %s
+    ORDER BY winner_rank ASC
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id, draw_id))
+        return [dict(zip(_GIVEAWAY_LOG_COLS, row)) for row in cur.fetchall()]
 
 
 def _mask_email(e: str | None) -> str | None:
@@ -563,11 +808,11 @@ def get_latest_winner_public(campaign_id: str) -> dict[str, Any] | None:
 def list_giveaway_logs(campaign_id: str, limit: int = 20) -> list[dict]:
     sql = """
       SELECT gl.campaign_id, gl.winner_donation_id, gl.mode, gl.population_count, gl.created_at,
-             d.donor_email
+             d.donor_email, gl.draw_id, gl.winner_rank, gl.weighting, gl.total_entries
       FROM giveaway_logs gl
       LEFT JOIN donations d ON d.id = gl.winner_donation_id
       WHERE gl.campaign_id = %s
-      ORDER BY gl.created_at DESC
+      ORDER BY gl.created_at DESC, gl.winner_rank ASC
       LIMIT %s
     """
     with get_db_connection() as conn, conn.cursor() as cur:
@@ -591,6 +836,10 @@ def list_giveaway_logs(campaign_id: str, limit: int = 20) -> list[dict]:
                     "winner_donor": (
                         _mask_email(donor_email) if donor_email else "Anonymous"
                     ),
+                    "draw_id": str(r[6]) if r[6] else None,
+                    "winner_rank": r[7],
+                    "weighting": r[8],
+                    "total_entries": r[9],
                 }
             )
         return result
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import Any
+
+from app.models.campaign import _augment_campaign_row
+from app.utils.db import get_db_connection
+
+# campaign_donation_stats is maintained by the trg_donations_campaign_stats
+# trigger (migration 0028) in the same transaction as every donation write.
+
+_SUMMARY_KEYS = [
+    "gross_raised_cents",
+    "stripe_fee_cents",
+    "platform_fee_cents",
+    "donor_covered_fee_cents",
+    "platform_absorbed_fee_cents",
+    "net_payout_cents",
+]
+
+_STATS_COLS = ["donations_count", "last_donation_at", *_SUMMARY_KEYS]
+
+_STATS_SELECT = """
+  COALESCE(s.donations_count, 0),
+  s.last_donation_at::text,
+  COALESCE(s.gross_raised_cents, 0),
+  COALESCE(s.stripe_fee_cents, 0),
+  COALESCE(s.platform_fee_cents, 0),
+  COALESCE(s.donor_covered_fee_cents, 0),
+  COALESCE(s.platform_absorbed_fee_cents, 0),
+  COALESCE(s.net_payout_cents, 0)
+"""
+
+
+def _stats_from_row(row: tuple[Any, ...]) -> dict[str, Any]:
+    out = dict(zip(_STATS_COLS, row))
+    out["donations_count"] = int(out["donations_count"] or 0)
+    for k in _SUMMARY_KEYS:
+        out[k] = int(out[k] or 0)
+    return out
+
+
+def get_campaign_donation_stats(campaign_id: str) -> dict[str, Any]:
+    """
+    Rollup of succeeded donations for a campaign (zeros when it has none).
+    Same keys as summarize_succeeded_donations plus donations_count and
+    last_donation_at, read from one row instead of aggregating donations.
+    """
+    sql = f"""
+      SELECT {_STATS_SELECT}
+      FROM (SELECT %s::uuid AS campaign_id) c
+      LEFT JOIN campaign_donation_stats s ON s.campaign_id = c.campaign_id
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id,))
+        return _stats_from_row(cur.fetchone())
+
+
+def get_campaign_with_donation_stats(campaign_id: str) -> dict[str, Any] | None:
+    """Campaign progress fields plus its donation rollup in a single query."""
+    sql = f"""
+      SELECT c.id, c.org_id, c.goal, c.status, c.total_raised,
+             c.fee_option, c.fee_policy_version,
+             {_STATS_SELECT}
+      FROM campaigns c
+      LEFT JOIN campaign_donation_stats s ON s.campaign_id = c.id
+      WHERE c.id = %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        cols = [
+            "id",
+            "org_id",
+            "goal",
+            "status",
+            "total_raised",
+            "fee_option",
+            "fee_policy_version",
+        ]
+        out = dict(zip(cols, row[: len(cols)]))
+        out.update(_stats_from_row(row[len(cols) :]))
+        return _augment_campaign_row(out)
+
+
+def refresh_campaign_donation_stats(campaign_id: str) -> dict[str, Any]:
+    """
+    Rebuild one campaign's rollup from donations (full aggregate). Used by
+    the drift verifier; returns {"stats": {...}, "previous": {...} | None}.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM campaigns WHERE id = %s", (campaign_id,))
+        if not cur.fetchone():
+            conn.commit()
+            return {
+                "stats": _stats_from_row((0, None, 0, 0, 0, 0, 0, 0)),
+                "previous": None,
+            }
+        # Lock the stats row before aggregating: a trigger still holding it
+        # commits first and is then visible to the aggregate below.
+        cur.execute(
+            f"""
+            SELECT {_STATS_SELECT}
+            FROM campaign_donation_stats s
+            WHERE s.campaign_id = %s
+            FOR UPDATE
+            """,
+            (campaign_id,),
+        )
+        prev_row = cur.fetchone()
+        cur.execute(
+            """
+            INSERT INTO campaign_donation_stats AS s (
+              campaign_id, donations_count, last_donation_at,
+              gross_raised_cents, stripe_fee_cents, platform_fee_cents,
+              donor_covered_fee_cents, platform_absorbed_fee_cents, net_payout_cents
+            )
+            SELECT %s,
+                   COUNT(*)::int,
+                   MAX(created_at),
+                   COALESCE(SUM(amount_cents), 0),
+                   COALESCE(SUM(stripe_processing_fee_cents), 0),
+                   COALESCE(SUM(platform_fee_cents), 0),
+                   COALESCE(SUM(donor_fee_cents), 0),
+                   COALESCE(SUM(platform_absorbed_fee_cents), 0),
+                   COALESCE(SUM(net_to_org_cents), 0)
+            FROM donations
+            WHERE campaign_id = %s AND status = 'succeeded'
+            ON CONFLICT (campaign_id) DO UPDATE
+            SET donations_count = EXCLUDED.donations_count,
+                last_donation_at = EXCLUDED.last_donation_at,
+                gross_raised_cents = EXCLUDED.gross_raised_cents,
+                stripe_fee_cents = EXCLUDED.stripe_fee_cents,
+                platform_fee_cents = EXCLUDED.platform_fee_cents,
+                donor_covered_fee_cents = EXCLUDED.donor_covered_fee_cents,
+                platform_absorbed_fee_cents = EXCLUDED.platform_absorbed_fee_cents,
+                net_payout_cents = EXCLUDED.net_payout_cents,
+                updated_at = now()
+            RETURNING donations_count, last_donation_at::text,
+                      gross_raised_cents, stripe_fee_cents, platform_fee_cents,
+                      donor_covered_fee_cents, platform_absorbed_fee_cents,
+                      net_payout_cents
+            """,
+            (campaign_id, campaign_id),
+        )
+        row = cur.fetchone()
+        conn.commit()
+        return {
+            "stats": _stats_from_row(row),
+            "previous": _stats_from_row(prev_row) if prev_row else None,
+        }
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional
+from app.utils.db import get_db_connection
+
+_COLS = [
+    "update_id",
+    "chunk_index",
+    "after_email",
+    "last_email",
+    "recipients",
+    "status",
+    "last_sent_email",
+    "sent_count",
+    "failed_count",
+    "last_error",
+    "created_at",
+    "updated_at",
+]
+_RETURNING = ", ".join(_COLS)
+
+
+def create_update_send(
+    update_id: str,
+    chunk_index: int,
+    after_email: Optional[str],
+    last_email: str,
+    recipients: int,
+) -> Dict[str, Any]:
+    """Plan one chunk; an already planned chunk is returned unchanged."""
+    sql = f"""
+    INSERT INTO campaign_update_sends
+        (update_id, chunk_index, after_email, last_email, recipients)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (update_id, chunk_index)
+    DO UPDATE SET chunk_index = campaign_update_sends.chunk_index
+    RETURNING {_RETURNING}
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (update_id, chunk_index, after_email, last_email, recipients))
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_COLS, row))
+
+
+def get_update_send(update_id: str, chunk_index: int) -> Optional[Dict[str, Any]]:
+    sql = f"""
+    SELECT {_RETURNING} FROM campaign_update_sends
+    WHERE update_id = %s AND chunk_index = %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (update_id, chunk_index))
+        row = cur.fetchone()
+        return dict(zip(_COLS, row)) if row else None
+
+
+def list_update_sends(update_id: str) -> List[Dict[str, Any]]:
+    sql = f"""
+    SELECT {_RETURNING} FROM campaign_update_sends
+    WHERE update_id = %s
+    ORDER BY chunk_index
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (update_id,))
+        return [dict(zip(_COLS, row)) for row in cur.fetchall()]
+
+
+def claim_update_send(
+    update_id: str, chunk_index: int, stale_after_seconds: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Mark a chunk as sending and return it, unless it is done or another job
+    has checkpointed it within stale_after_seconds (that job still owns it).
+    """
+    sql = f"""
+    UPDATE campaign_update_sends
+    SET status = 'sending', updated_at = now()
+    WHERE update_id = %s AND chunk_index = %s
+      AND (status = 'queued'
+           OR (status = 'sending'
+               AND updated_at < now() - make_interval(secs => %s)))
+    RETURNING {_RETURNING}
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (update_id, chunk_index, stale_after_seconds))
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_COLS, row)) if row else None
+
+
+def checkpoint_update_send(
+    update_id: str,
+    chunk_index: int,
+    *,
+    status: Optional[str] = None,
+    last_sent_email: Optional[str] = None,
+    sent: int = 0,
+    failed: int = 0,
+    last_error: Optional[str] = None,
+) -> None:
+    """Advance a chunk: add sent/failed counts and move the resume point."""
+    sql = """
+    UPDATE campaign_update_sends
+    SET status = COALESCE(%s, status),
+        last_sent_email = COALESCE(%s, last_sent_email),
+        sent_count = sent_count + %s,
+        failed_count = failed_count + %s,
+        last_error = COALESCE(%s, last_error),
+        updated_at = now()
+    WHERE update_id = %s AND chunk_index = %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql,
+            (
+                status,
+                last_sent_email,
+                sent,
+                failed,
+                last_error,
+                update_id,
+                chunk_index,
+            ),
+        )
+        conn.commit()
@@ -1,5 +1,11 @@
+import base64
+import json
+from datetime import datetime
 from typing import Any
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
+from uuid import UUID, uuid4
+from psycopg2.extras import execute_values
+
 from app.utils.db import get_db_connection
 
 
@@ -155,6 +161,136 @@ def select_donations_by_campaign(campaign_id: str) -> List[Dict[str, Any]]:
         return [dict(zip(cols, row)) for row in rows]
 
 
+def iter_donations_by_campaign(
+    campaign_id: str, *, status: Optional[str] = None, chunk_size: int = 2000
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield all donations for a campaign (same shape and order as
+    select_donations_by_campaign), optionally only those with the given
+    status, through a named server-side cursor, so at most chunk_size rows
+    are held in memory. The pooled connection is kept until the iterator is
+    exhausted or closed.
+    """
+    cols = [
+        "id",
+        "org_id",
+        "campaign_id",
+        "amount_cents",
+        "currency",
+        "donor_email",
+        "message",
+        "status",
+        "fee_option",
+        "stripe_processing_fee_cents",
+        "platform_fee_cents",
+        "donor_fee_cents",
+        "platform_absorbed_fee_cents",
+        "net_to_org_cents",
+        "created_at",
+        "updated_at",
+    ]
+    sql = """
+        SELECT id, org_id, campaign_id, amount_cents, currency, donor_email,
+               message, status, fee_option, stripe_processing_fee_cents, platform_fee_cents,
+               donor_fee_cents, platform_absorbed_fee_cents, net_to_org_cents, created_at, updated_at
+        FROM donations
+        WHERE campaign_id = %s {status_filter}
+        ORDER BY created_at DESC, id DESC
+    """
+    params: tuple = (campaign_id,)
+    if status is not None:
+        params += (status,)
+    sql = sql.format(status_filter="AND status = %s" if status is not None else "")
+    name = f"donations_export_{uuid4().hex}"
+    with get_db_connection() as conn, conn.cursor(name=name) as cur:
+        cur.itersize = chunk_size
+        cur.execute(sql, params)
+        for row in cur:
+            yield dict(zip(cols, row))
+
+
+# Sort key -> SQL expression. Every key is paired with id so keyset
+# positions are unique; NULL emails sort as "" so row comparisons work.
+_DONATION_SORTS = {
+    "created_at": "created_at",
+    "amount_cents": "amount_cents",
+    "donor_email": "COALESCE(donor_email, '')",
+    "status": "status",
+}
+# Search (pg_trgm, migration 0032). Each predicate matches a trigram GIN
+# index expression; s.term is the lower-cased query bound once in FROM.
+_SEARCH_FROM = "donations, (SELECT %s::text AS term) s"
+_SEARCH_MATCH = (
+    "(lower(COALESCE(donor_email::text, '')) LIKE %s"
+    " OR COALESCE(message, '') ILIKE %s"
+    " OR s.term <%% COALESCE(message, ''))"
+)
+_RELEVANCE_SQL = (
+    "GREATEST(similarity(lower(COALESCE(donor_email::text, '')), s.term),"
+    " word_similarity(s.term, COALESCE(message, '')))::float8"
+)
+DONATIONS_COUNT_CAP = 10000
+_TOTAL_MODES = ("exact", "capped", "estimate", "none")
+
+
+def _encode_cursor(sort: str, order: str, direction: str, value, row_id) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps(
+        {"s": sort, "o": order, "d": direction, "v": value, "id": str(row_id)},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        ok = (
+            data["s"] == sort
+            and data["o"] == order
+            and data["d"] in ("next", "prev")
+            and "v" in data
+            and str(UUID(data["id"])) == data["id"]
+        )
+    except (ValueError, TypeError, KeyError):
+        ok = False
+    if not ok:
+        raise ValueError("invalid cursor")
+    return data
+
+
+def _like_pattern(q: str) -> str:
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _count_donations(cur, from_sql: str, where_sql: str, params: list[Any], mode: str):
+    """(total, is_exact) for the filtered donations; (None, False) for mode none."""
+    if mode == "exact":
+        cur.execute(f"SELECT COUNT(*)::int FROM {from_sql} WHERE {where_sql}", params)
+        return cur.fetchone()[0], True
+    if mode == "capped":
+        cur.execute(
+            f"SELECT COUNT(*)::int FROM "
+            f"(SELECT 1 FROM {from_sql} WHERE {where_sql} LIMIT %s) t",
+            params + [DONATIONS_COUNT_CAP + 1],
+        )
+        n = cur.fetchone()[0]
+        return min(n, DONATIONS_COUNT_CAP), n <= DONATIONS_COUNT_CAP
+    if mode == "estimate":
+        cur.execute(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {from_sql} WHERE {where_sql}",
+            params,
+        )
+        plan = cur.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"]), False
+    return None, False
+
+
 def list_donations_paginated(
     campaign_id: str,
     *,
@@ -163,20 +299,35 @@ def list_donations_paginated(
     sort: str = "created_at",
     order: str = "desc",
     search: str | None = None,
+    cursor: str | None = None,
+    total: str = "exact",
 ) -> dict[str, Any]:
     """
     Return paginated donations for a campaign.
-    sort: one of created_at, amount_cents, donor_email, status
+    sort: one of created_at, amount_cents, donor_email, status, or relevance
+        (only with search: trigram similarity to the email / message)
     order: asc or desc
-    search: optional; filters by donor_email or message (ILIKE %search%)
-    Returns: { "items": [...], "total": N, "page": P, "per_page": PP }
+    search: optional; substring of donor_email or message, or a close match
+        to words in the message; served by the trigram indexes
+    cursor: next_cursor / prev_cursor from a previous page; seeks on
+        (sort, id) so deep pages cost the same as the first. Without a
+        cursor, page is applied as an OFFSET (kept for existing clients).
+    total: exact (default) | capped (count up to DONATIONS_COUNT_CAP) |
+        estimate (planner row estimate) | none
+    Returns: { "items": [...], "total": N, "total_exact": bool, "page": P,
+               "per_page": PP, "next_cursor": str|None, "prev_cursor": str|None }
+    Raises ValueError for a malformed cursor or one issued for another sort.
     """
-    allowed_sort = ("created_at", "amount_cents", "donor_email", "status")
-    sort = sort if sort in allowed_sort else "created_at"
+    q = (search or "").strip().lower()
+    if sort == "relevance" and not q:
+        sort = "created_at"
+    sort = sort if sort in _DONATION_SORTS or sort == "relevance" else "created_at"
     order = order.lower() if order in ("asc", "desc") else "desc"
+    total = total if total in _TOTAL_MODES else "exact"
     page = max(1, int(page))
     per_page = max(1, min(100, int(per_page)))
-    offset = (page - 1) * per_page
+    position = _decode_cursor(cursor, sort, order) if cursor else None
+    sort_expr = _RELEVANCE_SQL if sort == "relevance" else _DONATION_SORTS[sort]
 
     cols = [
         "id",
@@ -195,35 +346,68 @@ def list_donations_paginated(
         "created_at",
         "updated_at",
     ]
-    base_sql = """
+    from_sql = "donations"
+    where_sql = "campaign_id = %s"
+    params: list[Any] = [campaign_id]
+    if q:
+        from_sql = _SEARCH_FROM
+        where_sql += f" AND {_SEARCH_MATCH}"
+        pattern = _like_pattern(q)
+        params = [q, campaign_id, pattern, pattern]
+    count_params = params.copy()
+
+    backwards = bool(position and position["d"] == "prev")
+    scan_desc = (order == "desc") != backwards
+    page_sql = where_sql
+    if position:
+        page_sql += f" AND ({sort_expr}, id) {'<' if scan_desc else '>'} (%s, %s)"
+        params.extend([position["v"], position["id"]])
+    direction = "DESC" if scan_desc else "ASC"
+    sql = f"""
         SELECT id, campaign_id, amount_cents, currency, donor_email, message, status,
                fee_option, stripe_processing_fee_cents, platform_fee_cents, donor_fee_cents,
-               platform_absorbed_fee_cents, net_to_org_cents, created_at, updated_at
-        FROM donations
-        WHERE campaign_id = %s
+               platform_absorbed_fee_cents, net_to_org_cents, created_at, updated_at,
+               {sort_expr}
+        FROM {from_sql}
+        WHERE {page_sql}
+        ORDER BY {sort_expr} {direction}, id {direction}
+        LIMIT %s
     """
-    count_sql = "SELECT COUNT(*)::int FROM donations WHERE campaign_id = %s"
-    params: list[Any] = [campaign_id]
-    if search and (q := (search or "").strip()):
-        pattern = f"%{q}%"
-        base_sql += " AND (donor_email ILIKE %s OR message ILIKE %s)"
-        count_sql += " AND (donor_email ILIKE %s OR message ILIKE %s)"
-        params.extend([pattern, pattern])
-    count_params = params.copy()
-    base_sql += f" ORDER BY {sort} {order} LIMIT %s OFFSET %s"
-    params.extend([per_page, offset])
+    # One extra row tells whether another page exists in the scan direction.
+    params.append(per_page + 1)
+    if not position and page > 1:
+        sql += " OFFSET %s"
+        params.append((page - 1) * per_page)
 
     with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute(count_sql, count_params)
-        total = cur.fetchone()[0]
-        cur.execute(base_sql, params)
+        count, exact = _count_donations(cur, from_sql, where_sql, count_params, total)
+        cur.execute(sql, params)
         rows = cur.fetchall()
-        items = [dict(zip(cols, row)) for row in rows]
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = position is not None or page > 1, more
+    items = [dict(zip(cols, row)) for row in rows]
+    if sort == "relevance":
+        for item, row in zip(items, rows):
+            item["relevance"] = round(row[-1], 4)
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = _encode_cursor(sort, order, "next", rows[-1][-1], rows[-1][0])
+    if rows and has_prev:
+        prev_cursor = _encode_cursor(sort, order, "prev", rows[0][-1], rows[0][0])
     return {
         "items": items,
-        "total": total,
+        "total": count,
+        "total_exact": exact,
         "page": page,
         "per_page": per_page,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
     }
 
 
@@ -260,20 +444,31 @@ def update_donation_accounting(
     donor_fee_cents: int,
     platform_absorbed_fee_cents: int,
     net_to_org_cents: int,
+    stripe_fee_reconciled: bool = False,
 ) -> None:
+    """
+    stripe_fee_reconciled=False means stripe_processing_fee_cents is an estimate
+    that reconcile_stripe_fees will later replace with the balance transaction fee.
+
+    A donation whose fee is already reconciled (by an earlier event or the
+    reconciler) is left as is, so a later succeeded event or a redelivery
+    without an expanded fee cannot swap the exact fee back for an estimate.
+    """
     sql = """
       UPDATE donations
       SET fee_option = %s,
           fee_policy_version = %s,
-          stripe_balance_transaction_id = %s,
+          stripe_balance_transaction_id = COALESCE(%s, stripe_balance_transaction_id),
           stripe_processing_fee_cents = %s,
           platform_fee_percent = %s,
           platform_fee_cents = %s,
           donor_fee_cents = %s,
           platform_absorbed_fee_cents = %s,
           net_to_org_cents = %s,
+          stripe_fee_reconciled_at = CASE WHEN %s THEN now() END,
           updated_at = now()
       WHERE id = %s
+        AND stripe_fee_reconciled_at IS NULL
     """
     with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute(
@@ -288,12 +483,106 @@ def update_donation_accounting(
                 int(donor_fee_cents),
                 int(platform_absorbed_fee_cents),
                 int(net_to_org_cents),
+                bool(stripe_fee_reconciled),
                 donation_id,
             ),
         )
         conn.commit()
 
 
+_UNRECONCILED_COLS = [
+    "id",
+    "campaign_id",
+    "amount_cents",
+    "stripe_payment_intent_id",
+    "stripe_balance_transaction_id",
+    "fee_option",
+    "platform_fee_percent",
+    "platform_fee_cents",
+    "created_at",
+    "stripe_fee_checked_at",
+]
+
+
+def list_unreconciled_fee_donations(
+    *, max_age_days: int = 30, limit: int = 5000
+) -> list[dict[str, Any]]:
+    """Succeeded donations still carrying an estimated Stripe fee, oldest first."""
+    sql = """
+      SELECT id, campaign_id, amount_cents, stripe_payment_intent_id,
+             stripe_balance_transaction_id, fee_option, platform_fee_percent,
+             platform_fee_cents, created_at, stripe_fee_checked_at
+      FROM donations
+      WHERE status = 'succeeded'
+        AND stripe_fee_reconciled_at IS NULL
+        AND platform_fee_percent IS NOT NULL
+        AND created_at >= now() - make_interval(days => %s)
+      ORDER BY created_at
+      LIMIT %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (int(max_age_days), int(limit)))
+        return [dict(zip(_UNRECONCILED_COLS, row)) for row in cur.fetchall()]
+
+
+def mark_donation_fees_checked(donation_ids: list[str], checked_at: datetime) -> None:
+    """Record that balance transactions up to checked_at held no match for these donations."""
+    if not donation_ids:
+        return
+    sql = """
+      UPDATE donations
+      SET stripe_fee_checked_at = %s
+      WHERE id = ANY(%s::uuid[])
+        AND stripe_fee_reconciled_at IS NULL
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (checked_at, [str(i) for i in donation_ids]))
+        conn.commit()
+
+
+def bulk_update_donation_fees(rows: list[dict[str, Any]], page_size: int = 500) -> int:
+    """
+    Write reconciled Stripe fees for many donations with one UPDATE ... FROM
+    (VALUES ...) per page. Each row needs id, stripe_balance_transaction_id,
+    stripe_processing_fee_cents, donor_fee_cents, platform_absorbed_fee_cents
+    and net_to_org_cents. Returns the number of donations updated.
+    """
+    if not rows:
+        return 0
+    sql = """
+      UPDATE donations d
+      SET stripe_balance_transaction_id = v.bt_id,
+          stripe_processing_fee_cents = v.stripe_fee,
+          donor_fee_cents = v.donor_fee,
+          platform_absorbed_fee_cents = v.absorbed_fee,
+          net_to_org_cents = v.net,
+          stripe_fee_reconciled_at = now(),
+          updated_at = now()
+      FROM (VALUES %s) AS v(id, bt_id, stripe_fee, donor_fee, absorbed_fee, net)
+      WHERE d.id = v.id::uuid
+        AND d.stripe_fee_reconciled_at IS NULL
+    """
+    values = [
+        (
+            str(row["id"]),
+            row.get("stripe_balance_transaction_id"),
+            int(row["stripe_processing_fee_cents"]),
+            int(row["donor_fee_cents"]),
+            int(row["platform_absorbed_fee_cents"]),
+            int(row["net_to_org_cents"]),
+        )
+        for row in rows
+    ]
+    updated = 0
+    with get_db_connection() as conn, conn.cursor() as cur:
+        for start in range(0, len(values), page_size):
+            page = values[start : start + page_size]
+            execute_values(cur, sql, page, page_size=len(page))
+            updated += cur.rowcount
+        conn.commit()
+    return updated
+
+
 def summarize_succeeded_donations(campaign_id: str) -> dict[str, int]:
     sql = """
       SELECT
@@ -329,22 +618,46 @@ def attach_pi_to_donation(donation_id: str, pi_id: str) -> None:
         conn.commit()
 
 
-def set_status_by_id(donation_id: str, status: str) -> None:
+_STATUS_TRANSITION_COLS = [
+    "id",
+    "campaign_id",
+    "amount_cents",
+    "previous_status",
+    "status",
+]
+
+
+def _set_status_where(where_sql: str, key: str, status: str) -> dict[str, Any] | None:
+    # Lock the row first so previous_status is exact even with concurrent webhooks.
+    sql = f"""
+      UPDATE donations d
+      SET status = %s, updated_at = now()
+      FROM (
+        SELECT id, status FROM donations WHERE {where_sql} FOR UPDATE
+      ) prev
+      WHERE d.id = prev.id
+      RETURNING d.id, d.campaign_id, d.amount_cents, prev.status::text, d.status::text
+    """
     with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            "UPDATE donations SET status=%s, updated_at=now() WHERE id=%s",
-            (status, donation_id),
-        )
+        cur.execute(sql, (status, key))
+        row = cur.fetchone()
         conn.commit()
+        if not row:
+            return None
+        return dict(zip(_STATUS_TRANSITION_COLS, row))
 
 
-def set_status_by_pi(pi_id: str, status: str) -> None:
-    with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            "UPDATE donations SET status=%s, updated_at=now() WHERE stripe_payment_intent_id=%s",
-            (status, pi_id),
-        )
-        conn.commit()
+def set_status_by_id(donation_id: str, status: str) -> dict[str, Any] | None:
+    """
+    Set donation status. Returns the transition
+    {id, campaign_id, amount_cents, previous_status, status} or None if not found.
+    """
+    return _set_status_where("id = %s", donation_id, status)
+
+
+def set_status_by_pi(pi_id: str, status: str) -> dict[str, Any] | None:
+    """Same as set_status_by_id, keyed by stripe_payment_intent_id."""
+    return _set_status_where("stripe_payment_intent_id = %s", pi_id, status)
 
 
 def count_and_last_succeeded(campaign_id: str) -> tuple[int, str | None]:
@@ -419,6 +732,101 @@ def list_succeeded_for_campaign(
             ]
 
 
+def giveaway_population_cutoff() -> datetime:
+    """Database now(): a draw's population is the donations created up to it."""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT now()")
+        return cur.fetchone()[0]
+
+
+def iter_giveaway_entrants(
+    campaign_id: str,
+    *,
+    mode: str = "per_donation",
+    min_amount_cents: int = 0,
+    created_at_or_before: datetime | None = None,
+    chunk_size: int = 5000,
+) -> Iterator[tuple[Any, str | None, int]]:
+    """
+    Stream the giveaway population as (donation_id, donor_email, amount_cents)
+    through a named server-side cursor, in a stable order so the population
+    hash is reproducible. Same eligibility rules as list_succeeded_for_campaign;
+    per_donor rows carry the donor's first donation and summed amount.
+    created_at_or_before limits the population to a draw's snapshot time.
+    """
+    min_amount_cents = int(min_amount_cents or 0)
+    cutoff_sql = "AND created_at <= %s" if created_at_or_before else ""
+    params: list[Any] = [campaign_id]
+    if created_at_or_before:
+        params.append(created_at_or_before)
+    params.append(min_amount_cents)
+    if mode == "per_donor":
+        sql = """
+        SELECT
+          (array_agg(id ORDER BY created_at ASC, id ASC))[1] AS donation_id,
+          LOWER(donor_email) AS donor_email,
+          SUM(amount_cents)::bigint AS total_cents
+        FROM donations
+        WHERE campaign_id = %s
+          AND status = 'succeeded'
+          AND donor_email IS NOT NULL
+          {cutoff}
+        GROUP BY LOWER(donor_email)
+        HAVING SUM(amount_cents) >= %s
+        ORDER BY LOWER(donor_email)
+        """
+    else:
+        sql = """
+        SELECT id, LOWER(donor_email) AS donor_email, amount_cents::bigint
+        FROM donations
+        WHERE campaign_id = %s
+          AND status = 'succeeded'
+          {cutoff}
+          AND amount_cents >= %s
+        ORDER BY created_at, id
+        """
+    name = f"giveaway_entrants_{uuid4().hex}"
+    with get_db_connection() as conn, conn.cursor(name=name) as cur:
+        cur.itersize = chunk_size
+        cur.execute(sql.format(cutoff=cutoff_sql), tuple(params))
+        for donation_id, donor_email, amount_cents in cur:
+            yield donation_id, donor_email, int(amount_cents or 0)
+
+
+def iter_campaign_donor_emails(
+    campaign_id: str,
+    *,
+    after: str | None = None,
+    through: str | None = None,
+    chunk_size: int = 5000,
+) -> Iterator[str]:
+    """
+    Distinct lower-cased emails of the campaign's succeeded donors in order,
+    optionally only those > after and <= through, via a named cursor.
+    """
+    sql = """
+    SELECT DISTINCT LOWER(donor_email::text) AS email
+    FROM donations
+    WHERE campaign_id = %s
+      AND status = 'succeeded'
+      AND donor_email IS NOT NULL
+    """
+    params: list[Any] = [campaign_id]
+    if after is not None:
+        sql += " AND LOWER(donor_email::text) > %s"
+        params.append(after)
+    if through is not None:
+        sql += " AND LOWER(donor_email::text) <= %s"
+        params.append(through)
+    sql += " ORDER BY 1"
+    name = f"donor_emails_{uuid4().hex}"
+    with get_db_connection() as conn, conn.cursor(name=name) as cur:
+        cur.itersize = chunk_size
+        cur.execute(sql, tuple(params))
+        for (email,) in cur:
+            yield email
+
+
 def recent_succeeded_for_campaign(campaign_id: str, limit: int = 10) -> list[dict]:
     sql = """
       SELECT id, donor_email, amount_cents, currency, created_at
@@ -0,0 +1,157 @@
+from typing import Any
+from app.utils.db import get_db_connection
+
+_COLS = [
+    "id",
+    "campaign_id",
+    "requested_by_user_id",
+    "format",
+    "status",
+    "rows_version",
+    "rows_total",
+    "rows_written",
+    "progress_percent",
+    "s3_key",
+    "size_bytes",
+    "error_message",
+    "created_at",
+    "updated_at",
+    "completed_at",
+]
+_RETURNING = ", ".join(_COLS)
+
+
+def get_campaign_rows_version(campaign_id: str) -> int:
+    """Counter bumped by trg_donations_rows_version whenever exported rows change."""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT rows_version FROM campaign_donation_stats WHERE campaign_id = %s",
+            (campaign_id,),
+        )
+        row = cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+def count_campaign_donations(campaign_id: str) -> int:
+    """Succeeded donations for a campaign, i.e. the rows an export writes."""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT COUNT(*)::int FROM donations"
+            " WHERE campaign_id = %s AND status = 'succeeded'",
+            (campaign_id,),
+        )
+        return cur.fetchone()[0]
+
+
+def create_export(
+    *,
+    campaign_id: str,
+    fmt: str,
+    rows_version: int,
+    requested_by_user_id: str | None = None,
+) -> dict[str, Any]:
+    sql = f"""
+    INSERT INTO donation_exports (campaign_id, requested_by_user_id, format, rows_version)
+    VALUES (%s, %s, %s, %s)
+    RETURNING {_RETURNING}
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id, requested_by_user_id, fmt, rows_version))
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_COLS, row))
+
+
+def get_export(export_id: str, campaign_id: str | None = None) -> dict[str, Any] | None:
+    sql = f"SELECT {_RETURNING} FROM donation_exports WHERE id = %s"
+    params: list[Any] = [export_id]
+    if campaign_id:
+        sql += " AND campaign_id = %s"
+        params.append(campaign_id)
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, tuple(params))
+        row = cur.fetchone()
+        return dict(zip(_COLS, row)) if row else None
+
+
+def lock_export_requests(campaign_id: str, fmt: str) -> None:
+    """
+    Serialize export requests for one campaign and format until the current
+    transaction ends, so concurrent requests cannot both create an export.
+    Only meaningful inside a unit of work.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(hashtext('donation_exports'), hashtext(%s))",
+            (f"{campaign_id}:{fmt}",),
+        )
+
+
+def fail_stale_exports(campaign_id: str, fmt: str, stale_after_seconds: int) -> int:
+    """
+    Mark queued/running exports with no progress for stale_after_seconds as
+    failed (their worker crashed or the job timed out), so they are not
+    reused. Returns how many were marked.
+    """
+    sql = """
+    UPDATE donation_exports
+    SET status = 'failed',
+        error_message = 'export stalled (worker lost or job timed out)',
+        completed_at = now(),
+        updated_at = now()
+    WHERE campaign_id = %s AND format = %s
+      AND status IN ('queued', 'running')
+      AND updated_at < now() - make_interval(secs => %s)
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id, fmt, int(stale_after_seconds)))
+        count = cur.rowcount
+        conn.commit()
+        return count
+
+
+def find_reusable_export(
+    campaign_id: str, fmt: str, rows_version: int
+) -> dict[str, Any] | None:
+    """Newest export of this data version that succeeded or is still in flight."""
+    sql = f"""
+    SELECT {_RETURNING}
+    FROM donation_exports
+    WHERE campaign_id = %s AND format = %s AND rows_version = %s AND status <> 'failed'
+    ORDER BY (status = 'succeeded') DESC, created_at DESC
+    LIMIT 1
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (campaign_id, fmt, rows_version))
+        row = cur.fetchone()
+        return dict(zip(_COLS, row)) if row else None
+
+
+def update_export(export_id: str, **fields: Any) -> dict[str, Any] | None:
+    """
+    Set any of status, rows_version, rows_total, rows_written,
+    progress_percent, s3_key, size_bytes, error_message. Reaching succeeded
+    or failed stamps completed_at.
+    """
+    allowed = set(_COLS) - {"id", "campaign_id", "created_at", "updated_at"}
+    sets, params = [], []
+    for name, value in fields.items():
+        if name not in allowed or name == "completed_at":
+            raise ValueError(f"unknown export field: {name}")
+        sets.append(f"{name} = %s")
+        params.append(value)
+    if fields.get("status") in ("succeeded", "failed"):
+        sets.append("completed_at = now()")
+    if not sets:
+        return get_export(export_id)
+    sets.append("updated_at = now()")
+    sql = f"""
+    UPDATE donation_exports SET {', '.join(sets)} WHERE id = %s
+    RETURNING {_RETURNING}
+    """
+    params.append(export_id)
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, tuple(params))
+        row = cur.fetchone()
+        conn.commit()
+        return dict(zip(_COLS, row)) if row else None
@@ -1,9 +1,21 @@
-from typing import Any, List, Dict, Optional
+import hashlib
+import os
+from typing import Any, List, Dict, Iterable, Optional, Sequence
+from jinja2 import Template
+from jinja2.sandbox import SandboxedEnvironment
 from app.utils.db import get_db_connection
-from flask import render_template_string
-from app.models.org_email_settings import get_email_settings
+from app.utils.local_cache import local_cache
+from app.models.org_email_settings import (
+    EMAIL_TEMPLATES_L1,
+    get_email_settings_cached,
+)
 from app.models.campaign import get_campaign
 
+# Org templates are tenant input: render them sandboxed, autoescaped like
+# Flask's render_template_string, and without the app's template globals.
+_TEMPLATE_ENV = SandboxedEnvironment(autoescape=True)
+_TEMPLATE_L1_TTL = float(os.getenv("EMAIL_TEMPLATE_L1_TTL", "3600"))
+
 DEFAULT_SUBJECT = "Thanks for your donation to {{ campaign.title }}!"
 DEFAULT_TEXT = """Hi,
 
@@ -134,13 +146,46 @@ def _format_amount(cents: int) -> str:
     return f"{cents/100:.2f}"
 
 
+def _compiled(org_id: str, kind: str, source: str) -> Template:
+    """
+    The compiled template for (org, kind, source). Cached per org and kind;
+    the source hash is checked on every hit, so an edited template is
+    recompiled even before the settings invalidation arrives.
+    """
+    cache = local_cache(EMAIL_TEMPLATES_L1, ttl_seconds=_TEMPLATE_L1_TTL)
+    key = f"{org_id}:{kind}"
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    cached = cache.get(key)
+    if cached is not None and cached[0] == digest:
+        return cached[1]
+    epoch = cache.epoch()
+    template = _TEMPLATE_ENV.from_string(source)
+    cache.set(key, (digest, template), epoch=epoch)
+    return template
+
+
+def _templates(org_id: str, prefix: str, defaults: Sequence[str]) -> List[Template]:
+    org_cfg = get_email_settings_cached(org_id) or {}
+    return [
+        _compiled(org_id, f"{prefix}_{part}", org_cfg.get(f"{prefix}_{part}") or dflt)
+        for part, dflt in zip(("subject", "text", "html"), defaults)
+    ]
+
+
+def _render(templates: List[Template], ctx: Dict[str, Any]) -> Dict[str, str]:
+    subject, text, html = templates
+    return {
+        "subject": subject.render(ctx),
+        "body_text": text.render(ctx),
+        "body_html": html.render(ctx),
+    }
+
+
 def render_receipt_content(org_id: str, donation_row: Dict[str, Any]) -> Dict[str, str]:
     camp = get_campaign(donation_row["campaign_id"]) or {}
-    org_cfg = get_email_settings(org_id) or {}
-    subject_tpl = org_cfg.get("receipt_subject") or DEFAULT_SUBJECT
-    text_tpl = org_cfg.get("receipt_text") or DEFAULT_TEXT
-    html_tpl = org_cfg.get("receipt_html") or DEFAULT_HTML
-
+    templates = _templates(
+        org_id, "receipt", (DEFAULT_SUBJECT, DEFAULT_TEXT, DEFAULT_HTML)
+    )
     ctx = {
         "org": {"id": org_id},
         "campaign": {"id": camp.get("id"), "title": camp.get("title", "Our campaign")},
@@ -151,11 +196,36 @@ def render_receipt_content(org_id: str, donation_row: Dict[str, Any]) -> Dict[st
         "amount": _format_amount(int(donation_row.get("amount_cents") or 0)),
         "donor_email": donation_row.get("donor_email"),
     }
+    return _render(templates, ctx)
 
-    subject = render_template_string(subject_tpl, **ctx)
-    body_text = render_template_string(text_tpl, **ctx)
-    body_html = render_template_string(html_tpl, **ctx)
-    return {"subject": subject, "body_text": body_text, "body_html": body_html}
+
+def render_winner_contents(
+    org_id: str,
+    campaign_title: str,
+    winner_emails: Iterable[Optional[str]],
+    prize_cents: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    """Render the winner email for each address against one set of templates."""
+    templates = _templates(
+        org_id,
+        "winner",
+        (DEFAULT_WINNER_SUBJECT, DEFAULT_WINNER_TEXT, DEFAULT_WINNER_HTML),
+    )
+    prize_amount = None
+    if prize_cents is not None and prize_cents > 0:
+        prize_amount = _format_amount(prize_cents)
+    return [
+        _render(
+            templates,
+            {
+                "org": {"id": org_id},
+                "campaign": {"title": campaign_title},
+                "winner_email": winner_email,
+                "prize_amount": prize_amount,
+            },
+        )
+        for winner_email in winner_emails
+    ]
 
 
 def render_winner_content(
@@ -164,21 +234,6 @@ def render_winner_content(
     winner_email: Optional[str] = None,
     prize_cents: Optional[int] = None,
 ) -> Dict[str, str]:
-    org_cfg = get_email_settings(org_id) or {}
-    subject_tpl = org_cfg.get("winner_subject") or DEFAULT_WINNER_SUBJECT
-    text_tpl = org_cfg.get("winner_text") or DEFAULT_WINNER_TEXT
-    html_tpl = org_cfg.get("winner_html") or DEFAULT_WINNER_HTML
-    prize_amount = None
-    if prize_cents is not None and prize_cents > 0:
-        prize_amount = _format_amount(prize_cents)
-    ctx = {
-        "org": {"id": org_id},
-        "campaign": {"title": campaign_title},
-        "winner_email": winner_email,
-        "prize_amount": prize_amount,
-    }
-    return {
-        "subject": render_template_string(subject_tpl, **ctx),
-        "body_text": render_template_string(text_tpl, **ctx),
-        "body_html": render_template_string(html_tpl, **ctx),
-    }
+    return render_winner_contents(
+        org_id, campaign_title, [winner_email], prize_cents=prize_cents
+    )[0]
@@ -1,5 +1,6 @@
 from typing import Any
-from app.utils.db import get_db_connection
+from app.utils.db import after_commit, get_db_connection
+from app.utils.public_resolver import invalidate_org_subdomain
 from app.utils.slug import slugify as _slugify
 import secrets
 
@@ -16,6 +17,7 @@ def create_organization(name: str, subdomain: str | None = None):
         row = cur.fetchone()
         conn.commit()
 
+    after_commit(lambda: invalidate_org_subdomain(row[2]))
     return {"id": row[0], "name": row[1], "subdomain": row[2]}
 
 
@@ -120,6 +122,12 @@ def upsert_org_payout_account(
 
 def delete_organization(org_id: str) -> bool:
     with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute("DELETE FROM organizations WHERE id = %s", (org_id,))
+        cur.execute(
+            "DELETE FROM organizations WHERE id = %s RETURNING subdomain", (org_id,)
+        )
+        row = cur.fetchone()
         conn.commit()
-        return cur.rowcount > 0
+    if not row:
+        return False
+    after_commit(lambda: invalidate_org_subdomain(row[0]))
+    return True
@@ -1,5 +1,21 @@
+import os
 from typing import Any, Dict, Optional
-from app.utils.db import get_db_connection
+from app.utils.db import after_commit, get_db_connection
+from app.utils.local_cache import invalidate_local, local_cache
+
+# In-process caches for email rendering, dropped (in every process, via
+# the L1 invalidation channel) when an org's settings change.
+SETTINGS_L1 = "org_email_settings"
+EMAIL_TEMPLATES_L1 = "email_templates"
+EMAIL_TEMPLATE_KINDS = (
+    "receipt_subject",
+    "receipt_text",
+    "receipt_html",
+    "winner_subject",
+    "winner_text",
+    "winner_html",
+)
+_SETTINGS_L1_TTL = float(os.getenv("EMAIL_SETTINGS_L1_TTL", "300"))
 
 COLS = [
     "org_id",
@@ -49,6 +65,26 @@ def get_email_settings(org_id: str) -> Optional[Dict[str, Any]]:
         return dict(zip(cols, row))
 
 
+def get_email_settings_cached(org_id: str) -> Optional[Dict[str, Any]]:
+    """get_email_settings through the in-process cache; treat as read-only."""
+    cache = local_cache(SETTINGS_L1, ttl_seconds=_SETTINGS_L1_TTL)
+    key = str(org_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
+    epoch = cache.epoch()
+    settings = get_email_settings(org_id)
+    cache.set(key, settings or {}, epoch=epoch)
+    return settings
+
+
+def invalidate_email_settings(org_id: str) -> None:
+    """Drop the org's cached settings and compiled templates everywhere."""
+    invalidate_local(SETTINGS_L1, str(org_id))
+    for kind in EMAIL_TEMPLATE_KINDS:
+        invalidate_local(EMAIL_TEMPLATES_L1, f"{org_id}:{kind}")
+
+
 def upsert_email_settings(
     org_id: str,
     from_name: Optional[str] = None,
@@ -116,6 +152,10 @@ def upsert_email_settings(
         cur.execute(sql, [org_id, *vals])
         row = cur.fetchone()
         conn.commit()
+        # Inside a unit of work the commit above is deferred; dropping the
+        # caches before the real commit would let other processes re-cache
+        # the old settings.
+        after_commit(lambda: invalidate_email_settings(org_id))
         cols = [
             "org_id",
             "from_name",
@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.utils.db import get_db_connection
+from psycopg2.extras import Json, execute_values
+
+_COLS = ["id", "kind", "payload", "attempts", "created_at"]
+
+
+def insert_outbox_events(events: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Record (kind, payload) side effects. Inside a unit of work they commit
+    (or roll back) with the change that caused them.
+    """
+    rows = [(kind, Json(payload)) for kind, payload in events]
+    if not rows:
+        return 0
+    with get_db_connection() as conn, conn.cursor() as cur:
+        execute_values(cur, "INSERT INTO outbox_events (kind, payload) VALUES %s", rows)
+        conn.commit()
+        return len(rows)
+
+
+def claim_outbox_events(limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Claim up to limit due events, oldest first, by pushing their
+    next_attempt_at out by lease_seconds; concurrent dispatchers skip rows
+    another one is claiming. attempts counts this delivery.
+    """
+    sql = """
+    UPDATE outbox_events o
+    SET attempts = o.attempts + 1,
+        next_attempt_at = now() + make_interval(secs => %s)
+    FROM (
+        SELECT id FROM outbox_events
+        WHERE status = 'pending' AND next_attempt_at <= now()
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ) due
+    WHERE o.id = due.id
+    RETURNING o.id, o.kind, o.payload, o.attempts, o.created_at
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (lease_seconds, int(limit)))
+        rows = cur.fetchall()
+        conn.commit()
+        return sorted((dict(zip(_COLS, r)) for r in rows), key=lambda e: e["id"])
+
+
+def mark_outbox_events_done(ids: List[int]) -> None:
+    if not ids:
+        return
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE outbox_events
+            SET status = 'done', processed_at = now(), last_error = NULL
+            WHERE id = ANY(%s)
+            """,
+            (list(ids),),
+        )
+        conn.commit()
+
+
+def record_outbox_failure(
+    event_id: int, error: str, *, max_attempts: int, retry_in_seconds: float
+) -> Optional[str]:
+    """
+    Schedule a retry of a failed delivery, or dead-letter the event once it
+    has had max_attempts. Returns the new status.
+    """
+    sql = """
+    UPDATE outbox_events
+    SET last_error = %s,
+        status = CASE WHEN attempts >= %s THEN 'dead' ELSE 'pending' END,
+        next_attempt_at = now() + make_interval(secs => %s)
+    WHERE id = %s AND status = 'pending'
+    RETURNING status
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql, ((error or "")[:2000], int(max_attempts), retry_in_seconds, event_id)
+        )
+        row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
+
+
+def outbox_backlog() -> Tuple[int, float]:
+    """(pending event count, age in seconds of the oldest pending event)."""
+    sql = """
+    SELECT COUNT(*)::int,
+           COALESCE(EXTRACT(EPOCH FROM now() - MIN(created_at)), 0)::float
+    FROM outbox_events
+    WHERE status = 'pending'
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql)
+        row = cur.fetchone()
+        return int(row[0] or 0), float(row[1] or 0)
+
+
+def delete_processed_outbox_events(older_than_seconds: int) -> int:
+    sql = """
+    DELETE FROM outbox_events
+    WHERE status = 'done'
+      AND processed_at < now() - make_interval(secs => %s)
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (older_than_seconds,))
+        conn.commit()
+        return cur.rowcount
@@ -25,3 +25,164 @@ def mark_event_processed(
         row = cur.fetchone()
         conn.commit()
         return row is not None
+
+
+_PENDING_COLS = [
+    "event_id",
+    "type",
+    "raw",
+    "ordering_key",
+    "attempts",
+    "created_at",
+    "due",
+    "next_attempt_at",
+]
+
+
+def insert_pending_event(
+    event_id: str,
+    event_type: str,
+    raw_event: dict[str, Any],
+    *,
+    ordering_key: str,
+    event_created: int | None = None,
+) -> bool:
+    """
+    Persist an event for asynchronous processing (status 'pending').
+    Returns True if inserted, False if the event_id was already received.
+    """
+    sql = """
+    INSERT INTO stripe_events (event_id, type, raw, status, ordering_key, event_created_at)
+    VALUES (%s, %s, %s, 'pending', %s, to_timestamp(%s))
+    ON CONFLICT (event_id) DO NOTHING
+    RETURNING event_id
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql, (event_id, event_type, Json(raw_event), ordering_key, event_created)
+        )
+        row = cur.fetchone()
+        conn.commit()
+        return row is not None
+
+
+def try_lock_ordering_key(ordering_key: str) -> bool:
+    """
+    Serialize processing of one ordering key across workers until the current
+    transaction ends. Only meaningful inside a unit of work. Does not wait:
+    returns False at once if another worker holds the key.
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT pg_try_advisory_xact_lock(hashtext('stripe_events'), hashtext(%s))",
+            (ordering_key,),
+        )
+        return bool(cur.fetchone()[0])
+
+
+def get_next_pending_event(ordering_key: str) -> dict[str, Any] | None:
+    """
+    Oldest pending event for an ordering key (Stripe creation time, then
+    receipt time). "due" is False while it is waiting for a retry backoff.
+    """
+    sql = """
+    SELECT event_id, type, raw, ordering_key, attempts, created_at,
+           (next_attempt_at IS NULL OR next_attempt_at <= now()) AS due,
+           next_attempt_at
+    FROM stripe_events
+    WHERE ordering_key = %s AND status = 'pending'
+    ORDER BY event_created_at NULLS LAST, created_at, event_id
+    LIMIT 1
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (ordering_key,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return dict(zip(_PENDING_COLS, row))
+
+
+def mark_pending_event_processed(event_id: str) -> None:
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE stripe_events
+            SET status = 'processed', processed_at = now(), last_error = NULL
+            WHERE event_id = %s
+            """,
+            (event_id,),
+        )
+        conn.commit()
+
+
+def record_event_failure(
+    event_id: str, error: str, *, max_attempts: int, retry_in_seconds: float
+) -> dict[str, Any] | None:
+    """
+    Count a failed attempt. After max_attempts the event is dead-lettered
+    (status 'dead'); otherwise it stays pending until next_attempt_at.
+    Returns {"status", "attempts", "next_attempt_at"} or None if not pending.
+    """
+    sql = """
+    UPDATE stripe_events
+    SET attempts = attempts + 1,
+        last_error = %s,
+        status = CASE WHEN attempts + 1 >= %s THEN 'dead' ELSE 'pending' END,
+        next_attempt_at = now() + make_interval(secs => %s)
+    WHERE event_id = %s AND status = 'pending'
+    RETURNING status, attempts, next_attempt_at
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            sql, ((error or "")[:2000], int(max_attempts), retry_in_seconds, event_id)
+        )
+        row = cur.fetchone()
+        conn.commit()
+        if not row:
+            return None
+        return {"status": row[0], "attempts": row[1], "next_attempt_at": row[2]}
+
+
+def list_due_ordering_keys(limit: int = 500) -> list[str]:
+    """Ordering keys whose oldest pending event is ready to be processed."""
+    sql = """
+    SELECT ordering_key
+    FROM stripe_events
+    WHERE status = 'pending'
+      AND (next_attempt_at IS NULL OR next_attempt_at <= now())
+    GROUP BY ordering_key
+    ORDER BY MIN(created_at)
+    LIMIT %s
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (int(limit),))
+        return [r[0] for r in cur.fetchall()]
+
+
+def pending_events_backlog() -> tuple[int, float]:
+    """(pending event count, age in seconds of the oldest pending event)."""
+    sql = """
+    SELECT COUNT(*)::int,
+           COALESCE(EXTRACT(EPOCH FROM now() - MIN(created_at)), 0)::float
+    FROM stripe_events
+    WHERE status = 'pending'
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql)
+        row = cur.fetchone()
+        return int(row[0] or 0), float(row[1] or 0)
+
+
+def requeue_dead_event(event_id: str) -> str | None:
+    """Move a dead-lettered event back to pending. Returns its ordering_key."""
+    sql = """
+    UPDATE stripe_events
+    SET status = 'pending', attempts = 0, next_attempt_at = NULL
+    WHERE event_id = %s AND status = 'dead'
+    RETURNING ordering_key
+    """
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(sql, (event_id,))
+        row = cur.fetchone()
+        conn.commit()
+        return row[0] if row else None
@@ -1,11 +1,35 @@
+"""
+Socket.IO server and emit helpers.
+
+With a message queue (SOCKETIO_MESSAGE_QUEUE, default REDIS_URL) every
+emit is published on Redis and each web instance delivers it to its own
+connected clients, so an event raised in one container reaches viewers
+connected to any other. Processes without the Socket.IO server (RQ
+workers, scripts) emit through broadcast(), which publishes via a
+write-only client manager on the same channel.
+
+Joining a campaign room returns a snapshot of its progress and recent
+donations, or, when the client passes the last_seq it saw, the events it
+missed (see app.realtime.stream). Viewer counts per room are kept by
+app.realtime.presence.
+"""
+
 import os
+import threading
+from typing import Any
+
 from flask_socketio import SocketIO, join_room, leave_room, emit
 from flask import request
 from flask_jwt_extended import decode_token
 
+from app.utils.cache import REDIS_URL
+
 _raw = os.getenv("SOCKETIO_CORS_ORIGINS", "*").strip()
 CORS_ORIGINS = "*" if _raw == "*" else [o.strip() for o in _raw.split(",") if o.strip()]
 REQUIRE_AUTH = os.getenv("SOCKETIO_REQUIRE_AUTH", "0") == "1"
+# Set SOCKETIO_MESSAGE_QUEUE to an empty string for a single-instance setup.
+MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", REDIS_URL).strip()
+CHANNEL = os.getenv("SOCKETIO_CHANNEL", "flask-socketio")
 
 socketio = SocketIO(
     cors_allowed_origins=CORS_ORIGINS,
@@ -15,8 +39,68 @@ socketio = SocketIO(
 )
 
 
+_external: SocketIO | None = None
+_external_lock = threading.Lock()
+
+
+def _queue_options() -> dict[str, Any]:
+    if not MESSAGE_QUEUE:
+        return {}
+    return {"message_queue": MESSAGE_QUEUE, "channel": CHANNEL}
+
+
+def get_emitter() -> SocketIO:
+    """
+    The SocketIO to emit with: the server in a web process, otherwise a
+    write-only publisher on the message queue (created on first use).
+    Without a message queue, emits outside the web process go nowhere.
+    """
+    global _external
+    if socketio.server is not None or not MESSAGE_QUEUE:
+        return socketio
+    with _external_lock:
+        if _external is None:
+            _external = SocketIO(async_mode="threading", **_queue_options())
+        return _external
+
+
+def broadcast(event: str, data: Any, *, room: str) -> None:
+    """Emit event to everyone in room, on every instance."""
+    emitter = get_emitter()
+    if emitter.server is None:
+        return
+    emitter.emit(event, data, to=room)
+
+
+def _join_payload(campaign_id: str, room: str, last_seq: Any) -> dict[str, Any]:
+    from app.realtime.stream import current_seq, events_since
+    from app.services.campaign_progress_service import (
+        get_campaign_progress,
+        get_recent_donations,
+    )
+
+    payload: dict[str, Any] = {"room": room, "resumed": False}
+    try:
+        if last_seq is not None:
+            missed, seq = events_since(room, int(last_seq))
+            if missed is not None:
+                for event, data in missed:
+                    emit(event, data)
+                return {**payload, "seq": seq, "resumed": True}
+        else:
+            seq = current_seq(room)
+        payload["seq"] = seq
+        payload["snapshot"] = {
+            "progress": get_campaign_progress(campaign_id),
+            "recent_donations": get_recent_donations(campaign_id),
+        }
+    except Exception as e:
+        print(f"[socket] join snapshot {room} failed: {e}", flush=True)
+    return payload
+
+
 def init_socketio(app):
-    socketio.init_app(app)
+    socketio.init_app(app, **_queue_options())
 
     def _validate_token(data) -> bool:
         if not REQUIRE_AUTH:
@@ -47,6 +131,9 @@ def init_socketio(app):
 
     @socketio.on("disconnect")
     def handle_disconnect():
+        from app.realtime.presence import presence
+
+        presence.disconnect(request.sid)
         print("[socket] disconnect")
 
     @socketio.on("join_campaign")
@@ -60,7 +147,12 @@ def init_socketio(app):
             return
         room = f"campaign:{cid}"
         join_room(room)
-        emit("joined", {"room": room})
+        from app.realtime.presence import presence
+
+        presence.join(request.sid, room)
+        # Joined before reading, so nothing published from here on is missed;
+        # the client drops anything it sees twice by seq.
+        emit("joined", _join_payload(str(cid), room, (data or {}).get("last_seq")))
 
     @socketio.on("leave_campaign")
     def on_leave(data):
@@ -72,4 +164,7 @@ def init_socketio(app):
             return
         room = f"campaign:{cid}"
         leave_room(room)
+        from app.realtime.presence import presence
+
+        presence.leave(request.sid, room)
         emit("left", {"room": room})
@@ -0,0 +1,293 @@
+"""
+Per-room broadcast aggregation for high-rate events.
+
+RoomAggregator coalesces events per room into frames, at most one frame per
+window per room across every instance. Pending events, the room's latest
+state and its frame slot live in Redis, so web processes and RQ workers
+share one window per room:
+
+- add() appends the event to the room's pending batch and, in the same Lua
+  script, tries to take the room's frame slot (SET NX PX window). If the
+  slot is free (a quiet room) the batch is cut and sent at once by the
+  caller. Otherwise the room is put on a due set, scored with the time the
+  slot frees.
+- Each web process runs a flusher thread (started by create_app()) that
+  claims due rooms the same way and sends their frames. Only the instance
+  that takes the slot sends, so a room gets one frame per window however
+  many instances see its events.
+
+A frame keeps the latest max_batch events plus the room's latest state
+(e.g. total_raised), and counts everything it stands for. Events can reach
+Redis out of order from different instances, so a `monotonic` state field
+never goes below the highest value seen for the room in the last minute
+(a refund's lower total shows once the room has been quiet that long, and
+at once in snapshots).
+
+If Redis is unreachable the event is broadcast immediately as a frame of
+one, uncapped, rather than dropped.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.realtime import broadcast
+from app.realtime.stream import publish
+from app.utils.cache import r
+from app.utils.metrics import (
+    REALTIME_EVENTS_COALESCED,
+    REALTIME_FANOUT_LATENCY_SECONDS,
+    REALTIME_FRAMES_SENT,
+)
+
+logger = logging.getLogger(__name__)
+
+DONATION_BROADCAST_WINDOW_MS = int(os.getenv("DONATION_BROADCAST_WINDOW_MS", "250"))
+DONATION_BROADCAST_MAX_BATCH = int(os.getenv("DONATION_BROADCAST_MAX_BATCH", "20"))
+
+# How long pending events wait for a flusher, and how long a room's
+# monotonic floor outlives its last frame.
+_KEY_TTL_MS = 60_000
+# Due rooms claimed per flusher pass.
+_FLUSH_LIMIT = 100
+
+FrameBuilder = Callable[[List[Dict[str, Any]], Dict[str, Any], int], Dict[str, Any]]
+
+# KEYS: items, meta, slot, floor, due. ARGV[1]: window ms, ARGV[2]: room.
+# Cuts the room's pending batch if its slot is free; otherwise (re)schedules
+# the room for when the slot frees. Returns {0} or
+# {1, items, count, first ms, state json, floor, now ms}.
+_TAKE_LUA = """
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+if #items == 0 then
+  redis.call('ZREM', KEYS[5], ARGV[2])
+  return {0}
+end
+if redis.call('SET', KEYS[3], '1', 'NX', 'PX', ARGV[1]) then
+  local meta = redis.call('HMGET', KEYS[2], 'count', 'first', 'state')
+  redis.call('DEL', KEYS[1], KEYS[2])
+  redis.call('ZREM', KEYS[5], ARGV[2])
+  return {1, items, meta[1] or '1', meta[2] or now, meta[3] or '',
+          redis.call('GET', KEYS[4]) or '', now}
+end
+redis.call('ZADD', KEYS[5], now + math.max(redis.call('PTTL', KEYS[3]), 0), ARGV[2])
+return {0}
+"""
+
+# Same KEYS; ARGV[3..]: item json, state json ('' keeps the current one),
+# monotonic value ('' if none), max batch, key ttl ms. Appends the event,
+# then takes as above.
+_ADD_LUA = """
+redis.call('RPUSH', KEYS[1], ARGV[3])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[6]), -1)
+redis.call('HINCRBY', KEYS[2], 'count', 1)
+redis.call('HSETNX', KEYS[2], 'first', now)
+if ARGV[4] ~= '' then
+  redis.call('HSET', KEYS[2], 'state', ARGV[4])
+end
+if ARGV[5] ~= '' then
+  local floor = tonumber(redis.call('GET', KEYS[4]))
+  if not floor or tonumber(ARGV[5]) >= floor then
+    redis.call('SET', KEYS[4], ARGV[5], 'PX', ARGV[7])
+  end
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[7])
+redis.call('PEXPIRE', KEYS[2], ARGV[7])
+"""
+
+_NOW_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+"""
+
+_scripts: Dict[str, Any] = {}
+
+
+def _script(source: str):
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = r().register_script(source)
+    return script
+
+
+class RoomAggregator:
+    """Coalesce events per room into at most one frame per window; see module docstring."""
+
+    def __init__(
+        self,
+        event: str,
+        build_frame: FrameBuilder,
+        *,
+        window_seconds: float,
+        max_batch: int,
+        monotonic: Optional[str] = None,
+        emit: Optional[Callable[..., None]] = None,
+    ):
+        self.event = event
+        self.build_frame = build_frame
+        self.window = max(0.0, float(window_seconds))
+        self.max_batch = max(1, int(max_batch))
+        self.monotonic = monotonic
+        self._emit = emit or broadcast
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _keys(self, room: str) -> List[str]:
+        prefix = f"rt:agg:{self.event}:{room}"
+        return [
+            f"{prefix}:items",
+            f"{prefix}:meta",
+            f"{prefix}:slot",
+            f"{prefix}:floor",
+            self._due_key(),
+        ]
+
+    def _due_key(self) -> str:
+        return f"rt:agg:{self.event}:due"
+
+    def add(
+        self, room: str, item: Dict[str, Any], state: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Queue item for room; state replaces the room's latest state."""
+        state = state or {}
+        if self.window <= 0:
+            self._send(room, [item], state, 1, 0.0)
+            return
+        value = state.get(self.monotonic) if self.monotonic else None
+        try:
+            reply = _script(_NOW_LUA + _ADD_LUA + _TAKE_LUA)(
+                keys=self._keys(room),
+                args=[
+                    int(self.window * 1000),
+                    room,
+                    json.dumps(item, default=str),
+                    json.dumps(state, default=str) if state else "",
+                    "" if value is None else str(value),
+                    self.max_batch,
+                    _KEY_TTL_MS,
+                ],
+            )
+        except Exception as e:
+            logger.warning("realtime aggregate %s %s failed: %s", self.event, room, e)
+            self._send(room, [item], state, 1, 0.0)
+            return
+        self._send_taken(room, reply)
+
+    def flush(self) -> int:
+        """Send every due room whose slot this instance takes. Returns frames sent."""
+        now_ms = int(time.time() * 1000)
+        rooms = r().zrangebyscore(
+            self._due_key(), "-inf", now_ms, start=0, num=_FLUSH_LIMIT
+        )
+        sent = 0
+        for room in rooms:
+            try:
+                reply = _script(_NOW_LUA + _TAKE_LUA)(
+                    keys=self._keys(room), args=[int(self.window * 1000), room]
+                )
+            except Exception as e:
+                logger.warning("realtime flush %s %s failed: %s", self.event, room, e)
+                continue
+            sent += self._send_taken(room, reply)
+        return sent
+
+    def _next_due_in(self) -> Optional[float]:
+        due = r().zrange(self._due_key(), 0, 0, withscores=True)
+        if not due:
+            return None
+        return max(0.0, due[0][1] / 1000.0 - time.time())
+
+    def _send_taken(self, room: str, reply) -> bool:
+        if not reply or int(reply[0]) != 1:
+            return False
+        _, items, count, first_ms, state, floor, now_ms = reply
+        state = json.loads(state) if state else {}
+        if floor and state.get(self.monotonic) is not None:
+            state[self.monotonic] = max(float(state[self.monotonic]), float(floor))
+        self._send(
+            room,
+            [json.loads(item) for item in items],
+            state,
+            int(count),
+            max(0.0, (int(now_ms) - int(first_ms)) / 1000.0),
+        )
+        return True
+
+    def _send(
+        self,
+        room: str,
+        items: List[Dict[str, Any]],
+        state: Dict[str, Any],
+        count: int,
+        waited: float,
+    ) -> None:
+        started = time.monotonic()
+        try:
+            self._emit(self.event, self.build_frame(items, state, count), room=room)
+        except Exception as e:
+            logger.warning("realtime broadcast %s %s failed: %s", self.event, room, e)
+            return
+        REALTIME_FRAMES_SENT.labels(event=self.event).inc()
+        if count > 1:
+            REALTIME_EVENTS_COALESCED.labels(event=self.event).inc(count - 1)
+        REALTIME_FANOUT_LATENCY_SECONDS.labels(event=self.event).observe(
+            waited + time.monotonic() - started
+        )
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.flush()
+                delay = self._next_due_in()
+            except Exception as e:
+                logger.warning("realtime flusher %s failed: %s", self.event, e)
+                delay = None
+            # Poll at least once a window for rooms deferred by other
+            # instances; never spin if clocks disagree about a due time.
+            time.sleep(
+                max(0.01, min(self.window, delay if delay is not None else self.window))
+            )
+
+    def start(self) -> None:
+        """Flush on a daemon (green) thread in this process, once."""
+        with self._lock:
+            if self._started or self.window <= 0:
+                return
+            self._started = True
+        threading.Thread(
+            target=self._run, name=f"realtime-{self.event}", daemon=True
+        ).start()
+
+
+def _donation_frame(
+    items: List[Dict[str, Any]], state: Dict[str, Any], count: int
+) -> Dict[str, Any]:
+    # The latest donation stays at the top level, so clients that read a
+    # single donation per event keep working.
+    return {**items[-1], **state, "donations": items, "count": count}
+
+
+donation_broadcasts = RoomAggregator(
+    "donation",
+    _donation_frame,
+    window_seconds=DONATION_BROADCAST_WINDOW_MS / 1000.0,
+    max_batch=DONATION_BROADCAST_MAX_BATCH,
+    monotonic="total_raised",
+    emit=publish,
+)
+
+
+def broadcast_donation(
+    campaign_id: str, donation: Dict[str, Any], total_raised: float
+) -> None:
+    """Queue a (masked) donation for campaign:{id}'s next donation frame."""
+    donation_broadcasts.add(
+        f"campaign:{campaign_id}",
+        donation,
+        {"campaign_id": campaign_id, "total_raised": total_raised},
+    )
@@ -0,0 +1,195 @@
+"""
+Live viewer counts per room.
+
+Each web instance counts its own sockets per room in memory, so a join,
+leave or disconnect is a dict update and never touches Redis. A heartbeat
+thread writes those counts to one Redis hash per room (rt:viewers:{room},
+field = instance id, value = "count:unix time") every
+VIEWER_HEARTBEAT_SECONDS and sends each local room the cluster-wide total
+as a `viewers` event, to this instance's sockets only (every instance does
+the same for its own). A room's total is the sum of its fresh fields; an
+instance that stops heartbeating drops out after VIEWER_STALE_SECONDS.
+
+Counts are per socket, so a viewer with two tabs counts twice.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Set
+
+from app.utils.cache import r
+from app.utils.local_cache import local_cache
+
+logger = logging.getLogger(__name__)
+
+VIEWER_HEARTBEAT_SECONDS = float(os.getenv("VIEWER_HEARTBEAT_SECONDS", "5"))
+VIEWER_STALE_SECONDS = float(
+    os.getenv("VIEWER_STALE_SECONDS", str(VIEWER_HEARTBEAT_SECONDS * 3))
+)
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _viewers_key(room: str) -> str:
+    return f"rt:viewers:{room}"
+
+
+class RoomPresence:
+    """This instance's sockets per room; see module docstring."""
+
+    def __init__(self, instance_id: str = INSTANCE_ID):
+        self.instance_id = instance_id
+        self._counts: Dict[str, int] = {}
+        self._sid_rooms: Dict[str, Set[str]] = {}
+        self._emptied: Set[str] = set()
+        self._last_sent: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def join(self, sid: str, room: str) -> None:
+        with self._lock:
+            rooms = self._sid_rooms.setdefault(sid, set())
+            if room in rooms:
+                return
+            rooms.add(room)
+            self._counts[room] = self._counts.get(room, 0) + 1
+            self._emptied.discard(room)
+
+    def leave(self, sid: str, room: str) -> None:
+        with self._lock:
+            rooms = self._sid_rooms.get(sid)
+            if not rooms or room not in rooms:
+                return
+            rooms.discard(room)
+            if not rooms:
+                del self._sid_rooms[sid]
+            self._decrement(room)
+
+    def disconnect(self, sid: str) -> None:
+        with self._lock:
+            for room in self._sid_rooms.pop(sid, ()):
+                self._decrement(room)
+
+    def _decrement(self, room: str) -> None:
+        count = self._counts.get(room, 0) - 1
+        if count > 0:
+            self._counts[room] = count
+        else:
+            self._counts.pop(room, None)
+            self._last_sent.pop(room, None)
+            self._emptied.add(room)
+
+    def local_count(self, room: str) -> int:
+        return self._counts.get(room, 0)
+
+    def heartbeat(self) -> Dict[str, int]:
+        """Publish this instance's counts; returns the total for each local room."""
+        with self._lock:
+            counts = dict(self._counts)
+            emptied, self._emptied = self._emptied, set()
+        if not counts and not emptied:
+            return {}
+        now = time.time()
+        ttl = max(1, int(VIEWER_STALE_SECONDS * 2))
+        pipe = r().pipeline(transaction=False)
+        for room in emptied:
+            pipe.hdel(_viewers_key(room), self.instance_id)
+        rooms = list(counts)
+        for room in rooms:
+            key = _viewers_key(room)
+            pipe.hset(key, self.instance_id, f"{counts[room]}:{int(now)}")
+            pipe.expire(key, ttl)
+            pipe.hgetall(key)
+        results = pipe.execute()[len(emptied) :]
+        totals = {}
+        stale: Dict[str, list] = {}
+        for i, room in enumerate(rooms):
+            totals[room], stale[room] = _sum_fresh(results[i * 3 + 2], now)
+        _prune(stale)
+        return totals
+
+    def emit_totals(self, totals: Dict[str, int]) -> int:
+        """Send changed totals to this instance's sockets in each room. Returns events sent."""
+        from app.realtime import socketio
+
+        if socketio.server is None:
+            return 0
+        sent = 0
+        for room, total in totals.items():
+            with self._lock:
+                if room not in self._counts or self._last_sent.get(room) == total:
+                    continue
+                self._last_sent[room] = total
+            socketio.emit(
+                "viewers",
+                {"room": room, "viewers": total},
+                to=room,
+                ignore_queue=True,
+            )
+            sent += 1
+        return sent
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(VIEWER_HEARTBEAT_SECONDS)
+            try:
+                self.emit_totals(self.heartbeat())
+            except Exception as e:
+                logger.warning("viewer heartbeat failed: %s", e)
+
+    def start(self) -> None:
+        """Heartbeat on a daemon (green) thread in this process, once."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="realtime-viewers", daemon=True).start()
+
+
+def _sum_fresh(fields: Dict[str, str], now: float) -> tuple[int, list]:
+    total = 0
+    stale = []
+    for instance, value in (fields or {}).items():
+        count, _, beat = value.partition(":")
+        try:
+            fresh = now - float(beat) <= VIEWER_STALE_SECONDS
+            n = int(count)
+        except ValueError:
+            fresh, n = False, 0
+        if fresh:
+            total += n
+        else:
+            stale.append(instance)
+    return total, stale
+
+
+def _prune(stale: Dict[str, Iterable[str]]) -> None:
+    # Fields of instances that died without clearing them.
+    stale = {room: list(fields) for room, fields in stale.items() if fields}
+    if not stale:
+        return
+    pipe = r().pipeline(transaction=False)
+    for room, fields in stale.items():
+        pipe.hdel(_viewers_key(room), *fields)
+    pipe.execute()
+
+
+presence = RoomPresence()
+
+
+def viewer_count(room: str) -> int:
+    """Viewers in room across all instances, at most one heartbeat old."""
+    l1 = local_cache("room_viewers", ttl_seconds=VIEWER_HEARTBEAT_SECONDS)
+    cached: Optional[int] = l1.get(room)
+    if cached is not None:
+        return cached
+    total, stale = _sum_fresh(r().hgetall(_viewers_key(room)), time.time())
+    _prune({room: stale})
+    l1.set(room, total)
+    return total
@@ -0,0 +1,128 @@
+"""
+Sequenced room broadcasts with a bounded replay log.
+
+publish() gives every event sent to a room the next sequence number for
+that room (a "seq" field in the payload) and appends it to a capped Redis
+stream, rt:stream:{room}, whose entry IDs are "<seq>-0". Both happen in one
+Lua script, so sequence numbers are gapless and match the log on every
+instance.
+
+A client that reconnects with the last seq it saw gets what it missed from
+events_since(); if the log no longer covers the gap (trimmed, expired, or
+longer than ROOM_STREAM_REPLAY_MAX) it gets a fresh snapshot instead.
+Clients drop events whose seq they have already seen.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.realtime import broadcast
+from app.utils.cache import r
+
+logger = logging.getLogger(__name__)
+
+ROOM_STREAM_MAXLEN = int(os.getenv("ROOM_STREAM_MAXLEN", "500"))
+ROOM_STREAM_TTL_SECONDS = int(os.getenv("ROOM_STREAM_TTL_SECONDS", "86400"))
+ROOM_STREAM_REPLAY_MAX = int(os.getenv("ROOM_STREAM_REPLAY_MAX", "200"))
+
+# KEYS: seq counter, stream. ARGV: event, data json, maxlen, ttl.
+# The counter is bumped past the log's last entry in case it was evicted
+# on its own, since XADD needs increasing IDs.
+_APPEND_LUA = """
+local seq = redis.call('INCR', KEYS[1])
+local last = redis.call('XREVRANGE', KEYS[2], '+', '-', 'COUNT', 1)
+if last[1] then
+  local last_seq = tonumber(string.match(last[1][1], '^(%d+)'))
+  if last_seq >= seq then
+    seq = last_seq + 1
+    redis.call('SET', KEYS[1], seq)
+  end
+end
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], seq .. '-0', 'e', ARGV[1], 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return seq
+"""
+
+_append = None
+
+
+def _seq_key(room: str) -> str:
+    return f"rt:seq:{room}"
+
+
+def _stream_key(room: str) -> str:
+    return f"rt:stream:{room}"
+
+
+def _append_script():
+    global _append
+    if _append is None:
+        _append = r().register_script(_APPEND_LUA)
+    return _append
+
+
+def publish(event: str, data: Dict[str, Any], *, room: str) -> None:
+    """Broadcast data to room with the room's next seq, and log it for replay."""
+    try:
+        seq = int(
+            _append_script()(
+                keys=[_seq_key(room), _stream_key(room)],
+                args=[
+                    event,
+                    json.dumps(data, default=str),
+                    ROOM_STREAM_MAXLEN,
+                    ROOM_STREAM_TTL_SECONDS,
+                ],
+            )
+        )
+    except Exception as e:
+        # Live viewers still get the event; reconnecting ones fall back to
+        # a snapshot because the seq they hold is not in the log.
+        logger.warning("realtime stream append %s %s failed: %s", event, room, e)
+        broadcast(event, data, room=room)
+        return
+    broadcast(event, {**data, "seq": seq}, room=room)
+
+
+def current_seq(room: str) -> int:
+    return int(r().get(_seq_key(room)) or 0)
+
+
+def events_since(
+    room: str, last_seq: int
+) -> Tuple[Optional[List[Tuple[str, Dict[str, Any]]]], int]:
+    """
+    (events after last_seq as (event, data) pairs, current seq). The list is
+    None when the log cannot cover the gap and the client needs a snapshot.
+    """
+    pipe = r().pipeline(transaction=False)
+    pipe.get(_seq_key(room))
+    pipe.xrange(
+        _stream_key(room),
+        min=f"{last_seq + 1}-0",
+        max="+",
+        count=ROOM_STREAM_REPLAY_MAX + 1,
+    )
+    raw_seq, entries = pipe.execute()
+    seq = int(raw_seq or 0)
+    if last_seq > seq:
+        return None, seq  # the log was reset since the client saw it
+    if last_seq == seq:
+        return [], seq
+    if (
+        not entries
+        or len(entries) > ROOM_STREAM_REPLAY_MAX
+        or int(entries[0][0].split("-")[0]) != last_seq + 1
+    ):
+        return None, seq
+    events = []
+    for entry_id, fields in entries:
+        data = json.loads(fields["d"])
+        data["seq"] = int(entry_id.split("-")[0])
+        events.append((fields["e"], data))
+    return events, max(seq, events[-1][1]["seq"])
@@ -23,17 +23,19 @@ from app.services.platform_ai_payment import (
 from app.utils.slug import slugify
 from app.utils.domain import validate_custom_domain
 from app.utils.page_layout import validate_layout
-import json
-from app.utils.cache import r
-from app.models.donation import (
-    count_and_last_succeeded,
-    list_donations_paginated,
-    recent_succeeded_for_campaign,
-    select_donations_by_campaign,
-    summarize_succeeded_donations,
+from app.models.donation import list_donations_paginated
+from app.services.campaign_progress_service import (
+    get_campaign_progress,
+    get_recent_donations,
 )
 from app.models.media import list_media_for_campaign
-from app.services.giveaway_service import draw_winner_for_campaign
+from app.realtime.presence import viewer_count
+from app.services.giveaway_service import (
+    commit_giveaway_seed,
+    draw_winner_for_campaign,
+    get_giveaway_commitment_public,
+    verify_giveaway_draw,
+)
 from uuid import UUID
 from app.models.org_user import get_user_role_in_org, list_org_user_ids_by_roles
 from flask_jwt_extended import get_jwt_identity
@@ -80,6 +82,7 @@ from app.tasks import (
     enqueue_campaign_update_notifications,
     enqueue_ai_site_generation,
     enqueue_campaign_payout,
+    enqueue_donation_export,
 )
 from app.services.fee_policy_service import (
     FEE_OPTION_DONOR_PAYS,
@@ -90,8 +93,13 @@ from app.services.settlement_service import (
     execute_campaign_payout,
     get_campaign_finance_summary,
 )
-import csv
-import io
+from app.services.donation_export_service import (
+    ExportError,
+    request_donation_export,
+    serialize_export,
+    stream_donations_csv,
+)
+from app.models.donation_export import get_export, update_export
 
 campaigns = Blueprint("campaigns", __name__)
 
@@ -285,39 +293,18 @@ def delete(campaign_id):
 def campaign_progress(campaign_id):
     if not _is_uuid(campaign_id):
         return jsonify({"error": "invalid campaign_id"}), 400
-    key = f"campaign:{campaign_id}:progress:v1"
-    cached = r().get(key)
-    if cached:
-        return jsonify(json.loads(cached)), 200
-
-    camp = get_campaign(campaign_id)
-    if not camp:
+    resp = get_campaign_progress(campaign_id)
+    if resp is None:
         return jsonify({"error": "campaign not found"}), 404
-    goal = float(camp.get("goal", 0))
-    total = float(camp.get("total_raised", 0))
-    count, last_dt = count_and_last_succeeded(campaign_id)
+    return jsonify(resp), 200
 
-    percent = 0.0
-    if goal > 0:
-        percent = round(min(100.0, (total / goal) * 100.0), 2)
 
-    resp = {
-        "campaign_id": campaign_id,
-        "goal": goal,
-        "total_raised": total,
-        "percent": percent,
-        "donations_count": count,
-        "last_donation_at": last_dt,
-        "fee_option_locked": bool(camp.get("fee_option_locked")),
-    }
-    summary = summarize_succeeded_donations(campaign_id)
-    resp["fee_option"] = camp.get("fee_option") or FEE_OPTION_DONOR_PAYS
-    resp["fee_policy_version"] = camp.get("fee_policy_version") or "v1"
-    resp["platform_fee_cents"] = int(summary.get("platform_fee_cents") or 0)
-    resp["stripe_fee_cents"] = int(summary.get("stripe_fee_cents") or 0)
-    resp["net_to_org_cents"] = int(summary.get("net_payout_cents") or 0)
-    r().setex(key, 30, json.dumps(resp, default=str))
-    return jsonify(resp), 200
+@campaigns.get("/<campaign_id>/viewers")
+def campaign_viewers(campaign_id):
+    if not _is_uuid(campaign_id):
+        return jsonify({"error": "invalid campaign_id"}), 400
+    viewers = viewer_count(f"campaign:{campaign_id}")
+    return jsonify({"campaign_id": campaign_id, "viewers": viewers}), 200
 
 
 @campaigns.get("/<campaign_id>/media")
@@ -333,8 +320,30 @@ def campaign_media(campaign_id):
 def draw_winner_route(campaign_id):
     body = request.get_json(silent=True) or {}
     mode = body.get("mode", "per_donation")
-    min_amount_cents = int(body.get("min_amount_cents", 0) or 0)
+    weighting = body.get("weighting", "uniform")
     notes = body.get("notes")
+    commitment_id = body.get("commitment_id")
+    if commitment_id is not None and not _is_uuid(str(commitment_id)):
+        return jsonify({"error": "invalid commitment_id"}), 400
+    try:
+        min_amount_cents = int(body.get("min_amount_cents", 0) or 0)
+        winners = int(body.get("winners", 1) or 1)
+        cents_per_entry = body.get("cents_per_entry")
+        if cents_per_entry is not None:
+            cents_per_entry = int(cents_per_entry)
+        max_entries = body.get("max_entries")
+        if max_entries is not None:
+            max_entries = int(max_entries)
+    except (TypeError, ValueError):
+        return (
+            jsonify(
+                {
+                    "error": "min_amount_cents, winners, cents_per_entry and "
+                    "max_entries must be integers"
+                }
+            ),
+            400,
+        )
 
     claims = get_jwt()
     user_id = claims.get("sub")
@@ -345,6 +354,11 @@ def draw_winner_route(campaign_id):
         mode=mode,
         min_amount_cents=min_amount_cents,
         notes=notes,
+        winners=winners,
+        weighting=weighting,
+        cents_per_entry=cents_per_entry,
+        max_entries=max_entries,
+        commitment_id=commitment_id,
     )
     if status == 200:
         from app.utils.public_campaign_cache import invalidate_public_campaign_cache
@@ -353,6 +367,36 @@ def draw_winner_route(campaign_id):
     return jsonify(payload), status
 
 
+@campaigns.post("/<campaign_id>/giveaway-commitments")
+@jwt_required()
+def commit_giveaway_seed_route(campaign_id):
+    if not _is_uuid(campaign_id):
+        return jsonify({"error": "invalid campaign_id"}), 400
+    status, payload = commit_giveaway_seed(campaign_id, get_jwt_identity())
+    return jsonify(payload), status
+
+
+@campaigns.get("/<campaign_id>/giveaway-commitments/<commitment_id>")
+def get_giveaway_commitment_route(campaign_id, commitment_id):
+    if not _is_uuid(campaign_id) or not _is_uuid(commitment_id):
+        return jsonify({"error": "invalid id"}), 400
+    status, payload = get_giveaway_commitment_public(campaign_id, commitment_id)
+    return jsonify(payload), status
+
+
+@campaigns.get("/<campaign_id>/giveaway-draws/<draw_id>/verify")
+@jwt_required()
+def verify_giveaway_draw_route(campaign_id, draw_id):
+    if not _is_uuid(campaign_id) or not _is_uuid(draw_id):
+        return jsonify({"error": "invalid id"}), 400
+    status, payload = verify_giveaway_draw(
+        campaign_id=campaign_id,
+        draw_id=draw_id,
+        current_user_id=get_jwt_identity(),
+    )
+    return jsonify(payload), status
+
+
 @campaigns.get("/<campaign_id>/giveaway-logs")
 @jwt_required()
 def get_giveaway_logs(campaign_id):
@@ -379,17 +423,26 @@ def list_campaign_donations(campaign_id):
         return jsonify({"error": "forbidden"}), 403
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 20, type=int)
-    sort = request.args.get("sort", "created_at")
-    order = request.args.get("order", "desc")
     search = request.args.get("search", "").strip() or None
-    result = list_donations_paginated(
-        campaign_id,
-        page=page,
-        per_page=per_page,
-        sort=sort,
-        order=order,
-        search=search,
-    )
+    sort = request.args.get("sort") or ("relevance" if search else "created_at")
+    order = request.args.get("order", "desc")
+    cursor = request.args.get("cursor") or None
+    # Cursor pages skip the count by default; the client has it from page 1.
+    # A capped or estimated total is opt-in (?total=capped|estimate).
+    total = request.args.get("total") or ("none" if cursor else "exact")
+    try:
+        result = list_donations_paginated(
+            campaign_id,
+            page=page,
+            per_page=per_page,
+            sort=sort,
+            order=order,
+            search=search,
+            cursor=cursor,
+            total=total,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify(result), 200
 
 
@@ -398,7 +451,7 @@ def recent_donations(campaign_id):
     if not _is_uuid(campaign_id):
         return jsonify({"error": "invalid campaign_id"}), 400
     limit = int(request.args.get("limit", 10))
-    return jsonify(recent_succeeded_for_campaign(campaign_id, limit)), 200
+    return jsonify(get_recent_donations(campaign_id, limit)), 200
 
 
 @campaigns.get("/<campaign_id>/donations/export.csv")
@@ -412,49 +465,9 @@ def export_donations_csv(campaign_id):
     if role not in ("owner", "admin"):
         return jsonify({"error": "forbidden"}), 403
 
-    rows = select_donations_by_campaign(campaign_id)
-
-    buf = io.StringIO()
-    w = csv.writer(buf)
-    w.writerow(
-        [
-            "donation_id",
-            "amount_cents",
-            "currency",
-            "donor_email",
-            "status",
-            "fee_option",
-            "stripe_processing_fee_cents",
-            "platform_fee_cents",
-            "donor_fee_cents",
-            "platform_absorbed_fee_cents",
-            "net_to_org_cents",
-            "created_at",
-        ]
-    )
-    for row in rows:
-        created_at = row.get("created_at")
-        if hasattr(created_at, "isoformat"):
-            created_at = created_at.isoformat()
-        w.writerow(
-            [
-                row.get("id"),
-                row.get("amount_cents"),
-                row.get("currency") or "usd",
-                row.get("donor_email"),
-                row.get("status"),
-                row.get("fee_option"),
-                row.get("stripe_processing_fee_cents"),
-                row.get("platform_fee_cents"),
-                row.get("donor_fee_cents"),
-                row.get("platform_absorbed_fee_cents"),
-                row.get("net_to_org_cents"),
-                created_at,
-            ]
-        )
-    out = buf.getvalue()
+    # Streamed: rows are fetched in chunks while the response is written.
     return Response(
-        out,
+        stream_donations_csv(campaign_id),
         mimetype="text/csv",
         headers={
             "Content-Disposition": f'attachment; filename="campaign_{campaign_id}_donations.csv"'
@@ -462,6 +475,57 @@ def export_donations_csv(campaign_id):
     )
 
 
+@campaigns.post("/<campaign_id>/donations/exports")
+@jwt_required()
+def create_donations_export(campaign_id):
+    """
+    Start a background export (gzip CSV or Parquet in S3). An unchanged
+    campaign reuses its last export of that format.
+    """
+    if not _is_uuid(campaign_id):
+        return jsonify({"error": "invalid campaign_id"}), 400
+    camp = get_campaign(campaign_id)
+    if not camp:
+        return jsonify({"error": "not found"}), 404
+    user_id = get_jwt_identity()
+    role = get_user_role_in_org(user_id, camp["org_id"])
+    if role not in ("owner", "admin"):
+        return jsonify({"error": "forbidden"}), 403
+
+    body = request.get_json(silent=True) or {}
+    fmt = (body.get("format") or "csv").strip().lower()
+    try:
+        export, created = request_donation_export(
+            campaign_id, fmt, requested_by_user_id=str(user_id)
+        )
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+    if created and not enqueue_donation_export(str(export["id"])):
+        update_export(
+            str(export["id"]), status="failed", error_message="export queue unavailable"
+        )
+        return jsonify({"error": "export queue unavailable"}), 503
+    status = 200 if export["status"] == "succeeded" else 202
+    return jsonify({"export": serialize_export(export), "reused": not created}), status
+
+
+@campaigns.get("/<campaign_id>/donations/exports/<export_id>")
+@jwt_required()
+def get_donations_export(campaign_id, export_id):
+    if not _is_uuid(campaign_id) or not _is_uuid(export_id):
+        return jsonify({"error": "invalid id"}), 400
+    camp = get_campaign(campaign_id)
+    if not camp:
+        return jsonify({"error": "not found"}), 404
+    role = get_user_role_in_org(get_jwt_identity(), camp["org_id"])
+    if role not in ("owner", "admin"):
+        return jsonify({"error": "forbidden"}), 403
+    export = get_export(export_id, campaign_id=campaign_id)
+    if not export:
+        return jsonify({"error": "not found"}), 404
+    return jsonify({"export": serialize_export(export)}), 200
+
+
 @campaigns.get("/<campaign_id>/webhooks/stripe-events")
 @jwt_required()
 def list_stripe_events(campaign_id):
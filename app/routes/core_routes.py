@@ -2,9 +2,9 @@ import os
 from uuid import UUID
 from flask import Blueprint, jsonify, request, send_from_directory
 from app.utils.page_layout import BLOCK_TYPES, BLOCK_SCHEMA
-from app.utils.db import get_db_connection
 from app.utils.public_campaign_cache import respond_public_campaign_json
-from app.utils.public_campaign_payload import build_public_campaign_dict
+from app.utils.public_campaign_payload import load_public_campaign
+from app.utils.public_resolver import resolve_public_campaign
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.models.user import get_user_profile_by_id, update_user_profile
 
@@ -26,17 +26,11 @@ def donate_page_no_subdomain(org_subdomain, camp_slug):
     """
     Donor page when using 127.0.0.1 (no subdomain). Use: /donate/demo/help-build-school
     """
-    with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id FROM organizations WHERE subdomain=%s", (org_subdomain,))
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": "org not found"}), 404
-        cur.execute(
-            "SELECT 1 FROM campaigns WHERE org_id=%s AND slug=%s",
-            (row[0], camp_slug),
-        )
-        if not cur.fetchone():
-            return jsonify({"error": "campaign not found"}), 404
+    org_id, campaign_id = resolve_public_campaign(org_subdomain, camp_slug)
+    if not org_id:
+        return jsonify({"error": "org not found"}), 404
+    if not campaign_id:
+        return jsonify({"error": "campaign not found"}), 404
     return send_from_directory(_STATIC, "donate_page.html")
 
 
@@ -45,32 +39,12 @@ def campaign_public_no_subdomain(org_subdomain, camp_slug):
     """
     Campaign JSON when using 127.0.0.1 (no subdomain). For donate page to fetch.
     """
-    with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute("SELECT id FROM organizations WHERE subdomain=%s", (org_subdomain,))
-        org_row = cur.fetchone()
-        if not org_row:
-            return jsonify({"error": "org not found"}), 404
-        org_id = org_row[0]
-        cur.execute(
-            """
-            SELECT id, title, slug, status,
-                   COALESCE(goal, 0) AS goal,
-                   COALESCE(total_raised, 0) AS total_raised,
-                   giveaway_prize_cents,
-                   page_layout,
-                   ai_site_recipe
-            FROM campaigns
-            WHERE org_id=%s AND slug=%s
-            """,
-            (org_id, camp_slug),
-        )
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": "campaign not found"}), 404
-
-    cid = str(row[0])
-    resp = build_public_campaign_dict(row, cid)
-    return respond_public_campaign_json(resp, cid)
+    org_id, cid = resolve_public_campaign(org_subdomain, camp_slug)
+    if not org_id:
+        return jsonify({"error": "org not found"}), 404
+    if not cid:
+        return jsonify({"error": "campaign not found"}), 404
+    return respond_public_campaign_json(cid, lambda: load_public_campaign(cid))
 
 
 @core.get("/api/campaigns/<campaign_id>/public")
@@ -81,26 +55,9 @@ def campaign_public_by_id(campaign_id):
     """
     if not _is_uuid(campaign_id):
         return jsonify({"error": "invalid campaign_id"}), 400
-    with get_db_connection() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT id, title, slug, status,
-                   COALESCE(goal, 0) AS goal,
-                   COALESCE(total_raised, 0) AS total_raised,
-                   giveaway_prize_cents,
-                   page_layout,
-                   ai_site_recipe
-            FROM campaigns
-            WHERE id = %s
-            """,
-            (campaign_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": "campaign not found"}), 404
-
-    resp = build_public_campaign_dict(row, campaign_id)
-    return respond_public_campaign_json(resp, campaign_id)
+    return respond_public_campaign_json(
+        campaign_id, lambda: load_public_campaign(campaign_id)
+    )
 
 
 @core.get("/api/page-layout/schema")
@@ -37,6 +37,7 @@ import os
 
 from app.utils.db import get_db_connection
 from app.utils.slug import slugify_with_fallback
+from app.utils.public_resolver import invalidate_org_subdomain
 from psycopg2.errors import UniqueViolation
 
 EMAIL_RE = re.compile(r"^[^@]+@[^@]+\.[^@]+$")
@@ -393,6 +394,8 @@ def set_org_subdomain(org_id):
         if cur.fetchone():
             return jsonify({"error": "subdomain already in use"}), 409
 
+        cur.execute("SELECT subdomain FROM organizations WHERE id=%s", (org_id,))
+        previous = cur.fetchone()
         cur.execute(
             "UPDATE organizations SET subdomain=%s WHERE id=%s RETURNING id, name, subdomain",
             (sub, org_id),
@@ -400,5 +403,9 @@ def set_org_subdomain(org_id):
         row = cur.fetchone()
         if not row:
             return jsonify({"error": "not found"}), 404
+        conn.commit()
 
+    if previous:
+        invalidate_org_subdomain(previous[0])
+    invalidate_org_subdomain(row[2])  # may be cached as unknown
     return jsonify({"id": row[0], "name": row[1], "subdomain": row[2]}), 200
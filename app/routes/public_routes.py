@@ -2,29 +2,24 @@ import os
 from flask import Blueprint, jsonify, send_from_directory
 from app.utils.db import get_db_connection
 from app.utils.public_campaign_cache import respond_public_campaign_json
-from app.utils.public_campaign_payload import build_public_campaign_dict
+from app.utils.public_campaign_payload import load_public_campaign
+from app.utils.public_resolver import resolve_org_id, resolve_public_campaign
 
 public = Blueprint("public", __name__, subdomain="<org_subdomain>")
 _STATIC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "static")
 
 
-def _get_org_id_by_subdomain(cur, subdomain: str):
-    cur.execute("SELECT id FROM organizations WHERE subdomain=%s", (subdomain,))
-    row = cur.fetchone()
-    return row[0] if row else None
-
-
 @public.get("/")
 def org_home(org_subdomain):
     """
     Public org landing (JSON for now).
     Returns the org subdomain and up to 20 recent campaigns (id/title/slug).
     """
-    with get_db_connection() as conn, conn.cursor() as cur:
-        org_id = _get_org_id_by_subdomain(cur, org_subdomain)
-        if not org_id:
-            return jsonify({"error": "org not found"}), 404
+    org_id = resolve_org_id(org_subdomain)
+    if not org_id:
+        return jsonify({"error": "org not found"}), 404
 
+    with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute(
             """
             SELECT id, title, slug
@@ -52,33 +47,14 @@ def org_home(org_subdomain):
 def campaign_public(org_subdomain, camp_slug):
     """
     Public campaign page (JSON for now).
-    Resolves org via subdomain and campaign via (org_id, slug).
+    Resolves org via subdomain and campaign via (org_id, slug), both cached.
     """
-    with get_db_connection() as conn, conn.cursor() as cur:
-        org_id = _get_org_id_by_subdomain(cur, org_subdomain)
-        if not org_id:
-            return jsonify({"error": "org not found"}), 404
-
-        cur.execute(
-            """
-            SELECT id, title, slug, status,
-                   COALESCE(goal, 0) AS goal,
-                   COALESCE(total_raised, 0) AS total_raised,
-                   giveaway_prize_cents,
-                   page_layout,
-                   ai_site_recipe
-            FROM campaigns
-            WHERE org_id=%s AND slug=%s
-            """,
-            (org_id, camp_slug),
-        )
-        row = cur.fetchone()
-        if not row:
-            return jsonify({"error": "campaign not found"}), 404
-
-    cid = str(row[0])
-    resp = build_public_campaign_dict(row, cid)
-    return respond_public_campaign_json(resp, cid)
+    org_id, cid = resolve_public_campaign(org_subdomain, camp_slug)
+    if not org_id:
+        return jsonify({"error": "org not found"}), 404
+    if not cid:
+        return jsonify({"error": "campaign not found"}), 404
+    return respond_public_campaign_json(cid, lambda: load_public_campaign(cid))
 
 
 @public.get("/donate/<camp_slug>")
@@ -86,14 +62,9 @@ def donate_page(org_subdomain, camp_slug):
     """
     Serve the donor-facing donation page. Renders layout from campaign.page_layout.
     """
-    with get_db_connection() as conn, conn.cursor() as cur:
-        org_id = _get_org_id_by_subdomain(cur, org_subdomain)
-        if not org_id:
-            return jsonify({"error": "org not found"}), 404
-        cur.execute(
-            "SELECT 1 FROM campaigns WHERE org_id=%s AND slug=%s",
-            (org_id, camp_slug),
-        )
-        if not cur.fetchone():
-            return jsonify({"error": "campaign not found"}), 404
+    org_id, campaign_id = resolve_public_campaign(org_subdomain, camp_slug)
+    if not org_id:
+        return jsonify({"error": "org not found"}), 404
+    if not campaign_id:
+        return jsonify({"error": "campaign not found"}), 404
     return send_from_directory(_STATIC, "donate_page.html")
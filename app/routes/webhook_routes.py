@@ -1,6 +1,10 @@
 import logging
 from flask import Blueprint, request, jsonify
-from app.services.webhook_service import process_stripe_event
+from app.services.webhook_service import (
+    STRIPE_WEBHOOK_ASYNC,
+    ingest_stripe_event,
+    process_stripe_event,
+)
 
 webhooks_bp = Blueprint("webhooks", __name__)
 logger = logging.getLogger(__name__)
@@ -9,7 +13,8 @@ logger = logging.getLogger(__name__)
 @webhooks_bp.post("/webhooks/stripe")
 def stripe_webhook():
     try:
-        status, resp = process_stripe_event(
+        handler = ingest_stripe_event if STRIPE_WEBHOOK_ASYNC else process_stripe_event
+        status, resp = handler(
             payload=request.data,
             sig_header=request.headers.get("Stripe-Signature"),
         )
@@ -0,0 +1,97 @@
+"""
+Cached live-campaign reads: progress and recent donations.
+
+Both are served from the in-process L1, then Redis, then Postgres, and
+are shared by the polling endpoints and the Socket.IO join snapshot.
+Donations bust both (outbox campaign_caches side effect).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from app.models.campaign_donation_stats import get_campaign_with_donation_stats
+from app.models.donation import recent_succeeded_for_campaign
+from app.services.fee_policy_service import FEE_OPTION_DONOR_PAYS
+from app.utils.cache import (
+    campaign_progress_key,
+    campaign_recent_donations_key,
+    r,
+)
+from app.utils.local_cache import local_cache
+
+PROGRESS_CACHE_TTL = 30
+RECENT_DONATIONS_CACHE_TTL = int(os.getenv("RECENT_DONATIONS_CACHE_TTL", "30"))
+# Recent donations are cached as one list of this many; smaller limits slice it.
+RECENT_DONATIONS_CACHE_SIZE = int(os.getenv("RECENT_DONATIONS_CACHE_SIZE", "20"))
+
+
+def get_campaign_progress(campaign_id: str) -> Optional[Dict[str, Any]]:
+    """The /progress payload, or None if the campaign does not exist."""
+    l1 = local_cache("campaign_progress")
+    resp = l1.get(campaign_id)
+    if resp is not None:
+        return resp
+    epoch = l1.epoch()
+    key = campaign_progress_key(campaign_id)
+    cached = r().get(key)
+    if cached:
+        resp = json.loads(cached)
+        l1.set(campaign_id, resp, epoch=epoch)
+        return resp
+
+    camp = get_campaign_with_donation_stats(campaign_id)
+    if not camp:
+        return None
+    goal = float(camp.get("goal") or 0)
+    total = float(camp.get("total_raised") or 0)
+
+    percent = 0.0
+    if goal > 0:
+        percent = round(min(100.0, (total / goal) * 100.0), 2)
+
+    resp = {
+        "campaign_id": campaign_id,
+        "goal": goal,
+        "total_raised": total,
+        "percent": percent,
+        "donations_count": camp["donations_count"],
+        "last_donation_at": camp["last_donation_at"],
+        "fee_option_locked": bool(camp.get("fee_option_locked")),
+    }
+    resp["fee_option"] = camp.get("fee_option") or FEE_OPTION_DONOR_PAYS
+    resp["fee_policy_version"] = camp.get("fee_policy_version") or "v1"
+    resp["platform_fee_cents"] = camp["platform_fee_cents"]
+    resp["stripe_fee_cents"] = camp["stripe_fee_cents"]
+    resp["net_to_org_cents"] = camp["net_payout_cents"]
+    r().setex(key, PROGRESS_CACHE_TTL, json.dumps(resp, default=str))
+    l1.set(campaign_id, resp, epoch=epoch)
+    return resp
+
+
+def get_recent_donations(campaign_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Latest succeeded donations (masked), newest first."""
+    if limit > RECENT_DONATIONS_CACHE_SIZE:
+        return recent_succeeded_for_campaign(campaign_id, limit)
+    l1 = local_cache("campaign_recent_donations")
+    items = l1.get(campaign_id)
+    if items is None:
+        epoch = l1.epoch()
+        key = campaign_recent_donations_key(campaign_id)
+        cached = r().get(key)
+        if cached:
+            items = json.loads(cached)
+        else:
+            items = json.loads(
+                json.dumps(
+                    recent_succeeded_for_campaign(
+                        campaign_id, RECENT_DONATIONS_CACHE_SIZE
+                    ),
+                    default=str,
+                )
+            )
+            r().setex(key, RECENT_DONATIONS_CACHE_TTL, json.dumps(items))
+        l1.set(campaign_id, items, epoch=epoch)
+    return items[: max(0, limit)]
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import os
+import zlib
+from typing import Any, Iterable, Iterator
+
+from app.models.donation import iter_donations_by_campaign
+from app.models.donation_export import (
+    count_campaign_donations,
+    create_export,
+    fail_stale_exports,
+    find_reusable_export,
+    get_campaign_rows_version,
+    get_export,
+    lock_export_requests,
+    update_export,
+)
+from app.tasks import EXPORT_JOB_TIMEOUT_SECONDS
+from app.utils.db import unit_of_work
+from app.utils.s3_helpers import MultipartUpload, presign_get
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: parquet exports disabled
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    "donation_id",
+    "amount_cents",
+    "currency",
+    "donor_email",
+    "status",
+    "fee_option",
+    "stripe_processing_fee_cents",
+    "platform_fee_cents",
+    "donor_fee_cents",
+    "platform_absorbed_fee_cents",
+    "net_to_org_cents",
+    "created_at",
+]
+# Rows per yielded chunk: large enough to keep per-write overhead low,
+# small enough that memory stays flat regardless of campaign size.
+CSV_ROWS_PER_CHUNK = 500
+
+
+def donation_export_row(row: dict[str, Any]) -> list[Any]:
+    created_at = row.get("created_at")
+    if hasattr(created_at, "isoformat"):
+        created_at = created_at.isoformat()
+    return [
+        row.get("id"),
+        row.get("amount_cents"),
+        row.get("currency") or "usd",
+        row.get("donor_email"),
+        row.get("status"),
+        row.get("fee_option"),
+        row.get("stripe_processing_fee_cents"),
+        row.get("platform_fee_cents"),
+        row.get("donor_fee_cents"),
+        row.get("platform_absorbed_fee_cents"),
+        row.get("net_to_org_cents"),
+        created_at,
+    ]
+
+
+def iter_csv_chunks(
+    rows: Iterable[dict[str, Any]], rows_per_chunk: int = CSV_ROWS_PER_CHUNK
+) -> Iterator[str]:
+    """CSV text (header first) in chunks of rows_per_chunk rows."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in rows:
+        w.writerow(donation_export_row(row))
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+            pending = 0
+    yield buf.getvalue()
+
+
+def stream_donations_csv(campaign_id: str) -> Iterator[str]:
+    """A campaign's donations as CSV, read through a server-side cursor."""
+    return iter_csv_chunks(iter_donations_by_campaign(campaign_id))
+
+
+EXPORT_FORMATS = {
+    # format -> (file extension, content type)
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_PART_SIZE = int(os.getenv("EXPORT_PART_SIZE_BYTES", str(8 * 1024 * 1024)))
+EXPORT_URL_TTL = int(os.getenv("EXPORT_URL_TTL_SECONDS", "900"))
+PARQUET_ROWS_PER_GROUP = 50_000
+# Progress is written to donation_exports at most this often (rows).
+_PROGRESS_EVERY = 20_000
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_formats() -> list[str]:
+    return [f for f in EXPORT_FORMATS if f != "parquet" or pa is not None]
+
+
+def request_donation_export(
+    campaign_id: str, fmt: str, requested_by_user_id: str | None = None
+) -> tuple[dict[str, Any], bool]:
+    """
+    (export, created). An export of the same format and donations version
+    that succeeded or is still running is returned instead of a new one;
+    one that has made no progress for longer than the export job timeout
+    is marked failed instead. The caller enqueues new exports
+    (app.tasks.enqueue_donation_export).
+    """
+    if fmt not in export_formats():
+        raise ExportError(f"format must be one of: {', '.join(export_formats())}")
+    with unit_of_work():
+        lock_export_requests(campaign_id, fmt)
+        fail_stale_exports(campaign_id, fmt, EXPORT_JOB_TIMEOUT_SECONDS)
+        version = get_campaign_rows_version(campaign_id)
+        existing = find_reusable_export(campaign_id, fmt, version)
+        if existing:
+            return existing, False
+        export = create_export(
+            campaign_id=campaign_id,
+            fmt=fmt,
+            rows_version=version,
+            requested_by_user_id=requested_by_user_id,
+        )
+    return export, True
+
+
+def serialize_export(export: dict[str, Any]) -> dict[str, Any]:
+    out = {
+        k: export.get(k)
+        for k in (
+            "id",
+            "campaign_id",
+            "format",
+            "status",
+            "rows_total",
+            "rows_written",
+            "progress_percent",
+            "size_bytes",
+            "error_message",
+            "created_at",
+            "completed_at",
+        )
+    }
+    out["id"] = str(out["id"])
+    out["campaign_id"] = str(out["campaign_id"])
+    if export.get("status") == "succeeded" and export.get("s3_key"):
+        ext = EXPORT_FORMATS[export["format"]][0]
+        out["download_url"] = presign_get(
+            export["s3_key"],
+            expires=EXPORT_URL_TTL,
+            filename=f"campaign_{out['campaign_id']}_donations.{ext}",
+        )
+        out["download_url_expires_in"] = EXPORT_URL_TTL
+    return out
+
+
+def _write_csv_gz(rows: Iterable[dict[str, Any]], sink: MultipartUpload) -> None:
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in iter_csv_chunks(rows):
+        sink.write(gz.compress(chunk.encode("utf-8")))
+    sink.write(gz.flush())
+
+
+def _parquet_schema():
+    return pa.schema(
+        [
+            ("donation_id", pa.string()),
+            ("amount_cents", pa.int64()),
+            ("currency", pa.string()),
+            ("donor_email", pa.string()),
+            ("status", pa.string()),
+            ("fee_option", pa.string()),
+            ("stripe_processing_fee_cents", pa.int64()),
+            ("platform_fee_cents", pa.int64()),
+            ("donor_fee_cents", pa.int64()),
+            ("platform_absorbed_fee_cents", pa.int64()),
+            ("net_to_org_cents", pa.int64()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ]
+    )
+
+
+def _write_parquet(rows: Iterable[dict[str, Any]], sink: MultipartUpload) -> None:
+    schema = _parquet_schema()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    columns: list[list[Any]] = [[] for _ in EXPORT_COLUMNS]
+
+    def _flush() -> None:
+        if columns[0]:
+            writer.write_table(pa.table(columns, schema=schema))
+            for col in columns:
+                col.clear()
+
+    try:
+        for row in rows:
+            values = donation_export_row(row)
+            values[0] = str(values[0])
+            values[-1] = row.get("created_at")  # keep the datetime for parquet
+            for col, value in zip(columns, values):
+                col.append(value)
+            if len(columns[0]) >= PARQUET_ROWS_PER_GROUP:
+                _flush()
+        _flush()
+    finally:
+        writer.close()
+
+
+def _with_progress(
+    rows: Iterable[dict[str, Any]], export_id: str, rows_total: int
+) -> Iterator[dict[str, Any]]:
+    written = 0
+    for row in rows:
+        yield row
+        written += 1
+        if written % _PROGRESS_EVERY == 0:
+            pct = min(99, int(written * 100 / rows_total)) if rows_total else 0
+            update_export(export_id, rows_written=written, progress_percent=pct)
+    update_export(export_id, rows_written=written)
+
+
+def run_donation_export(export_id: str) -> dict[str, Any] | None:
+    """
+    RQ job body: stream the campaign's succeeded donations (server-side
+    cursor) into a multipart S3 upload in the export's format, recording
+    progress.
+    """
+    export = get_export(export_id)
+    if not export or export["status"] in ("succeeded", "failed"):
+        return export
+    campaign_id = str(export["campaign_id"])
+    fmt = export["format"]
+    ext, content_type = EXPORT_FORMATS[fmt]
+    # Read before the cursor's snapshot, so the artifact is at least this new.
+    version = get_campaign_rows_version(campaign_id)
+    rows_total = count_campaign_donations(campaign_id)
+    update_export(
+        export_id,
+        status="running",
+        rows_version=version,
+        rows_total=rows_total,
+        rows_written=0,
+        progress_percent=0,
+    )
+    key = f"exports/{campaign_id}/v{version}-{export_id}.{ext}"
+    sink = None
+    try:
+        sink = MultipartUpload(key, content_type, part_size=EXPORT_PART_SIZE)
+        rows = _with_progress(
+            iter_donations_by_campaign(campaign_id, status="succeeded"),
+            export_id,
+            rows_total,
+        )
+        if fmt == "parquet":
+            _write_parquet(rows, sink)
+        else:
+            _write_csv_gz(rows, sink)
+        sink.close()
+    except Exception as e:
+        logger.exception("donation export %s failed", export_id)
+        if sink is not None:
+            try:
+                sink.abort()
+            except Exception:
+                pass
+        return update_export(export_id, status="failed", error_message=str(e)[:500])
+    return update_export(
+        export_id,
+        status="succeeded",
+        progress_percent=100,
+        s3_key=key,
+        size_bytes=sink.size,
+    )
@@ -5,7 +5,7 @@ from app.utils.db import get_db_connection
 from app.models.donation import get_donation
 from app.models.campaign import get_campaign
 from app.models.email_receipt import render_receipt_content, render_winner_content
-from app.models.org_email_settings import get_email_settings
+from app.models.org_email_settings import get_email_settings_cached
 from app.utils.email_sender import send_email
 
 DEV_EMAIL_LOG_ONLY = os.getenv("DEV_EMAIL_LOG_ONLY", "1") == "1"
@@ -45,7 +45,7 @@ def ensure_receipt_for_donation(donation_id: str) -> None:
     body_html = content["body_html"]
     to_email = d["donor_email"]
 
-    org_settings = get_email_settings(d["org_id"])
+    org_settings = get_email_settings_cached(d["org_id"])
     from_email = (org_settings or {}).get("from_email")
     from_name = (org_settings or {}).get("from_name")
     reply_to = (org_settings or {}).get("reply_to")
@@ -137,17 +137,20 @@ def send_winner_email(
     campaign_title: str,
     winner_email: str,
     prize_cents: int | None = None,
+    content: Optional[Dict[str, str]] = None,
 ) -> Optional[str]:
     """
     Send winner notification email. Returns error message on failure, None on success.
     prize_cents: optional cash prize amount in cents (e.g. 100000 = $1000).
+    content: already rendered email (see render_winner_contents); rendered here if omitted.
     """
     if not winner_email or not winner_email.strip():
         return None
-    content = render_winner_content(
-        org_id, campaign_title, winner_email, prize_cents=prize_cents
-    )
-    org_settings = get_email_settings(org_id)
+    if content is None:
+        content = render_winner_content(
+            org_id, campaign_title, winner_email, prize_cents=prize_cents
+        )
+    org_settings = get_email_settings_cached(org_id)
     from_email = (org_settings or {}).get("from_email")
     from_name = (org_settings or {}).get("from_name")
     reply_to = (org_settings or {}).get("reply_to")
@@ -77,13 +77,20 @@ def build_donation_accounting(
     campaign_total_dollars: float,
     amount_cents: int,
     stripe_processing_fee_cents: int,
+    platform_fee_percent: float | None = None,
 ) -> DonationAccounting:
+    """
+    Pass platform_fee_percent to keep an already-recorded tier (fee
+    reconciliation) instead of deriving it from campaign_total_dollars.
+    """
     gross = max(0, int(amount_cents))
     stripe_fee = max(0, int(stripe_processing_fee_cents))
     option = normalize_fee_option(fee_option)
-    platform_fee_percent = get_platform_fee_percent(
-        fee_option=option, campaign_total_dollars=campaign_total_dollars
-    )
+    if platform_fee_percent is None:
+        platform_fee_percent = get_platform_fee_percent(
+            fee_option=option, campaign_total_dollars=campaign_total_dollars
+        )
+    platform_fee_percent = float(platform_fee_percent)
     platform_fee_cents = int(round(gross * (platform_fee_percent / 100.0)))
 
     donor_fee_cents = 0
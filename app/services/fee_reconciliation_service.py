@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from app.models.donation import (
+    bulk_update_donation_fees,
+    list_unreconciled_fee_donations,
+    mark_donation_fees_checked,
+)
+from app.models.settlement import get_campaign_settlement
+from app.services.fee_policy_service import build_donation_accounting
+from app.services.settlement_service import build_campaign_settlement
+from app.utils.cache import invalidate_campaign_progress_cache
+from app.utils.public_campaign_cache import invalidate_public_campaign_cache
+
+logger = logging.getLogger(__name__)
+
+STRIPE_SECRET = (os.getenv("STRIPE_SECRET_KEY") or "").strip()
+FEE_RECONCILE_MAX_AGE_DAYS = int(os.getenv("STRIPE_FEE_RECONCILE_MAX_AGE_DAYS", "30"))
+FEE_RECONCILE_BATCH_SIZE = int(os.getenv("STRIPE_FEE_RECONCILE_BATCH_SIZE", "500"))
+# Balance transactions are created with the charge, which can trail the
+# donation row by a while (3DS, async payment methods).
+_CREATED_SLACK_SECONDS = 300
+
+_CHARGE_TYPES = {"charge", "payment"}
+
+
+def _stripe_client():
+    if not STRIPE_SECRET:
+        return None
+    import stripe
+
+    stripe.api_key = STRIPE_SECRET
+    return stripe
+
+
+def iter_balance_transactions(
+    client, *, created_gte: int, created_lte: int, page_size: int = 100
+) -> Iterator[dict[str, Any]]:
+    """Page through BalanceTransaction.list for a created range, sources expanded."""
+    starting_after = None
+    while True:
+        params: dict[str, Any] = {
+            "created": {"gte": int(created_gte), "lte": int(created_lte)},
+            "limit": page_size,
+            "expand": ["data.source"],
+        }
+        if starting_after:
+            params["starting_after"] = starting_after
+        page = client.BalanceTransaction.list(**params)
+        data = page.get("data") or []
+        yield from data
+        if not page.get("has_more") or not data:
+            return
+        starting_after = data[-1]["id"]
+
+
+def _payment_intent_of(bt: dict[str, Any]) -> str | None:
+    source = bt.get("source")
+    if isinstance(source, dict):
+        pi = source.get("payment_intent")
+        if isinstance(pi, dict):
+            pi = pi.get("id")
+        return pi if isinstance(pi, str) else None
+    return None
+
+
+def _reconciled_row(donation: dict[str, Any], bt: dict[str, Any]) -> dict[str, Any]:
+    accounting = build_donation_accounting(
+        fee_option=donation.get("fee_option"),
+        campaign_total_dollars=0,
+        amount_cents=int(donation.get("amount_cents") or 0),
+        stripe_processing_fee_cents=int(bt.get("fee") or 0),
+        platform_fee_percent=float(donation["platform_fee_percent"]),
+    )
+    return {
+        "id": donation["id"],
+        "campaign_id": donation["campaign_id"],
+        "stripe_balance_transaction_id": bt.get("id"),
+        "stripe_processing_fee_cents": accounting.stripe_processing_fee_cents,
+        "donor_fee_cents": accounting.donor_fee_cents,
+        "platform_absorbed_fee_cents": accounting.platform_absorbed_fee_cents,
+        "net_to_org_cents": accounting.net_to_org_cents,
+    }
+
+
+def _refresh_campaign(campaign_id: str) -> None:
+    # The donations trigger already updated campaign_donation_stats; only a
+    # settlement still awaiting payout is rebuilt (paid ones are immutable).
+    settlement = get_campaign_settlement(campaign_id)
+    if settlement and settlement.get("status") == "pending":
+        build_campaign_settlement(campaign_id)
+    try:
+        invalidate_campaign_progress_cache(campaign_id)
+    except Exception as e:
+        logger.debug("progress cache bust skipped: %s", e)
+    invalidate_public_campaign_cache(campaign_id)
+
+
+def reconcile_stripe_fees(
+    *,
+    client=None,
+    max_age_days: int | None = None,
+    limit: int = 5000,
+    batch_size: int | None = None,
+) -> dict[str, Any]:
+    """
+    Replace webhook-time fee estimates with actual Stripe fees.
+
+    Lists balance transactions once for the created range spanning all
+    unreconciled donations (newest first, paginated), matches them by balance
+    transaction id or charge payment intent, and writes the recalculated
+    accounting in batches. Unmatched donations stay estimated and record how
+    far this run searched (stripe_fee_checked_at), so the next run only lists
+    what was created since rather than going back to the oldest of them.
+    """
+    client = client or _stripe_client()
+    if client is None:
+        return {"skipped": "stripe not configured"}
+    batch_size = batch_size or FEE_RECONCILE_BATCH_SIZE
+
+    pending = list_unreconciled_fee_donations(
+        max_age_days=max_age_days or FEE_RECONCILE_MAX_AGE_DAYS, limit=limit
+    )
+    result = {"checked": len(pending), "matched": 0, "updated": 0, "campaigns": 0}
+    if not pending:
+        return result
+
+    by_bt = {
+        d["stripe_balance_transaction_id"]: d
+        for d in pending
+        if d.get("stripe_balance_transaction_id")
+    }
+    by_pi = {
+        d["stripe_payment_intent_id"]: d
+        for d in pending
+        if d.get("stripe_payment_intent_id")
+    }
+    created_gte = int(
+        min(d["stripe_fee_checked_at"] or d["created_at"] for d in pending).timestamp()
+    )
+    created_gte -= _CREATED_SLACK_SECONDS
+    created_lte = int(time.time())
+
+    batch: list[dict[str, Any]] = []
+    campaigns: set[str] = set()
+    matched: set[str] = set()
+
+    def _flush() -> None:
+        if not batch:
+            return
+        result["updated"] += bulk_update_donation_fees(batch, page_size=batch_size)
+        campaigns.update(str(row["campaign_id"]) for row in batch)
+        batch.clear()
+
+    for bt in iter_balance_transactions(
+        client, created_gte=created_gte, created_lte=created_lte
+    ):
+        if bt.get("type") not in _CHARGE_TYPES:
+            continue
+        donation = by_bt.pop(bt.get("id"), None)
+        pi_id = _payment_intent_of(bt)
+        if donation is None and pi_id:
+            donation = by_pi.pop(pi_id, None)
+        if donation is None:
+            continue
+        by_bt.pop(donation.get("stripe_balance_transaction_id"), None)
+        by_pi.pop(donation.get("stripe_payment_intent_id"), None)
+        result["matched"] += 1
+        matched.add(str(donation["id"]))
+        batch.append(_reconciled_row(donation, bt))
+        if len(batch) >= batch_size:
+            _flush()
+        if not by_bt and not by_pi:
+            break
+    _flush()
+    mark_donation_fees_checked(
+        sorted(str(d["id"]) for d in pending if str(d["id"]) not in matched),
+        datetime.fromtimestamp(created_lte, tz=timezone.utc),
+    )
+
+    for campaign_id in campaigns:
+        try:
+            _refresh_campaign(campaign_id)
+        except Exception as e:
+            logger.error("fee reconcile refresh campaign %s: %s", campaign_id, e)
+    result["campaigns"] = len(campaigns)
+    logger.info("stripe fee reconciliation: %s", result)
+    return result
@@ -1,12 +1,38 @@
 from __future__ import annotations
-from typing import Dict, Any, Tuple, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Tuple, Optional
 import hashlib
+import os
+import random
+import secrets
+import uuid
 from datetime import datetime
-from secrets import choice
-from app.models.campaign import get_campaign_by_id, insert_giveaway_log
-from app.models.donation import list_succeeded_for_campaign, get_donation
+from app.models.campaign import (
+    create_giveaway_commitment,
+    get_campaign_by_id,
+    get_giveaway_commitment,
+    get_giveaway_draw,
+    insert_giveaway_log,
+    use_giveaway_commitment,
+)
+from app.models.donation import (
+    get_donation,
+    giveaway_population_cutoff,
+    iter_giveaway_entrants,
+)
+from app.models.email_receipt import render_winner_contents
 from app.models.org_user import get_user_role_in_org
 from app.services.email_service import send_winner_email
+from app.utils.db import after_commit, unit_of_work
+from app.utils.email_dispatcher import get_email_dispatcher
+from app.utils.weighted_sampling import HashRandom, weighted_sample
+
+GIVEAWAY_MODES = ("per_donation", "per_donor")
+# uniform: one entry per entrant; amount: one entry per cents_per_entry given.
+GIVEAWAY_WEIGHTINGS = ("uniform", "amount")
+DEFAULT_CENTS_PER_ENTRY = 100
+GIVEAWAY_MAX_WINNERS = int(os.getenv("GIVEAWAY_MAX_WINNERS", "50"))
+# Recorded with each draw: weighted_sample (A-ExpJ) driven by HashRandom.
+DRAW_ALGORITHM = "es-expj/sha256-ctr/v1"
 
 
 def _mask_email(e: Optional[str]) -> Optional[str]:
@@ -22,11 +48,109 @@ def _mask_email(e: Optional[str]) -> Optional[str]:
     return masked + "@" + domain
 
 
-def _population_hash(donation_ids: List[str], mode: str, min_amount_cents: int) -> str:
-    m = hashlib.sha256()
-    m.update(f"{mode}|{min_amount_cents}|".encode("utf-8"))
-    m.update(",".join(donation_ids).encode("utf-8"))
-    return m.hexdigest()
+class _PopulationHasher:
+    """
+    sha256 over the draw parameters and the entrants in stream order, fed
+    as the stream is read (in batches, to keep per-entrant overhead low).
+    Uniform draws hash the same bytes as before weighting existed
+    (mode|min|id,id,...); weighted draws also cover the entry parameters
+    and each entrant's entry count.
+    """
+
+    _BATCH = 4096
+
+    def __init__(
+        self,
+        mode: str,
+        min_amount_cents: int,
+        weighting: str,
+        cents_per_entry: int,
+        max_entries: Optional[int],
+    ):
+        self.weighted = weighting != "uniform"
+        self._m = hashlib.sha256()
+        prefix = f"{mode}|{min_amount_cents}|"
+        if self.weighted:
+            prefix += f"{weighting}|{cents_per_entry}|{max_entries or ''}|"
+        self._m.update(prefix.encode("utf-8"))
+        self._pending: list[str] = []
+        self._started = False
+
+    def add(self, donation_id: Any, entries: int) -> None:
+        self._pending.append(
+            f"{donation_id}:{entries}" if self.weighted else str(donation_id)
+        )
+        if len(self._pending) >= self._BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        chunk = ",".join(self._pending)
+        self._m.update((("," if self._started else "") + chunk).encode("utf-8"))
+        self._started = True
+        self._pending.clear()
+
+    def hexdigest(self) -> str:
+        self._flush()
+        return self._m.hexdigest()
+
+
+def draw_from_entrants(
+    entrants: Iterable[Tuple[Any, Optional[str], int]],
+    *,
+    winners: int = 1,
+    mode: str = "per_donation",
+    min_amount_cents: int = 0,
+    weighting: str = "uniform",
+    cents_per_entry: int = DEFAULT_CENTS_PER_ENTRY,
+    max_entries: Optional[int] = None,
+    rng: Optional[random.Random] = None,
+) -> Dict[str, Any]:
+    """
+    One pass over (donation_id, donor_email, amount_cents) entrants: pick up
+    to `winners` distinct entrants with odds proportional to their entries,
+    while counting and hashing the population. Memory is O(winners).
+    """
+    hasher = _PopulationHasher(
+        mode, min_amount_cents, weighting, cents_per_entry, max_entries
+    )
+    totals = {"population_count": 0, "total_entries": 0}
+
+    per_entry = cents_per_entry if weighting == "amount" else 0
+
+    def _entered() -> Iterator[Tuple[Tuple[Any, Optional[str], int], int]]:
+        for entrant in entrants:
+            # amount: one entry per cents_per_entry; uniform: one each.
+            entries = entrant[2] // per_entry if per_entry else 1
+            if max_entries is not None and entries > max_entries:
+                entries = max_entries
+            if entries <= 0:
+                continue
+            hasher.add(entrant[0], entries)
+            totals["population_count"] += 1
+            totals["total_entries"] += entries
+            yield entrant, entries
+
+    picked = weighted_sample(_entered(), winners, lambda e: e[1], rng=rng)
+    return {
+        "winners": [
+            {
+                "donation_id": entrant[0],
+                "donor_email": entrant[1],
+                "amount_cents": entrant[2],
+                "entries": entries,
+            }
+            for entrant, entries in picked
+        ],
+        "population_count": totals["population_count"],
+        "total_entries": totals["total_entries"],
+        "population_hash": hasher.hexdigest(),
+    }
+
+
+def _isoformat(value: Any) -> Any:
+    return value.isoformat() if hasattr(value, "isoformat") else value
 
 
 def _serialize_donation_row(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -83,13 +207,145 @@ def _serialize_donation(row: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _send_winner_email_logged(
+    org_id: str,
+    campaign_title: str,
+    winner_email: str,
+    prize_cents: Optional[int],
+    content: Optional[Dict[str, str]] = None,
+) -> None:
+    try:
+        send_winner_email(
+            org_id,
+            campaign_title,
+            winner_email,
+            prize_cents=prize_cents,
+            content=content,
+        )
+    except Exception as e:
+        print(f"[error] send_winner_email: {e}", flush=True)
+
+
+def _notify_winners(
+    org_id: str, campaign_title: str, emails: List[str], prize_cents: Optional[int]
+) -> None:
+    """Render every winner email against one set of templates, then send in the background."""
+    if not emails:
+        return
+    try:
+        contents = render_winner_contents(
+            org_id, campaign_title, emails, prize_cents=prize_cents
+        )
+    except Exception as e:
+        print(f"[error] render_winner_contents: {e}", flush=True)
+        return
+    dispatcher = get_email_dispatcher()
+    for winner_email, content in zip(emails, contents):
+        dispatcher.submit(
+            _send_winner_email_logged,
+            org_id,
+            campaign_title,
+            winner_email,
+            prize_cents,
+            content,
+        )
+
+
+def _draw_options(
+    mode: str,
+    weighting: str,
+    winners: int,
+    cents_per_entry: Optional[int],
+    max_entries: Optional[int],
+) -> Optional[str]:
+    """Error message for invalid draw parameters, or None."""
+    if mode not in GIVEAWAY_MODES:
+        return f"mode must be one of: {', '.join(GIVEAWAY_MODES)}"
+    if weighting not in GIVEAWAY_WEIGHTINGS:
+        return f"weighting must be one of: {', '.join(GIVEAWAY_WEIGHTINGS)}"
+    if not 1 <= winners <= GIVEAWAY_MAX_WINNERS:
+        return f"winners must be between 1 and {GIVEAWAY_MAX_WINNERS}"
+    if cents_per_entry is not None and cents_per_entry < 1:
+        return "cents_per_entry must be a positive integer"
+    if max_entries is not None and max_entries < 1:
+        return "max_entries must be a positive integer"
+    return None
+
+
+def _serialize_commitment(row: Dict[str, Any]) -> Dict[str, Any]:
+    # The seed stays secret until the commitment's draw has run.
+    return {
+        "id": str(row["id"]),
+        "campaign_id": str(row["campaign_id"]),
+        "seed_sha256": row["seed_sha256"],
+        "population_cutoff": _isoformat(row["population_cutoff"]),
+        "created_at": _isoformat(row["created_at"]),
+        "draw_id": str(row["draw_id"]) if row.get("draw_id") else None,
+        "seed": row["seed_hex"] if row.get("draw_id") else None,
+    }
+
+
+def commit_giveaway_seed(
+    campaign_id: str, current_user_id: str
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Pick a draw's seed ahead of time. The response (and the public
+    commitment endpoint) shows sha256(seed) and the population cutoff, and
+    a draw made with this commitment later reveals the seed, so anyone can
+    check the seed was fixed before the draw.
+    """
+    camp = get_campaign_by_id(campaign_id)
+    if not camp:
+        return 404, {"error": "campaign not found"}
+    role = get_user_role_in_org(current_user_id, camp["org_id"])
+    if role not in ("owner", "admin"):
+        return 403, {"error": "forbidden"}
+
+    seed = secrets.token_bytes(32)
+    row = create_giveaway_commitment(
+        org_id=camp["org_id"],
+        campaign_id=campaign_id,
+        created_by_user_id=current_user_id,
+        seed_hex=seed.hex(),
+        seed_sha256=hashlib.sha256(seed).hexdigest(),
+    )
+    return 201, _serialize_commitment(row)
+
+
+def get_giveaway_commitment_public(
+    campaign_id: str, commitment_id: str
+) -> Tuple[int, Dict[str, Any]]:
+    row = get_giveaway_commitment(campaign_id, commitment_id)
+    if not row:
+        return 404, {"error": "commitment not found"}
+    return 200, _serialize_commitment(row)
+
+
 def draw_winner_for_campaign(
     campaign_id: str,
     current_user_id: str,
     mode: str = "per_donation",
     min_amount_cents: int = 0,
     notes: Optional[str] = None,
+    winners: int = 1,
+    weighting: str = "uniform",
+    cents_per_entry: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    commitment_id: Optional[str] = None,
 ) -> Tuple[int, Dict[str, Any]]:
+    """
+    Draw and record winners. With commitment_id the draw uses that
+    commitment's seed and population cutoff (see commit_giveaway_seed);
+    without one a fresh seed is drawn now, so the draw can be replayed but
+    its seed was not published in advance.
+    """
+    error = _draw_options(mode, weighting, winners, cents_per_entry, max_entries)
+    if error:
+        return 400, {"error": error}
+    if cents_per_entry is None:
+        cents_per_entry = DEFAULT_CENTS_PER_ENTRY
+    min_amount_cents = int(min_amount_cents or 0)
+
     camp = get_campaign_by_id(campaign_id)
     if not camp:
         return 404, {"error": "campaign not found"}
@@ -100,60 +356,120 @@ def draw_winner_for_campaign(
     if role not in ("owner", "admin"):
         return 403, {"error": "forbidden"}
 
-    population: List[Dict[str, Any]] = list_succeeded_for_campaign(
-        campaign_id=campaign_id,
+    # The seed is recorded alongside the population snapshot, so
+    # verify_giveaway_draw can replay the draw exactly.
+    commitment = None
+    if commitment_id:
+        commitment = get_giveaway_commitment(campaign_id, commitment_id)
+        if not commitment:
+            return 404, {"error": "commitment not found"}
+        if commitment.get("draw_id"):
+            return 409, {"error": "commitment already used by another draw"}
+        seed = bytes.fromhex(commitment["seed_hex"])
+        cutoff = commitment["population_cutoff"]
+    else:
+        seed = secrets.token_bytes(32)
+        cutoff = giveaway_population_cutoff()
+    result = draw_from_entrants(
+        iter_giveaway_entrants(
+            campaign_id,
+            mode=mode,
+            min_amount_cents=min_amount_cents,
+            created_at_or_before=cutoff,
+        ),
+        winners=winners,
         mode=mode,
         min_amount_cents=min_amount_cents,
+        weighting=weighting,
+        cents_per_entry=cents_per_entry,
+        max_entries=max_entries,
+        rng=HashRandom(seed),
     )
-    if not population:
+    if not result["winners"]:
         return 400, {"error": "no eligible donations"}
 
-    donation_ids = [p["donation_id"] for p in population]
-    pop_hash = _population_hash(donation_ids, mode, min_amount_cents)
-    winner = choice(population)
-    winner_id = winner["donation_id"]
-    full = get_donation(winner_id)
-    if not full:
-        full = {
-            "id": winner_id,
-            "campaign_id": campaign_id,
-            "org_id": org_id,
-            "amount_cents": int(winner.get("amount_cents", 0)),
-            "currency": "usd",
-            "donor_email": winner.get("donor_email"),
-            "created_at": None,
-        }
-
-    log = insert_giveaway_log(
-        org_id=org_id,
-        campaign_id=campaign_id,
-        winner_donation_id=winner_id,
-        created_by_user_id=current_user_id,
-        mode=mode,
-        population_count=len(population),
-        population_hash=pop_hash,
-        notes=notes,
-    )
-
+    pop_hash = result["population_hash"]
+    draw_id = str(uuid.uuid4())
     prize_cents = camp.get("giveaway_prize_cents")
     if prize_cents is not None and prize_cents < 0:
         prize_cents = None
 
-    winner_email = full.get("donor_email")
-    if winner_email:
-        try:
-            send_winner_email(
-                org_id, camp["title"], winner_email, prize_cents=prize_cents
+    serialized = []
+    winner_emails: List[str] = []
+    log = None
+    # One transaction for the whole draw: a failed insert leaves no partial
+    # draw for verify_giveaway_draw to replay as complete, and winners are
+    # emailed only once the draw is recorded.
+    with unit_of_work():
+        if commitment:
+            commitment = use_giveaway_commitment(campaign_id, commitment_id, draw_id)
+            if not commitment:
+                return 409, {"error": "commitment already used by another draw"}
+        for rank, winner in enumerate(result["winners"], start=1):
+            winner_id = winner["donation_id"]
+            full = get_donation(winner_id)
+            if not full:
+                full = {
+                    "id": winner_id,
+                    "campaign_id": campaign_id,
+                    "org_id": org_id,
+                    "amount_cents": int(winner.get("amount_cents", 0)),
+                    "currency": "usd",
+                    "donor_email": winner.get("donor_email"),
+                    "created_at": None,
+                }
+
+            row_log = insert_giveaway_log(
+                org_id=org_id,
+                campaign_id=campaign_id,
+                winner_donation_id=winner_id,
+                created_by_user_id=current_user_id,
+                mode=mode,
+                population_count=result["population_count"],
+                population_hash=pop_hash,
+                notes=notes,
+                draw_id=draw_id,
+                winner_rank=rank,
+                weighting=weighting,
+                min_amount_cents=min_amount_cents,
+                cents_per_entry=cents_per_entry if weighting == "amount" else None,
+                max_entries=max_entries,
+                total_entries=result["total_entries"],
+                draw_algorithm=DRAW_ALGORITHM,
+                seed_hex=seed.hex(),
+                commitment_id=commitment_id if commitment else None,
+                population_cutoff=cutoff,
             )
-        except Exception as e:
-            print(f"[error] send_winner_email: {e}", flush=True)
+            log = log or row_log
+
+            if full.get("donor_email"):
+                winner_emails.append(full["donor_email"])
+
+            item = _serialize_donation_row(full)
+            item["rank"] = rank
+            item["entries"] = winner["entries"]
+            serialized.append(item)
+
+        after_commit(
+            lambda: _notify_winners(org_id, camp["title"], winner_emails, prize_cents)
+        )
 
     payload = {
-        "winner": _serialize_donation_row(full),
+        "winner": serialized[0],
+        "winners": serialized,
         "draw": {
+            "id": draw_id,
             "mode": mode,
-            "population_count": int(len(population)),
+            "weighting": weighting,
+            "cents_per_entry": cents_per_entry if weighting == "amount" else None,
+            "max_entries": max_entries,
+            "min_amount_cents": min_amount_cents,
+            "population_count": int(result["population_count"]),
+            "total_entries": int(result["total_entries"]),
             "population_hash": pop_hash,
+            "population_cutoff": _isoformat(cutoff),
+            "algorithm": DRAW_ALGORITHM,
+            "commitment": _serialize_commitment(commitment) if commitment else None,
             "created_at": (
                 log["created_at"].isoformat()
                 if isinstance(log, dict) and log.get("created_at")
@@ -166,3 +482,85 @@ def draw_winner_for_campaign(
         payload["giveaway_prize_cents"] = prize_cents
         payload["giveaway_prize"] = round(prize_cents / 100.0, 2)
     return 200, payload
+
+
+def verify_giveaway_draw(
+    campaign_id: str, draw_id: str, current_user_id: str
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Replay a recorded draw: re-stream the population up to the recorded
+    cutoff (one pass, O(winners) memory) and compare the population hash and
+    the winners in rank order. A draw made with a commitment is also checked
+    against it: the seed must hash to the published seed_sha256 and the
+    cutoff must be the committed one.
+    """
+    camp = get_campaign_by_id(campaign_id)
+    if not camp:
+        return 404, {"error": "campaign not found"}
+    role = get_user_role_in_org(current_user_id, camp["org_id"])
+    if role not in ("owner", "admin"):
+        return 403, {"error": "forbidden"}
+
+    rows = get_giveaway_draw(campaign_id, draw_id)
+    if not rows:
+        return 404, {"error": "draw not found"}
+    draw = rows[0]
+    if not draw.get("seed_hex") or draw.get("draw_algorithm") != DRAW_ALGORITHM:
+        return 409, {"error": "draw has no recorded seed to replay"}
+
+    seed = bytes.fromhex(draw["seed_hex"])
+    weighting = draw.get("weighting") or "uniform"
+    result = draw_from_entrants(
+        iter_giveaway_entrants(
+            campaign_id,
+            mode=draw["mode"],
+            min_amount_cents=draw.get("min_amount_cents") or 0,
+            created_at_or_before=draw["population_cutoff"],
+        ),
+        winners=len(rows),
+        mode=draw["mode"],
+        min_amount_cents=draw.get("min_amount_cents") or 0,
+        weighting=weighting,
+        cents_per_entry=draw.get("cents_per_entry") or DEFAULT_CENTS_PER_ENTRY,
+        max_entries=draw.get("max_entries"),
+        rng=HashRandom(seed),
+    )
+
+    recorded_winners = [str(row["winner_donation_id"]) for row in rows]
+    replayed_winners = [str(w["donation_id"]) for w in result["winners"]]
+    checks = {
+        "population_hash": result["population_hash"] == draw["population_hash"],
+        "population_count": result["population_count"] == draw["population_count"],
+        "winners": replayed_winners == recorded_winners,
+    }
+    commitment = None
+    if draw.get("commitment_id"):
+        commitment = get_giveaway_commitment(campaign_id, draw["commitment_id"])
+        checks["commitment"] = bool(
+            commitment
+            and hashlib.sha256(seed).hexdigest() == commitment["seed_sha256"]
+            and draw["population_cutoff"] == commitment["population_cutoff"]
+            and str(commitment.get("draw_id")) == str(draw_id)
+        )
+    return 200, {
+        "draw_id": str(draw_id),
+        "verified": all(checks.values()),
+        "checks": checks,
+        "algorithm": draw["draw_algorithm"],
+        "seed": draw["seed_hex"],
+        "commitment": _serialize_commitment(commitment) if commitment else None,
+        "population_cutoff": _isoformat(draw["population_cutoff"]),
+        "population_hash": {
+            "recorded": draw["population_hash"],
+            "recomputed": result["population_hash"],
+        },
+        "population_count": {
+            "recorded": draw["population_count"],
+            "recomputed": result["population_count"],
+        },
+        # Refunds or edits since the draw change the replayed population.
+        "population_changed_since_draw": not (
+            checks["population_hash"] and checks["population_count"]
+        ),
+        "winners": {"recorded": recorded_winners, "replayed": replayed_winners},
+    }
@@ -0,0 +1,227 @@
+"""
+Transactional outbox for the side effects of database changes.
+
+add_side_effects() records (kind, payload) rows in outbox_events on the
+caller's connection, so they commit or roll back with the change that
+caused them, and asks for a dispatch once that transaction commits.
+A dispatch claims due rows in batches (FOR UPDATE SKIP LOCKED plus a
+lease), runs the handler for each kind and marks the batch done. A failed
+delivery is retried with backoff and dead-lettered after
+OUTBOX_MAX_ATTEMPTS.
+
+Web processes dispatch on a background (green) thread started by
+create_app(), so a request never waits for its side effects; elsewhere
+(RQ workers, scripts) the dispatch runs inline after the commit. The
+periodic sweeper (app.tasks.run_outbox_sweeper) picks up retries and rows
+left behind by a process that died. Delivery is at least once, so
+handlers must tolerate repeats.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, Iterable, Tuple
+
+from app.models.campaign import (
+    complete_campaign_if_goal_reached,
+    record_platform_fee_if_goal_reached,
+)
+from app.models.outbox_event import (
+    claim_outbox_events,
+    insert_outbox_events,
+    mark_outbox_events_done,
+    record_outbox_failure,
+)
+from app.realtime import broadcast
+from app.realtime.aggregator import broadcast_donation
+from app.tasks import enqueue_campaign_payout, enqueue_receipt_email
+from app.utils.cache import (
+    invalidate_campaign_progress_cache,
+    invalidate_campaign_recent_donations_cache,
+)
+from app.utils.db import after_commit, unit_of_work
+from app.utils.metrics import OUTBOX_DELIVERIES
+from app.utils.public_campaign_cache import invalidate_public_campaign_cache
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "600"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "10"))
+
+
+def add_side_effects(events: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+    """Record side effects in the current transaction; dispatched after commit."""
+    if insert_outbox_events(events):
+        after_commit(request_dispatch)
+
+
+def _deliver_receipt_email(payload: Dict[str, Any]) -> None:
+    enqueue_receipt_email(payload["donation_id"])
+
+
+def _deliver_campaign_caches(payload: Dict[str, Any]) -> None:
+    campaign_id = str(payload["campaign_id"])
+    invalidate_campaign_progress_cache(campaign_id)
+    invalidate_campaign_recent_donations_cache(campaign_id)
+    invalidate_public_campaign_cache(campaign_id)
+
+
+def _deliver_campaign_goal(payload: Dict[str, Any]) -> None:
+    # The payout (and the cache bust for the new status) is recorded in the
+    # same transaction as the completion, so it cannot be lost between them.
+    campaign_id = str(payload["campaign_id"])
+    with unit_of_work():
+        record_platform_fee_if_goal_reached(campaign_id)
+        if complete_campaign_if_goal_reached(campaign_id):
+            add_side_effects(
+                [
+                    ("campaign_payout", {"campaign_id": campaign_id}),
+                    ("campaign_caches", {"campaign_id": campaign_id}),
+                ]
+            )
+
+
+def _deliver_campaign_payout(payload: Dict[str, Any]) -> None:
+    enqueue_campaign_payout(str(payload["campaign_id"]))
+
+
+def _deliver_socket_emit(payload: Dict[str, Any]) -> None:
+    broadcast(payload["event"], payload["data"], room=payload["room"])
+
+
+def _deliver_donation_broadcast(payload: Dict[str, Any]) -> None:
+    broadcast_donation(
+        payload["campaign_id"], payload["donation"], payload["total_raised"]
+    )
+
+
+OUTBOX_HANDLERS: Dict[str, Callable[[Dict[str, Any]], None]] = {
+    "receipt_email": _deliver_receipt_email,
+    "campaign_caches": _deliver_campaign_caches,
+    "campaign_goal": _deliver_campaign_goal,
+    "campaign_payout": _deliver_campaign_payout,
+    "socket_emit": _deliver_socket_emit,
+    "donation_broadcast": _deliver_donation_broadcast,
+}
+
+# Idempotent kinds delivered once per batch however many rows ask for them
+# (a burst of donations to one campaign busts its caches once).
+_COALESCED_KINDS = {"campaign_caches", "campaign_goal"}
+
+
+def _retry_delay_seconds(attempts: int) -> float:
+    delay = min(
+        OUTBOX_RETRY_MAX_SECONDS,
+        OUTBOX_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1),
+    )
+    return round(delay * random.uniform(0.5, 1.0), 3)
+
+
+def dispatch_outbox_batch(limit: int = OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Claim and deliver one batch of due side effects, in the order they were
+    recorded. Returns {"claimed", "delivered", "retrying", "dead"}.
+    """
+    events = claim_outbox_events(limit, OUTBOX_LEASE_SECONDS)
+    counts = {"claimed": len(events), "delivered": 0, "retrying": 0, "dead": 0}
+    done = []
+    coalesced: Dict[str, str | None] = {}
+    for ev in events:
+        kind = ev["kind"]
+        payload = ev["payload"] or {}
+        key = f"{kind}:{json.dumps(payload, sort_keys=True, default=str)}"
+        if kind in _COALESCED_KINDS and key in coalesced:
+            error = coalesced[key]
+        else:
+            handler = OUTBOX_HANDLERS.get(kind)
+            error = None
+            try:
+                if handler is None:
+                    raise LookupError(f"no outbox handler for {kind!r}")
+                handler(payload)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            coalesced[key] = error
+
+        if error is None:
+            done.append(ev["id"])
+            counts["delivered"] += 1
+            OUTBOX_DELIVERIES.labels(kind=kind, outcome="delivered").inc()
+            continue
+        delay = _retry_delay_seconds(int(ev["attempts"] or 0))
+        status = record_outbox_failure(
+            ev["id"],
+            error,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            retry_in_seconds=delay,
+        )
+        outcome = "dead" if status == "dead" else "retrying"
+        counts[outcome] += 1
+        OUTBOX_DELIVERIES.labels(kind=kind, outcome=outcome).inc()
+        logger.warning(
+            "outbox %s #%s failed (%s, attempt %s): %s",
+            kind,
+            ev["id"],
+            "dead-lettered" if outcome == "dead" else f"retry in {delay}s",
+            ev["attempts"],
+            error,
+        )
+    mark_outbox_events_done(done)
+    return counts
+
+
+def drain_outbox(max_batches: int = 50) -> Dict[str, int]:
+    """Dispatch batches until nothing is due (or max_batches). Returns the totals."""
+    totals = {"claimed": 0, "delivered": 0, "retrying": 0, "dead": 0}
+    for _ in range(max(1, int(max_batches))):
+        counts = dispatch_outbox_batch()
+        for k, v in counts.items():
+            totals[k] += v
+        if counts["claimed"] < OUTBOX_BATCH_SIZE:
+            break
+    return totals
+
+
+_wake = threading.Event()
+_dispatcher_started = False
+
+
+def request_dispatch() -> None:
+    """Deliver newly committed side effects: wake the dispatcher thread, or drain inline."""
+    if _dispatcher_started:
+        _wake.set()
+        return
+    try:
+        drain_outbox()
+    except Exception as e:
+        # The rows are committed; the sweeper delivers them later.
+        logger.warning("outbox dispatch failed: %s", e)
+
+
+def _dispatch_forever() -> None:
+    while True:
+        _wake.wait(OUTBOX_POLL_SECONDS)
+        _wake.clear()
+        try:
+            drain_outbox()
+        except Exception as e:
+            logger.warning("outbox dispatch failed: %s", e)
+
+
+def start_outbox_dispatcher() -> None:
+    """Dispatch side effects on a daemon (green) thread in this process, once."""
+    global _dispatcher_started
+    if _dispatcher_started or os.getenv("OUTBOX_DISPATCHER_ENABLED", "1") != "1":
+        return
+    _dispatcher_started = True
+    threading.Thread(
+        target=_dispatch_forever, name="outbox-dispatcher", daemon=True
+    ).start()
@@ -5,7 +5,7 @@ import uuid
 from typing import Any
 
 from app.models.campaign import get_campaign
-from app.models.donation import summarize_succeeded_donations
+from app.models.campaign_donation_stats import get_campaign_donation_stats
 from app.models.org import get_organization
 from app.models.settlement import (
     create_campaign_payout,
@@ -38,7 +38,7 @@ def build_campaign_settlement(campaign_id: str) -> dict[str, Any]:
     if not campaign:
         return {"error": "campaign not found"}
     fee_option = normalize_fee_option(campaign.get("fee_option"))
-    summary = summarize_succeeded_donations(campaign_id)
+    summary = get_campaign_donation_stats(campaign_id)
     settlement = upsert_campaign_settlement(
         campaign_id=campaign_id,
         org_id=campaign["org_id"],
@@ -162,7 +162,7 @@ def get_campaign_finance_summary(campaign_id: str) -> dict[str, Any]:
     campaign = get_campaign(campaign_id)
     if not campaign:
         return {"error": "campaign not found"}
-    running = summarize_succeeded_donations(campaign_id)
+    running = get_campaign_donation_stats(campaign_id)
     settlement = get_campaign_settlement(campaign_id)
     payouts = list_campaign_payouts(campaign_id)
     return {
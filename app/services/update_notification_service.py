@@ -0,0 +1,172 @@
+"""
+Campaign update emails to every donor, fanned out as checkpointed chunks.
+
+plan_update_notifications streams the campaign's distinct donor emails
+in order and cuts them into chunks of UPDATE_NOTIFY_CHUNK_SIZE, recording
+each chunk's email range in campaign_update_sends and handing it to a
+dispatch callback (app.tasks enqueues one RQ job per chunk). A chunk job
+sends its range with send_bulk_email, a window of concurrent provider
+calls at a time, and checkpoints the last address sent after every window. A retried chunk
+resumes after the checkpoint, and a re-run planner continues from the
+last planned chunk, so retries do not resend what was checkpointed.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from app.models.campaign import get_campaign
+from app.models.campaign_update import get_update
+from app.models.campaign_update_send import (
+    checkpoint_update_send,
+    claim_update_send,
+    create_update_send,
+    get_update_send,
+    list_update_sends,
+)
+from app.models.donation import iter_campaign_donor_emails
+from app.models.org_email_settings import get_email_settings
+from app.utils.email_dispatcher import get_email_dispatcher
+from app.utils.email_sender import bulk_batch_size, send_bulk_email
+
+UPDATE_NOTIFY_CHUNK_SIZE = int(os.getenv("UPDATE_NOTIFY_CHUNK_SIZE", "1000"))
+# A sending chunk not checkpointed for this long is presumed abandoned (its
+# worker died) and may be claimed by another job.
+UPDATE_NOTIFY_CLAIM_STALE_SECONDS = int(
+    os.getenv("UPDATE_NOTIFY_CLAIM_STALE_SECONDS", "120")
+)
+
+
+class ChunkSendError(RuntimeError):
+    """A provider call failed outright; the chunk should be retried."""
+
+
+class ChunkBusyError(RuntimeError):
+    """
+    Another job holds the chunk's claim. It may have died mid-send, so the
+    chunk should be retried once the claim can go stale.
+    """
+
+
+def build_update_email(camp: Dict[str, Any], upd: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "subject": f"New update: {upd['title']} – {camp['title']}",
+        "body_text": f"{upd['title']}\n\n{upd['body']}\n\n— {camp['title']}",
+        "body_html": (
+            f"<h2>{upd['title']}</h2><p>{upd['body']}</p><p>— {camp['title']}</p>"
+        ),
+    }
+
+
+def plan_update_notifications(
+    campaign_id: str,
+    update_id: str,
+    dispatch: Callable[[str, str, int], Any],
+    chunk_size: int = UPDATE_NOTIFY_CHUNK_SIZE,
+) -> Dict[str, int]:
+    """
+    Record and dispatch every chunk of the update's recipients. Safe to run
+    again: unfinished chunks are re-dispatched and planning resumes after
+    the last planned chunk. Returns {"chunks": N, "recipients": M}.
+    """
+    planned = list_update_sends(update_id)
+    for chunk in planned:
+        if chunk["status"] != "done":
+            dispatch(campaign_id, update_id, chunk["chunk_index"])
+
+    after = planned[-1]["last_email"] if planned else None
+    chunk_index = planned[-1]["chunk_index"] + 1 if planned else 0
+    totals = {
+        "chunks": len(planned),
+        "recipients": sum(c["recipients"] for c in planned),
+    }
+    count, last = 0, None
+
+    def _emit() -> None:
+        create_update_send(update_id, chunk_index, after, last, count)
+        dispatch(campaign_id, update_id, chunk_index)
+        totals["chunks"] += 1
+        totals["recipients"] += count
+
+    for email in iter_campaign_donor_emails(campaign_id, after=after):
+        count += 1
+        last = email
+        if count >= chunk_size:
+            _emit()
+            chunk_index, after, count = chunk_index + 1, last, 0
+    if count:
+        _emit()
+    return totals
+
+
+def send_update_notification_chunk(
+    campaign_id: str, update_id: str, chunk_index: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Send one planned chunk, resuming after its checkpoint. Raises
+    ChunkSendError when a provider call fails outright (after checkpointing
+    what was sent) and ChunkBusyError when another job holds the chunk, so
+    the job is retried either way; a retry after a dead worker's claim goes
+    stale takes the chunk over.
+    """
+    chunk = claim_update_send(update_id, chunk_index, UPDATE_NOTIFY_CLAIM_STALE_SECONDS)
+    if not chunk:
+        current = get_update_send(update_id, chunk_index)
+        if current and current["status"] != "done":
+            raise ChunkBusyError(
+                f"update {update_id} chunk {chunk_index} is claimed by another job"
+            )
+        return current
+    camp = get_campaign(campaign_id)
+    upd = get_update(update_id)
+    if not camp or not upd:
+        checkpoint_update_send(update_id, chunk_index, status="done")
+        return get_update_send(update_id, chunk_index)
+
+    org_settings = get_email_settings(camp["org_id"]) or {}
+    message = build_update_email(camp, upd)
+
+    # One window is enough provider calls to keep every dispatcher worker busy.
+    batch_size = bulk_batch_size() * get_email_dispatcher().max_workers
+    batch: List[str] = []
+
+    def _flush() -> None:
+        result = send_bulk_email(
+            to_emails=batch,
+            from_email=org_settings.get("from_email"),
+            from_name=org_settings.get("from_name"),
+            **message,
+        )
+        done = batch
+        unsent = set(result["unsent"])
+        if unsent:
+            # Resume before the first failed call; later calls of this window
+            # that succeeded are sent again by the retry.
+            done = batch[: next(i for i, e in enumerate(batch) if e in unsent)]
+        done_set = set(done)
+        checkpoint_update_send(
+            update_id,
+            chunk_index,
+            status="queued" if unsent else None,
+            last_sent_email=done[-1] if done else None,
+            sent=sum(1 for e in result["sent"] if e in done_set),
+            failed=sum(1 for e in result["failed"] if e in done_set),
+            last_error=result["error"] if unsent else None,
+        )
+        if unsent:
+            raise ChunkSendError(result["error"] or "send failed")
+        batch.clear()
+
+    for email in iter_campaign_donor_emails(
+        campaign_id,
+        after=chunk["last_sent_email"] or chunk["after_email"],
+        through=chunk["last_email"],
+    ):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            _flush()
+    if batch:
+        _flush()
+    checkpoint_update_send(update_id, chunk_index, status="done")
+    return get_update_send(update_id, chunk_index)
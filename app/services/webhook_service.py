@@ -1,7 +1,10 @@
 import os
 import json
+import random
+from datetime import datetime, timezone
 from typing import Tuple, Dict, Any
 
+
 from app.models.donation import (
     get_donation_by_pi,
     set_status_by_pi,
@@ -12,25 +15,38 @@ from app.models.donation import (
 )
 from app.models.campaign import (
     get_campaign,
-    recompute_total_raised,
-    complete_campaign_if_goal_reached,
-    record_platform_fee_if_goal_reached,
+    apply_donation_transition,
+    get_campaign_totals,
+)
+from app.utils.db import savepoint, transactional, unit_of_work
+from app.utils.metrics import STRIPE_EVENT_LAG_SECONDS, STRIPE_EVENTS_PROCESSED
+from app.models.stripe_event import (
+    get_next_pending_event,
+    insert_pending_event,
+    try_lock_ordering_key,
+    mark_event_processed,
+    mark_pending_event_processed,
+    record_event_failure,
 )
-from app.utils.cache import r
-from app.utils.public_campaign_cache import invalidate_public_campaign_cache
-from app.realtime import socketio
-from app.models.stripe_event import mark_event_processed
-from app.tasks import enqueue_receipt_email, enqueue_campaign_payout
+from app.tasks import enqueue_stripe_event_processing
 from app.services.fee_policy_service import (
     build_donation_accounting,
     estimate_stripe_processing_fee_cents,
     normalize_fee_option,
 )
+from app.services.outbox_service import add_side_effects
 from app.services.settlement_service import reconcile_payout_event
 
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "").strip()
 DEV_SKIP = os.getenv("DEV_STRIPE_NO_VERIFY") == "1"
-STRIPE_SECRET = os.getenv("STRIPE_SECRET_KEY", "").strip()
+STRIPE_WEBHOOK_ASYNC = os.getenv("STRIPE_WEBHOOK_ASYNC", "0") == "1"
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "8"))
+STRIPE_EVENT_RETRY_BASE_SECONDS = float(
+    os.getenv("STRIPE_EVENT_RETRY_BASE_SECONDS", "5")
+)
+STRIPE_EVENT_RETRY_MAX_SECONDS = float(
+    os.getenv("STRIPE_EVENT_RETRY_MAX_SECONDS", "900")
+)
 
 
 def _mask_email(e: str | None) -> str | None:
@@ -95,39 +111,20 @@ def _find_donation(pi_id: str | None, donation_id: str | None) -> dict | None:
 
 
 def _extract_stripe_fee_from_obj(obj: dict | None) -> tuple[str | None, int]:
+    """
+    Actual fee from an expanded balance_transaction on the event object, else
+    (balance transaction id or None, 0). Never calls the Stripe API: the caller
+    records an estimate and reconcile_stripe_fees fills in the real fee later.
+    """
     data = obj or {}
     bt = data.get("balance_transaction")
     if isinstance(bt, dict):
         fee = bt.get("fee")
-        bt_id = bt.get("id")
         if fee is not None:
-            return bt_id, int(fee)
+            return bt.get("id"), int(fee)
+        return bt.get("id"), 0
     if isinstance(bt, str):
-        if STRIPE_SECRET:
-            try:
-                import stripe
-
-                stripe.api_key = STRIPE_SECRET
-                row = stripe.BalanceTransaction.retrieve(bt)
-                return bt, int(row.get("fee") or 0)
-            except Exception:
-                return bt, 0
         return bt, 0
-    if STRIPE_SECRET:
-        charge_id = data.get("latest_charge")
-        if isinstance(charge_id, str):
-            try:
-                import stripe
-
-                stripe.api_key = STRIPE_SECRET
-                charge = stripe.Charge.retrieve(
-                    charge_id, expand=["balance_transaction"]
-                )
-                balance_tx = charge.get("balance_transaction")
-                if isinstance(balance_tx, dict):
-                    return balance_tx.get("id"), int(balance_tx.get("fee") or 0)
-            except Exception:
-                pass
     return None, 0
 
 
@@ -159,29 +156,34 @@ def _apply_status_update(
     emit_socket: bool = False,
     event_obj: dict | None = None,
 ) -> None:
+    """
+    Apply a donation status change. Its side effects (receipt, cache busts,
+    goal check, realtime emit) go to the outbox in the same transaction and
+    are delivered after the commit.
+    """
     d = _find_donation(pi_id=pi_id, donation_id=donation_id)
     if d and pi_id and not d.get("stripe_payment_intent_id"):
         attach_pi_to_donation(d["id"], pi_id)
 
+    transition = None
     if d and d.get("stripe_payment_intent_id"):
-        set_status_by_pi(d["stripe_payment_intent_id"], new_status)
+        transition = set_status_by_pi(d["stripe_payment_intent_id"], new_status)
         d = get_donation(d["id"])
     elif donation_id:
-        set_status_by_id(donation_id, new_status)
+        transition = set_status_by_id(donation_id, new_status)
         d = get_donation(donation_id)
 
+    side_effects: list[tuple[str, dict]] = []
     if enqueue_receipt and (d or {}).get("id"):
-        try:
-            enqueue_receipt_email((d or {}).get("id"))
-        except Exception as e:
-            print("[email receipt error]", str(e))
+        side_effects.append(("receipt_email", {"donation_id": str(d["id"])}))
 
     if new_status == "succeeded" and d:
         campaign = get_campaign((d or {}).get("campaign_id"))
         if campaign:
             fee_option = normalize_fee_option(campaign.get("fee_option"))
             stripe_bt_id, stripe_fee_cents = _extract_stripe_fee_from_obj(event_obj)
-            if stripe_fee_cents <= 0:
+            fee_reconciled = stripe_fee_cents > 0
+            if not fee_reconciled:
                 metadata = (event_obj or {}).get("metadata") or {}
                 try:
                     charge_amount_cents = int(
@@ -212,67 +214,128 @@ def _apply_status_update(
                 donor_fee_cents=accounting.donor_fee_cents,
                 platform_absorbed_fee_cents=accounting.platform_absorbed_fee_cents,
                 net_to_org_cents=accounting.net_to_org_cents,
+                stripe_fee_reconciled=fee_reconciled,
             )
 
     cid = (d or {}).get("campaign_id") or campaign_id
     if not cid:
+        add_side_effects(side_effects)
         return
-
-    totals = recompute_total_raised(cid)
-    try:
-        r().delete(f"campaign:{cid}:progress:v1")
-    except Exception as e:
-        print(f"[error] redis cache bust campaign:{cid}: {e}", flush=True)
-    invalidate_public_campaign_cache(str(cid))
+    cid = str(cid)
+
+    if transition:
+        totals = apply_donation_transition(
+            str(transition["campaign_id"]),
+            previous_status=transition.get("previous_status"),
+            new_status=transition.get("status"),
+            amount_cents=int(transition.get("amount_cents") or 0),
+        )
+    else:
+        totals = get_campaign_totals(cid)
+    totals = totals or {"total_raised": 0}
 
     if new_status == "succeeded":
-        try:
-            record_platform_fee_if_goal_reached(cid)
-        except Exception as fee_err:
-            print("[platform fee error]", str(fee_err))
-        try:
-            completed_now = complete_campaign_if_goal_reached(cid)
-            if completed_now:
-                enqueue_campaign_payout(cid)
-        except Exception as completion_err:
-            print("[campaign complete/payout error]", str(completion_err))
+        # Records the platform fee, completes the campaign and queues its payout.
+        side_effects.append(("campaign_goal", {"campaign_id": cid}))
+    side_effects.append(("campaign_caches", {"campaign_id": cid}))
 
     if emit_socket and new_status == "succeeded":
         amount_cents = int((d or {}).get("amount_cents") or 0)
         donor_email = (d or {}).get("donor_email")
-        payload_out = {
-            "campaign_id": cid,
-            "amount_cents": amount_cents,
-            "amount": round(amount_cents / 100.0, 2),
-            "donor": _mask_email(donor_email),
-            "total_raised": float(totals["total_raised"]),
-            "currency": (d or {}).get("currency", "usd"),
-        }
-        try:
-            socketio.emit("donation", payload_out, to=f"campaign:{cid}")
-        except Exception as e:
-            print(
-                f"[error] socketio emit donation campaign:{cid}: {e}",
-                flush=True,
+        side_effects.append(
+            (
+                "donation_broadcast",
+                {
+                    "campaign_id": cid,
+                    "donation": {
+                        "amount_cents": amount_cents,
+                        "amount": round(amount_cents / 100.0, 2),
+                        "donor": _mask_email(donor_email),
+                        "currency": (d or {}).get("currency", "usd"),
+                    },
+                    "total_raised": float(totals["total_raised"]),
+                },
             )
+        )
+
+    add_side_effects(side_effects)
+
+
+def _event_id(ev_type: str | None, obj: dict | None, raw_event: dict | None) -> str:
+    pi_id = (obj or {}).get("id")
+    donation_id = ((obj or {}).get("metadata") or {}).get("donation_id")
+    return (raw_event or {}).get(
+        "id"
+    ) or f"dev:{ev_type}:{pi_id or 'nopi'}:{donation_id or 'nodon'}"
 
 
+def _ordering_key(ev_type: str | None, obj: dict | None, event_id: str) -> str:
+    """
+    Events sharing a key are processed strictly in order: everything about one
+    PaymentIntent (its own events, charge refunds, disputes) shares "pi_...".
+    Other objects (transfers, payouts) are ordered per object id.
+    """
+    pi_id, _donation_id, _campaign_id = _resolve_event_context(obj)
+    if pi_id:
+        return pi_id
+    data = obj or {}
+    if data.get("id"):
+        return f"{data.get('object') or (ev_type or '').split('.')[0]}:{data['id']}"
+    return f"event:{event_id}"
+
+
+@transactional
 def process_stripe_event(
     payload: bytes, sig_header: str | None
 ) -> Tuple[int, Dict[str, Any]]:
     """
     Handle selected Stripe events idempotently.
+
+    Runs as one unit of work: the dedupe insert, status change and accounting
+    commit together (or not at all, so Stripe's retry reprocesses the event),
+    and cache busts / emits / enqueues fire only after the commit.
     """
     ev_type, obj, raw_event = _extract_event(payload, sig_header)
+    event_id = _event_id(ev_type, obj, raw_event)
 
-    pi_id = (obj or {}).get("id")
-    donation_id = ((obj or {}).get("metadata") or {}).get("donation_id")
-    event_id = (raw_event or {}).get(
-        "id"
-    ) or f"dev:{ev_type}:{pi_id or 'nopi'}:{donation_id or 'nodon'}"
+    try:
+        # A failed insert rolls back to the savepoint, so the 400 below still
+        # commits instead of surfacing as UnitOfWorkAborted.
+        with savepoint("stripe_event_dedupe"):
+            inserted = mark_event_processed(
+                event_id, ev_type or "unknown", raw_event or {}
+            )
+    except Exception as e:
+        print("[webhook error]", str(e))
+        return 400, {"error": "bad payload"}
+
+    if not inserted:
+        return 200, {"ok": True, "duplicate": True}
+
+    return 200, handle_stripe_event(ev_type, obj)
+
+
+def ingest_stripe_event(
+    payload: bytes, sig_header: str | None
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Async mode (STRIPE_WEBHOOK_ASYNC=1): verify the signature, persist the event
+    as pending in stripe_events and hand it to the stripe_events RQ queue.
+    The HTTP response does not wait for any processing.
+    """
+    ev_type, obj, raw_event = _extract_event(payload, sig_header)
+    event_id = _event_id(ev_type, obj, raw_event)
+    ordering_key = _ordering_key(ev_type, obj, event_id)
+    event_created = (raw_event or {}).get("created")
 
     try:
-        inserted = mark_event_processed(event_id, ev_type or "unknown", raw_event or {})
+        inserted = insert_pending_event(
+            event_id,
+            ev_type or "unknown",
+            raw_event or {},
+            ordering_key=ordering_key,
+            event_created=int(event_created) if event_created else None,
+        )
     except Exception as e:
         print("[webhook error]", str(e))
         return 400, {"error": "bad payload"}
@@ -280,6 +343,96 @@ def process_stripe_event(
     if not inserted:
         return 200, {"ok": True, "duplicate": True}
 
+    if enqueue_stripe_event_processing(ordering_key):
+        return 200, {"ok": True, "queued": True}
+
+    # No queue: process inline, like the other enqueue fallbacks. The event is
+    # already stored, so a failure here is retried later instead of lost.
+    try:
+        process_pending_stripe_events(ordering_key)
+    except Exception as e:
+        print("[webhook inline processing error]", str(e))
+    return 200, {"ok": True, "queued": False}
+
+
+def _retry_delay_seconds(attempts: int) -> float:
+    delay = min(
+        STRIPE_EVENT_RETRY_MAX_SECONDS, STRIPE_EVENT_RETRY_BASE_SECONDS * 2**attempts
+    )
+    return round(delay * random.uniform(0.5, 1.0), 3)
+
+
+def process_pending_stripe_events(
+    ordering_key: str, *, max_events: int = 100
+) -> Dict[str, Any]:
+    """
+    Drain pending events for one ordering key, oldest first. Each event runs in
+    its own unit of work holding a per-key advisory lock, so keys are processed
+    in parallel across workers but never concurrently with themselves.
+
+    A failing event blocks later events for the same key (to keep order) until
+    it succeeds on retry or is dead-lettered after STRIPE_EVENT_MAX_ATTEMPTS.
+    """
+    processed = dead = 0
+    for _ in range(max(1, int(max_events))):
+        ev = None
+        try:
+            with unit_of_work():
+                if not try_lock_ordering_key(ordering_key):
+                    # The holder drains the key; anything it misses is
+                    # picked up by the sweeper.
+                    return {"processed": processed, "dead": dead, "state": "busy"}
+                ev = get_next_pending_event(ordering_key)
+                if ev is None:
+                    return {"processed": processed, "dead": dead, "state": "drained"}
+                if not ev["due"]:
+                    retry_at = ev["next_attempt_at"]
+                    break
+                raw = ev["raw"] or {}
+                obj = (raw.get("data") or {}).get("object") or {}
+                handle_stripe_event(raw.get("type") or ev["type"], obj)
+                mark_pending_event_processed(ev["event_id"])
+        except Exception as e:
+            if ev is None:
+                raise
+            delay = _retry_delay_seconds(int(ev["attempts"] or 0))
+            failure = record_event_failure(
+                ev["event_id"],
+                str(e),
+                max_attempts=STRIPE_EVENT_MAX_ATTEMPTS,
+                retry_in_seconds=delay,
+            )
+            if failure and failure["status"] == "dead":
+                dead += 1
+                STRIPE_EVENTS_PROCESSED.labels(outcome="dead").inc()
+                print(f"[stripe event dead-lettered] {ev['event_id']}: {e}")
+                continue
+            STRIPE_EVENTS_PROCESSED.labels(outcome="retry").inc()
+            print(f"[stripe event retry in {delay}s] {ev['event_id']}: {e}")
+            enqueue_stripe_event_processing(ordering_key, delay_seconds=delay)
+            return {"processed": processed, "dead": dead, "state": "retrying"}
+
+        processed += 1
+        STRIPE_EVENTS_PROCESSED.labels(outcome="processed").inc()
+        received_at = ev.get("created_at")
+        if received_at is not None:
+            STRIPE_EVENT_LAG_SECONDS.observe(
+                max(0.0, (datetime.now(timezone.utc) - received_at).total_seconds())
+            )
+    else:
+        # Hit max_events; let another job continue so one hot key cannot pin a worker.
+        enqueue_stripe_event_processing(ordering_key)
+        return {"processed": processed, "dead": dead, "state": "continued"}
+
+    delay = 0.0
+    if retry_at is not None:
+        delay = max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    enqueue_stripe_event_processing(ordering_key, delay_seconds=delay)
+    return {"processed": processed, "dead": dead, "state": "waiting"}
+
+
+def handle_stripe_event(ev_type: str | None, obj: dict | None) -> Dict[str, Any]:
+    """Apply one (already deduplicated) Stripe event. Returns the response body."""
     if ev_type in {
         "payment_intent.succeeded",
         "payment_intent.payment_failed",
@@ -300,7 +453,7 @@ def process_stripe_event(
             emit_socket=new_status == "succeeded",
             event_obj=obj,
         )
-        return 200, {"ok": True}
+        return {"ok": True}
 
     if ev_type == "charge.refunded":
         pi_id, donation_id, campaign_id = _resolve_event_context(obj)
@@ -311,7 +464,7 @@ def process_stripe_event(
             new_status="refunded",
             event_obj=obj,
         )
-        return 200, {"ok": True}
+        return {"ok": True}
 
     if ev_type in {
         "charge.dispute.created",
@@ -335,7 +488,7 @@ def process_stripe_event(
             new_status=new_status,
             event_obj=obj,
         )
-        return 200, {"ok": True}
+        return {"ok": True}
 
     if ev_type in {
         "transfer.created",
@@ -352,6 +505,6 @@ def process_stripe_event(
             reconcile_payout_event(ev_type, obj or {})
         except Exception as e:
             print("[payout reconcile error]", str(e))
-        return 200, {"ok": True}
+        return {"ok": True}
 
-    return 200, {"ignored": ev_type or "unknown"}
+    return {"ignored": ev_type or "unknown"}
@@ -2,11 +2,18 @@
 Background tasks for RQ (Redis Queue).
 
 Run worker: poetry run rq worker -u $REDIS_URL --with-scheduler
+
+Async Stripe webhooks (STRIPE_WEBHOOK_ASYNC=1) also need workers on the
+stripe_events queue, and donation exports on the exports queue.
+
+Periodic jobs (see schedule_periodic_jobs) reschedule themselves with
+enqueue_in, so at least one worker must run with --with-scheduler.
 """
 
 from __future__ import annotations
 import logging
 import os
+from datetime import timedelta
 
 from app.services.email_service import ensure_receipt_for_donation
 from app.services.ai_site_service import run_generation_job
@@ -128,37 +135,383 @@ def enqueue_campaign_payout(campaign_id: str) -> bool:
         return False
 
 
-def send_campaign_update_notifications(campaign_id: str, update_id: str) -> None:
-    """Notify campaign donors about a new update."""
-    from app.models.campaign import get_campaign
-    from app.models.campaign_update import get_update
-    from app.models.donation import list_succeeded_for_campaign
-    from app.utils.email_sender import send_email
-    from app.models.org_email_settings import get_email_settings
-
-    camp = get_campaign(campaign_id)
-    upd = get_update(update_id)
-    if not camp or not upd:
-        return
-    donors = list_succeeded_for_campaign(
-        campaign_id, mode="per_donor", min_amount_cents=0
+STRIPE_EVENT_QUEUE = os.getenv("STRIPE_EVENT_QUEUE", "stripe_events")
+STRIPE_EVENT_SWEEP_INTERVAL = int(os.getenv("STRIPE_EVENT_SWEEP_INTERVAL", "60"))
+
+
+def process_stripe_events_job(ordering_key: str) -> dict:
+    """RQ job: drain pending Stripe events for one ordering key (payment intent)."""
+    from app.services.webhook_service import process_pending_stripe_events
+
+    return process_pending_stripe_events(ordering_key)
+
+
+def enqueue_stripe_event_processing(
+    ordering_key: str, delay_seconds: float = 0
+) -> bool:
+    """
+    Queue a drain of one ordering key on the stripe_events queue (optionally
+    delayed, for retry backoff). Returns False if the queue is unavailable; the
+    events stay pending in stripe_events and the sweeper retries them.
+    """
+    try:
+        from redis import Redis
+        from rq import Queue
+
+        conn = Redis.from_url(REDIS_URL, decode_responses=False)
+        q = Queue(STRIPE_EVENT_QUEUE, connection=conn)
+        kwargs = {"job_timeout": "5m", "failure_ttl": 86400, "result_ttl": 300}
+        if delay_seconds and delay_seconds > 0:
+            q.enqueue_in(
+                timedelta(seconds=float(delay_seconds)),
+                process_stripe_events_job,
+                ordering_key,
+                **kwargs,
+            )
+        else:
+            q.enqueue(process_stripe_events_job, ordering_key, **kwargs)
+        return True
+    except Exception as e:
+        logger.warning("stripe event enqueue failed for %s: %s", ordering_key, e)
+        return False
+
+
+EXPORT_QUEUE = os.getenv("EXPORT_QUEUE", "exports")
+# Also how long a queued/running export may go without progress before a
+# new request stops reusing it.
+EXPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("EXPORT_JOB_TIMEOUT_SECONDS", "7200"))
+
+
+def run_donation_export_job(export_id: str) -> dict | None:
+    """RQ job: write one donation export to S3 (see donation_export_service)."""
+    from app.services.donation_export_service import run_donation_export
+
+    return run_donation_export(export_id)
+
+
+def enqueue_donation_export(export_id: str) -> bool:
+    """
+    Queue a donation export on the exports queue. Returns False if the queue
+    is unavailable; exports are never run inside the request.
+    """
+    try:
+        from redis import Redis
+        from rq import Queue
+
+        conn = Redis.from_url(REDIS_URL, decode_responses=False)
+        q = Queue(EXPORT_QUEUE, connection=conn)
+        q.enqueue(
+            run_donation_export_job,
+            export_id,
+            job_timeout=EXPORT_JOB_TIMEOUT_SECONDS,
+            failure_ttl=86400,
+            result_ttl=300,
+        )
+        return True
+    except Exception as e:
+        logger.warning("donation export enqueue failed for %s: %s", export_id, e)
+        return False
+
+
+def send_campaign_update_notifications(campaign_id: str, update_id: str) -> dict:
+    """
+    Notify campaign donors about a new update: plan the recipients into
+    checkpointed chunks and queue one send job per chunk (see
+    update_notification_service).
+    """
+    from app.services.update_notification_service import plan_update_notifications
+
+    return plan_update_notifications(
+        campaign_id, update_id, enqueue_update_notification_chunk
+    )
+
+
+def send_update_notification_chunk_job(
+    campaign_id: str, update_id: str, chunk_index: int
+) -> dict | None:
+    """RQ job: send one chunk of an update's notifications from its checkpoint."""
+    from app.services.update_notification_service import (
+        send_update_notification_chunk,
+    )
+
+    return send_update_notification_chunk(campaign_id, update_id, chunk_index)
+
+
+def _send_update_chunk_sync(campaign_id: str, update_id: str, chunk_index: int) -> None:
+    try:
+        send_update_notification_chunk_job(campaign_id, update_id, chunk_index)
+    except Exception as e:
+        logger.error(
+            "update %s notification chunk %s failed: %s", update_id, chunk_index, e
+        )
+
+
+def enqueue_update_notification_chunk(
+    campaign_id: str, update_id: str, chunk_index: int
+) -> bool:
+    """
+    Queue one notification chunk (retried from its checkpoint on failure).
+    Returns True if enqueued, False if sent synchronously (no queue).
+    """
+    use_queue = os.getenv("USE_EMAIL_QUEUE", "0") == "1"
+    if not use_queue:
+        _send_update_chunk_sync(campaign_id, update_id, chunk_index)
+        return False
+    try:
+        from redis import Redis
+        from rq import Queue, Retry
+
+        conn = Redis.from_url(REDIS_URL, decode_responses=False)
+        q = Queue("default", connection=conn)
+        q.enqueue(
+            send_update_notification_chunk_job,
+            campaign_id,
+            update_id,
+            chunk_index,
+            job_timeout="10m",
+            # A retry that finds the chunk still claimed (its worker died or
+            # timed out) raises ChunkBusyError; by the second retry the claim
+            # is older than UPDATE_NOTIFY_CLAIM_STALE_SECONDS and is taken over.
+            retry=Retry(max=3, interval=[30, 120, 600]),
+            failure_ttl=86400,
+            result_ttl=300,
+        )
+        return True
+    except Exception as e:
+        logger.warning("update notification chunk enqueue failed: %s", e)
+        _send_update_chunk_sync(campaign_id, update_id, chunk_index)
+        return False
+
+
+def _schedule_periodic(
+    func, *, name: str, interval_seconds: int, queue_name: str = "default", force: bool
+) -> bool:
+    """
+    Schedule func to run once after interval_seconds.
+
+    A Redis marker (periodic:<name>) with a TTL of three intervals records that
+    the chain is alive: running jobs refresh it (force=True) and reschedule
+    themselves, while startup calls (force=False) only schedule when the marker
+    is missing, so many web containers never start duplicate chains.
+    """
+    from redis import Redis
+    from rq import Queue
+
+    conn = Redis.from_url(REDIS_URL, decode_responses=False)
+    marker = f"periodic:{name}"
+    ttl = max(1, int(interval_seconds) * 3)
+    if force:
+        conn.set(marker, "1", ex=ttl)
+    elif not conn.set(marker, "1", nx=True, ex=ttl):
+        return False
+    q = Queue(queue_name, connection=conn)
+    q.enqueue_in(
+        timedelta(seconds=int(interval_seconds)),
+        func,
+        job_timeout="10m",
+        failure_ttl=86400,
+    )
+    return True
+
+
+TOTAL_RAISED_VERIFY_INTERVAL = int(os.getenv("TOTAL_RAISED_VERIFY_INTERVAL", "900"))
+
+
+def verify_campaign_totals(
+    since_seconds: int | None = None, limit: int = 500
+) -> dict[str, int]:
+    """
+    Recompute total_raised / donations_count and the campaign_donation_stats
+    rollup from donations for recently touched campaigns, correcting any drift
+    in the incrementally maintained values. Returns {"checked": N, "corrected": M}.
+    """
+    from app.models.campaign import (
+        list_recently_updated_campaign_ids,
+        recompute_total_raised,
     )
-    emails = {d["donor_email"] for d in donors if d.get("donor_email")}
-    org_settings = get_email_settings(camp["org_id"]) or {}
-    from_email = org_settings.get("from_email")
-    from_name = org_settings.get("from_name")
-    subject = f"New update: {upd['title']} – {camp['title']}"
-    body_text = f"{upd['title']}\n\n{upd['body']}\n\n— {camp['title']}"
-    body_html = f"<h2>{upd['title']}</h2><p>{upd['body']}</p><p>— {camp['title']}</p>"
-    for to_addr in emails:
+    from app.models.campaign_donation_stats import refresh_campaign_donation_stats
+    from app.utils.metrics import TOTAL_RAISED_DRIFT_CORRECTIONS
+
+    window = since_seconds or TOTAL_RAISED_VERIFY_INTERVAL * 2
+    checked = corrected = 0
+    for campaign_id in list_recently_updated_campaign_ids(window, limit=limit):
+        checked += 1
         try:
-            send_email(
-                to_email=to_addr,
-                subject=subject,
-                body_text=body_text,
-                body_html=body_html,
-                from_email=from_email,
-                from_name=from_name,
-            )
+            res = recompute_total_raised(campaign_id)
+            stats = refresh_campaign_donation_stats(campaign_id)
         except Exception as e:
-            logger.error("send campaign update email to %s: %s", to_addr, e)
+            logger.error("verify totals campaign %s: %s", campaign_id, e)
+            continue
+        drifted = False
+        if res.get("previous_total_raised") != res.get("total_raised") or res.get(
+            "previous_donations_count"
+        ) != res.get("donations_count"):
+            drifted = True
+            logger.warning(
+                "total_raised drift corrected campaign=%s total %s -> %s count %s -> %s",
+                campaign_id,
+                res.get("previous_total_raised"),
+                res.get("total_raised"),
+                res.get("previous_donations_count"),
+                res.get("donations_count"),
+            )
+        previous_stats = stats.get("previous")
+        if previous_stats != stats["stats"] and (
+            previous_stats is not None or stats["stats"]["donations_count"]
+        ):
+            drifted = True
+            logger.warning(
+                "donation stats drift corrected campaign=%s %s -> %s",
+                campaign_id,
+                previous_stats,
+                stats["stats"],
+            )
+        if drifted:
+            corrected += 1
+            TOTAL_RAISED_DRIFT_CORRECTIONS.inc()
+            from app.utils.public_campaign_cache import (
+                invalidate_public_campaign_cache,
+            )
+            from app.utils.cache import invalidate_campaign_progress_cache
+
+            try:
+                invalidate_campaign_progress_cache(campaign_id)
+            except Exception as e:
+                logger.debug("progress cache bust skipped: %s", e)
+            invalidate_public_campaign_cache(campaign_id)
+    return {"checked": checked, "corrected": corrected}
+
+
+def run_total_raised_verifier() -> dict[str, int]:
+    """Periodic job: verify totals, then reschedule itself."""
+    try:
+        return verify_campaign_totals()
+    finally:
+        _schedule_periodic(
+            run_total_raised_verifier,
+            name="total_raised_verifier",
+            interval_seconds=TOTAL_RAISED_VERIFY_INTERVAL,
+            force=True,
+        )
+
+
+def sweep_stripe_events(limit: int = 500) -> dict[str, int]:
+    """
+    Re-enqueue drains for every ordering key with due pending events (lost
+    enqueues, crashed workers, elapsed retry backoff) and publish the backlog
+    gauges. Returns {"pending": N, "enqueued": M}.
+    """
+    from app.models.stripe_event import list_due_ordering_keys, pending_events_backlog
+    from app.utils.metrics import (
+        STRIPE_EVENT_OLDEST_PENDING_SECONDS,
+        STRIPE_EVENTS_PENDING,
+    )
+
+    pending, oldest_age = pending_events_backlog()
+    STRIPE_EVENTS_PENDING.set(pending)
+    STRIPE_EVENT_OLDEST_PENDING_SECONDS.set(oldest_age)
+    enqueued = 0
+    for key in list_due_ordering_keys(limit=limit):
+        if enqueue_stripe_event_processing(key):
+            enqueued += 1
+    return {"pending": pending, "enqueued": enqueued}
+
+
+def run_stripe_event_sweeper() -> dict[str, int]:
+    """Periodic job: sweep pending Stripe events, then reschedule itself."""
+    try:
+        return sweep_stripe_events()
+    finally:
+        _schedule_periodic(
+            run_stripe_event_sweeper,
+            name="stripe_event_sweeper",
+            interval_seconds=STRIPE_EVENT_SWEEP_INTERVAL,
+            force=True,
+        )
+
+
+OUTBOX_SWEEP_INTERVAL = int(os.getenv("OUTBOX_SWEEP_INTERVAL", "30"))
+OUTBOX_RETENTION_SECONDS = int(os.getenv("OUTBOX_RETENTION_SECONDS", str(7 * 86400)))
+
+
+def sweep_outbox() -> dict[str, int]:
+    """
+    Deliver due outbox side effects (retries, and rows a dead process never
+    dispatched), prune delivered rows past retention and publish the backlog
+    gauges.
+    """
+    from app.models.outbox_event import (
+        delete_processed_outbox_events,
+        outbox_backlog,
+    )
+    from app.services.outbox_service import drain_outbox
+    from app.utils.metrics import OUTBOX_OLDEST_PENDING_SECONDS, OUTBOX_PENDING
+
+    totals = drain_outbox()
+    pending, oldest_age = outbox_backlog()
+    OUTBOX_PENDING.set(pending)
+    OUTBOX_OLDEST_PENDING_SECONDS.set(oldest_age)
+    totals["pending"] = pending
+    totals["pruned"] = delete_processed_outbox_events(OUTBOX_RETENTION_SECONDS)
+    return totals
+
+
+def run_outbox_sweeper() -> dict[str, int]:
+    """Periodic job: sweep the outbox, then reschedule itself."""
+    try:
+        return sweep_outbox()
+    finally:
+        _schedule_periodic(
+            run_outbox_sweeper,
+            name="outbox_sweeper",
+            interval_seconds=OUTBOX_SWEEP_INTERVAL,
+            force=True,
+        )
+
+
+STRIPE_FEE_RECONCILE_INTERVAL = int(os.getenv("STRIPE_FEE_RECONCILE_INTERVAL", "3600"))
+
+
+def run_stripe_fee_reconciliation() -> dict:
+    """Periodic job: replace estimated Stripe fees with actuals, then reschedule."""
+    from app.services.fee_reconciliation_service import reconcile_stripe_fees
+
+    try:
+        return reconcile_stripe_fees()
+    finally:
+        _schedule_periodic(
+            run_stripe_fee_reconciliation,
+            name="stripe_fee_reconciliation",
+            interval_seconds=STRIPE_FEE_RECONCILE_INTERVAL,
+            force=True,
+        )
+
+
+def schedule_periodic_jobs() -> None:
+    """Start periodic job chains that are not already running. Safe to call on every boot."""
+    if (os.getenv("STRIPE_SECRET_KEY") or "").strip():
+        _schedule_periodic(
+            run_stripe_fee_reconciliation,
+            name="stripe_fee_reconciliation",
+            interval_seconds=STRIPE_FEE_RECONCILE_INTERVAL,
+            force=False,
+        )
+    if os.getenv("STRIPE_WEBHOOK_ASYNC", "0") == "1":
+        _schedule_periodic(
+            run_stripe_event_sweeper,
+            name="stripe_event_sweeper",
+            interval_seconds=STRIPE_EVENT_SWEEP_INTERVAL,
+            force=False,
+        )
+    _schedule_periodic(
+        run_total_raised_verifier,
+        name="total_raised_verifier",
+        interval_seconds=TOTAL_RAISED_VERIFY_INTERVAL,
+        force=False,
+    )
+    _schedule_periodic(
+        run_outbox_sweeper,
+        name="outbox_sweeper",
+        interval_seconds=OUTBOX_SWEEP_INTERVAL,
+        force=False,
+    )
@@ -10,3 +10,38 @@ def r():
     if _client is None:
         _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
     return _client
+
+
+_bytes_client = None
+
+
+def r_bytes():
+    """Same Redis as r(), without response decoding, for binary cache values."""
+    global _bytes_client
+    if _bytes_client is None:
+        _bytes_client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+    return _bytes_client
+
+
+def campaign_progress_key(campaign_id) -> str:
+    return f"campaign:{campaign_id}:progress:v1"
+
+
+def invalidate_campaign_progress_cache(campaign_id) -> None:
+    """Drop the cached progress payload in Redis and in every process's L1."""
+    from app.utils.local_cache import invalidate_local
+
+    invalidate_local("campaign_progress", str(campaign_id))
+    r().delete(campaign_progress_key(campaign_id))
+
+
+def campaign_recent_donations_key(campaign_id) -> str:
+    return f"campaign:{campaign_id}:recent:v1"
+
+
+def invalidate_campaign_recent_donations_cache(campaign_id) -> None:
+    """Drop the cached recent-donations list in Redis and in every process's L1."""
+    from app.utils.local_cache import invalidate_local
+
+    invalidate_local("campaign_recent_donations", str(campaign_id))
+    r().delete(campaign_recent_donations_key(campaign_id))
@@ -1,12 +1,255 @@
+import functools
 import json
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
 import psycopg2
+import psycopg2.extensions
 import psycopg2.pool
 import os
 from dotenv import load_dotenv
 
+from app.utils.metrics import (
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_IDLE,
+    DB_POOL_IN_USE,
+    DB_POOL_TIMEOUTS,
+    DB_POOL_WAITING,
+)
+
 load_dotenv()
 
-_pool: psycopg2.pool.ThreadedConnectionPool | None = None
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """Raised when no pooled connection became available in time."""
+
+
+class CooperativeConnectionPool:
+    """
+    Bounded PostgreSQL connection pool that parks callers instead of raising
+    when every connection is checked out.
+
+    Waiting uses threading.Condition, which gunicorn's eventlet worker
+    monkey-patches, so an exhausted pool yields the green thread to the hub
+    rather than failing the request or stalling the process.
+
+    - timeout: max seconds a caller waits for a connection (PoolTimeout after)
+    - max_waiters: bound on the wait queue; callers beyond it fail fast
+    - max_lifetime: connections older than this are closed instead of reused
+    - pre_ping_after: idle connections older than this are checked with SELECT 1
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        *,
+        minconn: int = 0,
+        maxconn: int = 10,
+        timeout: float = 10.0,
+        max_waiters: int = 100,
+        max_lifetime: float = 1800.0,
+        pre_ping_after: float = 30.0,
+    ):
+        self._connect = connect
+        self.maxconn = max(1, int(maxconn))
+        self.timeout = float(timeout)
+        self.max_waiters = max(0, int(max_waiters))
+        self.max_lifetime = float(max_lifetime)
+        self.pre_ping_after = float(pre_ping_after)
+
+        self._cond = threading.Condition()
+        # (conn, opened_at, last_used_at); LIFO so warm connections are reused first
+        self._idle: deque[tuple[Any, float, float]] = deque()
+        self._checked_out: dict[int, float] = {}  # id(conn) -> opened_at
+        self._opening = 0
+        self._waiting = 0
+        self._closed = False
+
+        for _ in range(min(max(0, int(minconn)), self.maxconn)):
+            now = time.monotonic()
+            self._idle.append((self._connect(), now, now))
+        self._publish()
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._checked_out) + self._opening
+
+    def _publish(self) -> None:
+        DB_POOL_IN_USE.set(len(self._checked_out) + self._opening)
+        DB_POOL_IDLE.set(len(self._idle))
+        DB_POOL_WAITING.set(self._waiting)
+
+    def stats(self) -> dict[str, int]:
+        with self._cond:
+            return {
+                "in_use": len(self._checked_out) + self._opening,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "max": self.maxconn,
+            }
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        idle_entry: tuple[Any, float, float] | None = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                if self._idle:
+                    idle_entry = self._idle.pop()
+                    self._checked_out[id(idle_entry[0])] = idle_entry[1]
+                    break
+                if self._size() < self.maxconn:
+                    self._opening += 1
+                    break
+                if self._waiting >= self.max_waiters:
+                    DB_POOL_TIMEOUTS.labels(reason="queue_full").inc()
+                    raise PoolTimeout("connection pool wait queue is full")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    DB_POOL_TIMEOUTS.labels(reason="timeout").inc()
+                    raise PoolTimeout(
+                        f"no database connection available within {self.timeout:g}s"
+                    )
+                self._waiting += 1
+                self._publish()
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._publish()
+
+        DB_POOL_CHECKOUT_SECONDS.observe(time.monotonic() - started)
+        if idle_entry is None:
+            return self._open_reserved()
+        return self._validate(*idle_entry)
+
+    def _open_reserved(self):
+        """Open a new connection for a slot reserved via self._opening."""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._publish()
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._checked_out[id(conn)] = time.monotonic()
+            self._publish()
+        return conn
+
+    def _validate(self, conn, opened_at: float, last_used_at: float):
+        now = time.monotonic()
+        healthy = not conn.closed and (now - opened_at) < self.max_lifetime
+        if healthy and (now - last_used_at) >= self.pre_ping_after:
+            healthy = self._ping(conn)
+        if healthy:
+            return conn
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+            self._opening += 1
+        self._discard(conn)
+        return self._open_reserved()
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def putconn(self, conn, close: bool = False) -> None:
+        with self._cond:
+            opened_at = self._checked_out.get(id(conn))
+        if opened_at is None:
+            raise psycopg2.pool.PoolError("trying to put unkeyed connection")
+
+        reusable = not close and not self._closed and not conn.closed
+        if reusable and time.monotonic() - opened_at >= self.max_lifetime:
+            reusable = False
+        if reusable:
+            status = conn.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                reusable = False
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    reusable = False
+        if not reusable:
+            self._discard(conn)
+
+        with self._cond:
+            self._checked_out.pop(id(conn), None)
+            if reusable:
+                self._idle.append((conn, opened_at, time.monotonic()))
+            self._publish()
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._publish()
+            self._cond.notify_all()
+        for conn, _opened_at, _last_used in idle:
+            self._discard(conn)
+
+
+_pool: CooperativeConnectionPool | None = None
+
+
+def _eventlet_wait_callback(conn, timeout=None) -> None:
+    """psycopg2 wait callback that trampolines on the socket instead of blocking."""
+    from eventlet.hubs import trampoline
+
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            return
+        if state == psycopg2.extensions.POLL_READ:
+            trampoline(conn.fileno(), read=True)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            trampoline(conn.fileno(), write=True)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+
+def _install_green_wait_callback() -> None:
+    """
+    Under an eventlet-patched process (gunicorn eventlet worker), make psycopg2
+    yield to the hub while a query is in flight so one slow query does not
+    stall every other request. No-op for plain threaded processes (RQ, scripts).
+    """
+    if os.getenv("DB_GREEN_WAIT", "auto").lower() in {"0", "off", "false"}:
+        return
+    if "eventlet" not in sys.modules:
+        return  # never imported, so nothing can be monkey-patched
+    from eventlet import patcher
+
+    if patcher.is_monkey_patched("socket"):
+        psycopg2.extensions.set_wait_callback(_eventlet_wait_callback)
 
 
 def _fetch_secret_password() -> str | None:
@@ -35,12 +278,19 @@ def _fetch_secret_password() -> str | None:
     return secret["password"]
 
 
-def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+def _get_pool() -> CooperativeConnectionPool:
     global _pool
     if _pool is None:
+        _install_green_wait_callback()
         url = os.getenv("DATABASE_URL")
-        minconn = int(os.getenv("DB_POOL_MIN", "2"))
-        maxconn = int(os.getenv("DB_POOL_MAX", "10"))
+        pool_kwargs = {
+            "minconn": int(os.getenv("DB_POOL_MIN", "2")),
+            "maxconn": int(os.getenv("DB_POOL_MAX", "10")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_waiters": int(os.getenv("DB_POOL_MAX_WAITERS", "100")),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+            "pre_ping_after": float(os.getenv("DB_POOL_PRE_PING_IDLE", "30")),
+        }
         # SSL: default to "require" for RDS/cloud, "disable" for local dev.
         # Use "verify-full" + DB_SSLROOTCERT for maximum security (recommended for RDS).
         sslmode = os.getenv("DB_SSLMODE", "require")
@@ -56,13 +306,14 @@ def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
                 url = f"{url}{sep}sslmode={sslmode}"
                 if sslrootcert and "sslrootcert=" not in url:
                     url = f"{url}&sslrootcert={sslrootcert}"
-            _pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, dsn=url)
+            dsn = url
+            _pool = CooperativeConnectionPool(
+                lambda: psycopg2.connect(dsn=dsn), **pool_kwargs
+            )
         else:
             # Prefer Secrets Manager; fall back to DB_PASSWORD for local dev
             password = _fetch_secret_password() or os.getenv("DB_PASSWORD", "dev")
-            _pool = psycopg2.pool.ThreadedConnectionPool(
-                minconn,
-                maxconn,
+            connect_kwargs = dict(
                 host=os.getenv("DB_HOST", "127.0.0.1"),
                 database=os.getenv("DB_NAME", "donations_dev"),
                 user=os.getenv("DB_USER", "dev"),
@@ -70,6 +321,9 @@ def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
                 port=os.getenv("DB_PORT", "65432"),
                 **ssl_kwargs,
             )
+            _pool = CooperativeConnectionPool(
+                lambda: psycopg2.connect(**connect_kwargs), **pool_kwargs
+            )
     return _pool
 
 
@@ -78,6 +332,7 @@ class _PooledConnection:
 
     def __init__(self, conn):
         object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_released", False)
 
     def __getattr__(self, name):
         return getattr(object.__getattribute__(self, "_conn"), name)
@@ -90,14 +345,202 @@ class _PooledConnection:
         return False
 
     def close(self):
+        if object.__getattribute__(self, "_released"):
+            return
+        object.__setattr__(self, "_released", True)
         _get_pool().putconn(object.__getattribute__(self, "_conn"))
 
 
-def get_db_connection() -> _PooledConnection:
+class _SharedConnection:
+    """
+    Connection handle given out inside unit_of_work(): commit() and close()
+    are deferred to the unit of work so model functions keep their usual
+    `with get_db_connection() as conn: ...; conn.commit()` shape.
+    """
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        return getattr(object.__getattribute__(self, "_conn"), name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class UnitOfWorkAborted(psycopg2.InternalError):
+    """Raised when a statement failed inside a unit of work but the error was swallowed."""
+
+
+class _UnitOfWork:
+    def __init__(self):
+        self.conn = None
+        self.callbacks: list[Callable[[], Any]] = []
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = _get_pool().getconn()
+        return self.conn
+
+    def _release(self) -> None:
+        conn, self.conn = self.conn, None
+        if conn is not None:
+            _get_pool().putconn(conn)
+
+    def commit(self) -> None:
+        conn = self.conn
+        try:
+            if conn is not None:
+                status = conn.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                    conn.rollback()
+                    raise UnitOfWorkAborted(
+                        "a statement failed inside the unit of work; rolled back"
+                    )
+                conn.commit()
+        except BaseException:
+            self._release()
+            raise
+        self._release()
+        for callback in self.callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("after_commit callback failed")
+
+    def rollback(self) -> None:
+        try:
+            if self.conn is not None and not self.conn.closed:
+                self.conn.rollback()
+        finally:
+            self._release()
+
+
+_current_uow: ContextVar[_UnitOfWork | None] = ContextVar(
+    "db_unit_of_work", default=None
+)
+
+
+def begin_unit_of_work() -> tuple[_UnitOfWork, Any] | None:
+    """
+    Start a unit of work outside a with-block (e.g. Flask request hooks).
+    Returns a handle for end_unit_of_work(), or None when one is already active.
+    """
+    if _current_uow.get() is not None:
+        return None
+    uow = _UnitOfWork()
+    return uow, _current_uow.set(uow)
+
+
+def end_unit_of_work(handle: tuple[_UnitOfWork, Any] | None, *, commit: bool) -> None:
+    if handle is None:
+        return
+    uow, token = handle
+    _current_uow.reset(token)
+    if commit:
+        uow.commit()
+    else:
+        uow.rollback()
+
+
+@contextmanager
+def unit_of_work() -> Iterator[_UnitOfWork]:
+    """
+    Share one pooled connection and one transaction across every
+    get_db_connection() call made inside the block (in this request, job or
+    green thread). The connection is checked out lazily on first use.
+
+    Commits when the block exits normally and rolls back on error. Nested
+    blocks join the outermost one. Callbacks registered with after_commit()
+    run only once the transaction has committed.
+    """
+    handle = begin_unit_of_work()
+    if handle is None:
+        yield _current_uow.get()
+        return
+    try:
+        yield handle[0]
+    except BaseException:
+        end_unit_of_work(handle, commit=False)
+        raise
+    end_unit_of_work(handle, commit=True)
+
+
+def transactional(fn):
+    """Decorator: run fn inside unit_of_work()."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with unit_of_work():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def savepoint(name: str = "uow_savepoint") -> Iterator[None]:
+    """
+    Inside a unit of work, undo only the statements run in this block if it
+    raises, leaving the unit's transaction usable (instead of aborted) for
+    the caller to handle the error and commit. Outside one, does nothing.
+    """
+    uow = _current_uow.get()
+    if uow is None:
+        yield
+        return
+    conn = uow.connection()
+    with conn.cursor() as cur:
+        cur.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        if not conn.closed:
+            with conn.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        raise
+    with conn.cursor() as cur:
+        cur.execute(f"RELEASE SAVEPOINT {name}")
+
+
+def in_unit_of_work() -> bool:
+    return _current_uow.get() is not None
+
+
+def after_commit(callback: Callable[[], Any]) -> None:
+    """
+    Run callback after the current unit of work commits (dropped on rollback).
+    Outside a unit of work every statement is already committed, so it runs now.
+    """
+    uow = _current_uow.get()
+    if uow is None:
+        callback()
+        return
+    uow.callbacks.append(callback)
+
+
+def get_db_connection() -> _PooledConnection | _SharedConnection:
     """
     Get a pooled connection to PostgreSQL.
     Call conn.close() when done to return it to the pool.
     Uses DB_POOL_MIN (default 2) and DB_POOL_MAX (default 10) env vars.
+    Waits up to DB_POOL_TIMEOUT seconds (default 10) when the pool is exhausted,
+    with at most DB_POOL_MAX_WAITERS (default 100) callers queued; raises
+    PoolTimeout beyond either bound.
+
+    Inside unit_of_work() this returns the unit's shared connection; commit()
+    and close() on it are deferred to the end of the unit of work.
     """
+    uow = _current_uow.get()
+    if uow is not None:
+        return _SharedConnection(uow.connection())
     conn = _get_pool().getconn()
     return _PooledConnection(conn)
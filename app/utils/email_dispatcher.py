@@ -0,0 +1,225 @@
+"""Throttling, retries and a bounded worker pool for email provider calls.
+
+Every provider call made by app.utils.email_sender goes through
+call_with_retries: it first takes tokens from the provider's token bucket
+(SES counts recipients against its send rate, so a bulk call costs one
+token per destination; SendGrid limits requests), then retries throttling
+(429) and server (5xx) errors with full-jitter exponential backoff,
+honouring Retry-After when the provider sends one.
+
+The buckets are per process. Set EMAIL_RATE_<PROVIDER> to the account's
+send rate divided by the number of processes that send; backoff absorbs
+what overshoots.
+
+EmailDispatcher runs sends concurrently on a bounded pool (green threads
+under eventlet). submit() blocks once EMAIL_DISPATCH_MAX_PENDING sends
+are queued, so a producer cannot outrun the provider.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from app.utils.metrics import (
+    EMAIL_DISPATCH_QUEUE_DEPTH,
+    EMAIL_PROVIDER_ERRORS,
+    EMAIL_SEND_RETRIES,
+    EMAIL_SEND_SECONDS,
+    EMAIL_THROTTLE_WAIT_SECONDS,
+)
+
+T = TypeVar("T")
+
+EMAIL_DISPATCH_WORKERS = int(os.getenv("EMAIL_DISPATCH_WORKERS", "8"))
+EMAIL_DISPATCH_MAX_PENDING = int(os.getenv("EMAIL_DISPATCH_MAX_PENDING", "200"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_BACKOFF_BASE_SECONDS = float(os.getenv("EMAIL_BACKOFF_BASE_SECONDS", "0.5"))
+EMAIL_BACKOFF_MAX_SECONDS = float(os.getenv("EMAIL_BACKOFF_MAX_SECONDS", "30"))
+
+# Sends per second; 0 disables throttling. SES's default production quota is
+# 14 recipients/second.
+_DEFAULT_RATES = {"ses": 14.0, "sendgrid": 50.0, "fake": 0.0}
+
+
+class EmailSendError(Exception):
+    """A failed provider call; retryable for throttling, 5xx and transport errors."""
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        kind: str = "client",
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in ("throttled", "server", "transport")
+
+
+def error_kind_for_status(status: int) -> str:
+    if status == 429:
+        return "throttled"
+    return "server" if status >= 500 else "client"
+
+
+class TokenBucket:
+    """
+    rate tokens per second, up to burst banked. acquire(n) reserves n tokens
+    and sleeps until they exist; n may exceed burst (the balance goes
+    negative and later callers wait for it to be repaid).
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1.0))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1.0) -> float:
+        """Take n tokens; returns how long the caller must wait for them."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= n
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, n: float = 1.0) -> float:
+        wait = self.reserve(n)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def provider_bucket(provider: str) -> TokenBucket:
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            env = provider.upper()
+            rate = float(
+                os.getenv(f"EMAIL_RATE_{env}", str(_DEFAULT_RATES.get(provider, 0)))
+            )
+            burst = os.getenv(f"EMAIL_BURST_{env}")
+            bucket = _buckets[provider] = TokenBucket(
+                rate, float(burst) if burst else None
+            )
+        return bucket
+
+
+def backoff_seconds(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2**attempt)], at least Retry-After."""
+    ceiling = min(EMAIL_BACKOFF_MAX_SECONDS, EMAIL_BACKOFF_BASE_SECONDS * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    if retry_after:
+        delay = max(delay, min(float(retry_after), EMAIL_BACKOFF_MAX_SECONDS))
+    return delay
+
+
+def call_with_retries(provider: str, cost: float, fn: Callable[[], T]) -> T:
+    """
+    Run one provider call under the provider's token bucket, retrying
+    retryable EmailSendErrors with jittered backoff. Re-raises the last error.
+    """
+    bucket = provider_bucket(provider)
+    for attempt in range(EMAIL_MAX_ATTEMPTS):
+        EMAIL_THROTTLE_WAIT_SECONDS.labels(provider=provider).observe(
+            bucket.acquire(cost)
+        )
+        started = time.monotonic()
+        try:
+            result = fn()
+        except EmailSendError as e:
+            EMAIL_SEND_SECONDS.labels(provider=provider).observe(
+                time.monotonic() - started
+            )
+            EMAIL_PROVIDER_ERRORS.labels(provider=provider, kind=e.kind).inc()
+            if not e.retryable or attempt + 1 >= EMAIL_MAX_ATTEMPTS:
+                raise
+            EMAIL_SEND_RETRIES.labels(provider=provider).inc()
+            time.sleep(backoff_seconds(attempt, e.retry_after))
+            continue
+        EMAIL_SEND_SECONDS.labels(provider=provider).observe(time.monotonic() - started)
+        return result
+    raise AssertionError("unreachable")
+
+
+class EmailDispatcher:
+    """Bounded pool for concurrent sends; see module docstring."""
+
+    def __init__(
+        self,
+        max_workers: int = EMAIL_DISPATCH_WORKERS,
+        max_pending: int = EMAIL_DISPATCH_MAX_PENDING,
+    ):
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="email-dispatch"
+        )
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._local = threading.local()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """Queue fn(*args, **kwargs); blocks while max_pending sends are queued."""
+        self._slots.acquire()
+        EMAIL_DISPATCH_QUEUE_DEPTH.inc()
+
+        def _run() -> T:
+            self._local.in_worker = True
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.in_worker = False
+                EMAIL_DISPATCH_QUEUE_DEPTH.dec()
+                self._slots.release()
+
+        try:
+            return self._executor.submit(_run)
+        except Exception:
+            EMAIL_DISPATCH_QUEUE_DEPTH.dec()
+            self._slots.release()
+            raise
+
+    def run_all(self, calls: Iterable[Callable[[], T]]) -> List[T]:
+        """
+        Run the calls concurrently and return their results in order. From
+        inside a pool worker they run inline instead, so a send that fans
+        out cannot deadlock waiting on its own pool.
+        """
+        calls = list(calls)
+        if len(calls) <= 1 or getattr(self._local, "in_worker", False):
+            return [call() for call in calls]
+        futures = [self.submit(call) for call in calls]
+        return [f.result() for f in futures]
+
+
+_dispatcher: Optional[EmailDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_email_dispatcher() -> EmailDispatcher:
+    """The process-wide dispatcher (created on first use)."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = EmailDispatcher()
+        return _dispatcher
@@ -2,19 +2,60 @@
 SES / SendGrid email sending wrapper.
 
 Configure via env:
-- EMAIL_PROVIDER: "ses" | "sendgrid" (default: "ses" if AWS region set, else "sendgrid" if API key set)
+- EMAIL_PROVIDER: "ses" | "sendgrid" | "fake" (default: "ses" if AWS region set, else "sendgrid" if API key set)
 - For SES: AWS_REGION, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY (or use default creds)
 - For SendGrid: SENDGRID_API_KEY
 - FROM_EMAIL, FROM_NAME: fallback sender when org settings don't provide
+
+"fake" sends nothing and records messages in FAKE_OUTBOX, for local runs
+and tests.
+
+send_bulk_email sends one message to many recipients (each sees only
+their own address) in as few provider calls as allowed: SES v2
+SendBulkEmail (50 destinations per call) or SendGrid personalizations
+(1000 per request); the calls run concurrently on the email dispatcher.
+
+Provider calls are throttled and retried by app.utils.email_dispatcher,
+over one boto3 client per SES API and one keep-alive HTTP client for
+SendGrid per process.
 """
 
 from __future__ import annotations
 import os
-from typing import Tuple, Optional
+import threading
+import uuid
+from typing import Any, Dict, List, Tuple, Optional
+
+from app.utils.email_dispatcher import (
+    EmailSendError,
+    call_with_retries,
+    error_kind_for_status,
+    get_email_dispatcher,
+)
 
 DEFAULT_FROM_EMAIL = os.getenv("FROM_EMAIL", "no-reply@example.com")
 DEFAULT_FROM_NAME = os.getenv("FROM_NAME", "Donations")
 
+# Recipients per provider call for send_bulk_email.
+BULK_MAX_RECIPIENTS = {"ses": 50, "sendgrid": 1000, "fake": 100}
+
+FAKE_OUTBOX: List[Dict[str, Any]] = []
+
+
+def _resolve_provider() -> Tuple[Optional[str], Optional[str]]:
+    """(provider, None) or (None, error_message)."""
+    provider = os.getenv("EMAIL_PROVIDER", "").lower()
+    if not provider:
+        if os.getenv("SENDGRID_API_KEY"):
+            provider = "sendgrid"
+        elif os.getenv("AWS_REGION") or os.getenv("AWS_ACCESS_KEY_ID"):
+            provider = "ses"
+        else:
+            return None, "EMAIL_PROVIDER not set and no SENDGRID_API_KEY or AWS creds"
+    if provider not in BULK_MAX_RECIPIENTS:
+        return None, f"Unknown EMAIL_PROVIDER: {provider}"
+    return provider, None
+
 
 def send_email(
     *,
@@ -34,15 +75,14 @@ def send_email(
     from_addr = from_email or DEFAULT_FROM_EMAIL
     from_display = from_name or DEFAULT_FROM_NAME
 
-    provider = os.getenv("EMAIL_PROVIDER", "").lower()
+    provider, error = _resolve_provider()
     if not provider:
-        if os.getenv("SENDGRID_API_KEY"):
-            provider = "sendgrid"
-        elif os.getenv("AWS_REGION") or os.getenv("AWS_ACCESS_KEY_ID"):
-            provider = "ses"
-        else:
-            return None, "EMAIL_PROVIDER not set and no SENDGRID_API_KEY or AWS creds"
+        return None, error
 
+    if provider == "fake":
+        return "fake", _record_fake(
+            [to_email], subject, body_text, body_html, from_addr, from_display
+        )
     if provider == "sendgrid":
         return _send_via_sendgrid(
             to_email=to_email,
@@ -68,9 +108,122 @@ def send_email(
     return None, f"Unknown EMAIL_PROVIDER: {provider}"
 
 
-def _send_via_sendgrid(
-    *,
-    to_email: str,
+def _record_fake(
+    to_emails: List[str],
+    subject: str,
+    body_text: str,
+    body_html: Optional[str],
+    from_email: str,
+    from_name: str,
+) -> str:
+    msg_id = f"fake-{uuid.uuid4().hex}"
+    for to_email in to_emails:
+        FAKE_OUTBOX.append(
+            {
+                "message_id": msg_id,
+                "to_email": to_email,
+                "subject": subject,
+                "body_text": body_text,
+                "body_html": body_html,
+                "from_email": from_email,
+                "from_name": from_name,
+            }
+        )
+    return msg_id
+
+
+def bulk_batch_size(provider: Optional[str] = None) -> int:
+    """Most recipients one send_bulk_email provider call accepts."""
+    if provider is None:
+        provider, _error = _resolve_provider()
+    return BULK_MAX_RECIPIENTS.get(provider or "", 1)
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+_SES_THROTTLE_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException"}
+
+
+def _client(name: str, factory) -> Any:
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
+
+def _ses_client(service: str = "ses") -> Any:
+    """Shared boto3 client; retries are left to call_with_retries."""
+
+    def _make():
+        import boto3
+        from botocore.config import Config
+        from app.utils.email_dispatcher import EMAIL_DISPATCH_WORKERS
+
+        return boto3.client(
+            service,
+            region_name=os.getenv("AWS_REGION", "us-east-1"),
+            config=Config(
+                retries={"max_attempts": 1, "mode": "standard"},
+                max_pool_connections=max(10, EMAIL_DISPATCH_WORKERS),
+            ),
+        )
+
+    return _client(service, _make)
+
+
+def _ses_call(service: str, method: str, **kwargs: Any) -> Dict[str, Any]:
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    try:
+        return getattr(_ses_client(service), method)(**kwargs)
+    except ClientError as e:
+        err = e.response.get("Error", {})
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 400
+        kind = (
+            "throttled"
+            if err.get("Code") in _SES_THROTTLE_CODES
+            else error_kind_for_status(status)
+        )
+        raise EmailSendError(
+            str(err.get("Message") or e), kind=kind, status=status
+        ) from e
+    except BotoCoreError as e:
+        raise EmailSendError(str(e), kind="transport") from e
+
+
+def _sendgrid_post(payload: Dict[str, Any]) -> Optional[str]:
+    """POST /v3/mail/send over a shared keep-alive client; returns X-Message-Id."""
+    import httpx
+
+    api_key = os.getenv("SENDGRID_API_KEY", "").strip()
+    if not api_key:
+        raise EmailSendError("SENDGRID_API_KEY not set")
+    http = _client("sendgrid", lambda: httpx.Client(timeout=10.0))
+    try:
+        response = http.post(
+            SENDGRID_API_URL,
+            json=payload,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+    except httpx.HTTPError as e:
+        raise EmailSendError(str(e), kind="transport") from e
+    if response.status_code >= 300:
+        retry_after = response.headers.get("Retry-After")
+        raise EmailSendError(
+            f"SendGrid returned {response.status_code}: {response.text[:200]}",
+            kind=error_kind_for_status(response.status_code),
+            status=response.status_code,
+            retry_after=(
+                float(retry_after) if retry_after and retry_after.isdigit() else None
+            ),
+        )
+    return response.headers.get("X-Message-Id") or str(response.status_code)
+
+
+def _sendgrid_mail(
+    to_emails: List[str],
     subject: str,
     body_text: str,
     body_html: Optional[str],
@@ -78,38 +231,209 @@ def _send_via_sendgrid(
     from_name: str,
     reply_to: Optional[str] = None,
     bcc: Optional[str] = None,
-) -> Tuple[Optional[str], Optional[str]]:
+) -> Dict[str, Any]:
+    """v3 mail/send body; several recipients get one personalization each."""
+    from sendgrid.helpers.mail import Mail, Email, To, Content, Bcc, ReplyTo
+
+    html = body_html if body_html else f"<pre>{body_text}</pre>"
+    message = Mail(
+        from_email=Email(from_email, from_name),
+        to_emails=(
+            [To(e) for e in to_emails] if len(to_emails) > 1 else To(to_emails[0])
+        ),
+        subject=subject,
+        plain_text_content=Content("text/plain", body_text),
+        html_content=Content("text/html", html),
+        is_multiple=len(to_emails) > 1,
+    )
+    if reply_to:
+        message.reply_to = ReplyTo(reply_to)
+    if bcc:
+        message.bcc = [Bcc(bcc)]
+    return message.get()
+
+
+def send_bulk_email(
+    *,
+    to_emails: List[str],
+    subject: str,
+    body_text: str,
+    body_html: Optional[str] = None,
+    from_email: Optional[str] = None,
+    from_name: Optional[str] = None,
+    reply_to: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Send the same message to each address separately, batching provider calls
+    and running the batches concurrently. Returns {"provider", "sent": [emails],
+    "failed": {email: error}, "unsent": [emails], "error"}: "unsent" holds the
+    addresses of provider calls that failed outright after retries ("error"
+    is then set), as opposed to individual recipients being rejected.
+    """
+    result: Dict[str, Any] = {
+        "provider": None,
+        "sent": [],
+        "failed": {},
+        "unsent": [],
+        "error": None,
+    }
+    provider, error = _resolve_provider()
+    if not provider:
+        result["error"] = error
+        result["unsent"] = list(to_emails)
+        result["failed"] = {e: error for e in to_emails}
+        return result
+    result["provider"] = provider
+    from_addr = from_email or DEFAULT_FROM_EMAIL
+    from_display = from_name or DEFAULT_FROM_NAME
+    size = BULK_MAX_RECIPIENTS[provider]
+    send_batch = {
+        "fake": _send_bulk_via_fake,
+        "sendgrid": _send_bulk_via_sendgrid,
+        "ses": _send_bulk_via_ses,
+    }[provider]
+
+    batches = [to_emails[i : i + size] for i in range(0, len(to_emails), size)]
+    outcomes = get_email_dispatcher().run_all(
+        lambda batch=batch: send_batch(
+            batch, subject, body_text, body_html, from_addr, from_display, reply_to
+        )
+        for batch in batches
+    )
+    for batch, (sent, failed, error) in zip(batches, outcomes):
+        result["sent"].extend(sent)
+        result["failed"].update(failed)
+        if error:
+            result["error"] = error
+            result["unsent"].extend(batch)
+    return result
+
+
+def _send_bulk_via_fake(
+    to_emails: List[str],
+    subject: str,
+    body_text: str,
+    body_html: Optional[str],
+    from_email: str,
+    from_name: str,
+    reply_to: Optional[str],
+) -> Tuple[List[str], Dict[str, str], Optional[str]]:
+    _record_fake(to_emails, subject, body_text, body_html, from_email, from_name)
+    return list(to_emails), {}, None
+
+
+def _send_bulk_via_sendgrid(
+    to_emails: List[str],
+    subject: str,
+    body_text: str,
+    body_html: Optional[str],
+    from_email: str,
+    from_name: str,
+    reply_to: Optional[str],
+) -> Tuple[List[str], Dict[str, str], Optional[str]]:
+    """One request; each recipient gets its own personalization."""
     try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail, Email, To, Content, Bcc, ReplyTo
+        payload = _sendgrid_mail(
+            to_emails, subject, body_text, body_html, from_email, from_name, reply_to
+        )
+        call_with_retries("sendgrid", 1, lambda: _sendgrid_post(payload))
+        return list(to_emails), {}, None
+    except Exception as e:
+        return [], {addr: str(e) for addr in to_emails}, str(e)
 
-        api_key = os.getenv("SENDGRID_API_KEY", "").strip()
-        if not api_key:
-            return None, "SENDGRID_API_KEY not set"
 
-        html = body_html if body_html else f"<pre>{body_text}</pre>"
-        message = Mail(
-            from_email=Email(from_email, from_name),
-            to_emails=To(to_email),
-            subject=subject,
-            plain_text_content=Content("text/plain", body_text),
-            html_content=Content("text/html", html),
+def _send_bulk_via_ses(
+    to_emails: List[str],
+    subject: str,
+    body_text: str,
+    body_html: Optional[str],
+    from_email: str,
+    from_name: str,
+    reply_to: Optional[str],
+) -> Tuple[List[str], Dict[str, str], Optional[str]]:
+    """
+    One SES v2 SendBulkEmail call with the content as an inline template.
+    SES treats {{...}} in template content as substitutions, so content that
+    contains braces is sent one message per recipient instead.
+    """
+    if any("{{" in (part or "") for part in (subject, body_text, body_html)):
+        sent, failed = [], {}
+        for addr in to_emails:
+            provider, msg = _send_via_ses(
+                to_email=addr,
+                subject=subject,
+                body_text=body_text,
+                body_html=body_html,
+                from_email=from_email,
+                from_name=from_name,
+                reply_to=reply_to,
+            )
+            if provider:
+                sent.append(addr)
+            else:
+                failed[addr] = msg or "send failed"
+        return sent, failed, None
+
+    content = {"Subject": subject, "Text": body_text}
+    if body_html:
+        content["Html"] = body_html
+    kwargs: dict = {
+        "FromEmailAddress": f"{from_name} <{from_email}>",
+        "DefaultContent": {
+            "Template": {"TemplateContent": content, "TemplateData": "{}"}
+        },
+        "BulkEmailEntries": [
+            {"Destination": {"ToAddresses": [addr]}} for addr in to_emails
+        ],
+    }
+    if reply_to:
+        kwargs["ReplyToAddresses"] = [reply_to]
+    try:
+        # SES's send rate counts recipients, not calls.
+        response = call_with_retries(
+            "ses",
+            len(to_emails),
+            lambda: _ses_call("sesv2", "send_bulk_email", **kwargs),
         )
-        if reply_to:
-            message.reply_to = ReplyTo(reply_to)
-        if bcc:
-            message.bcc = [Bcc(bcc)]
+    except Exception as e:
+        return [], {addr: str(e) for addr in to_emails}, str(e)
 
-        sg = SendGridAPIClient(api_key)
-        response = sg.send(message)
+    sent, failed = [], {}
+    results = response.get("BulkEmailEntryResults") or []
+    for addr, entry in zip(to_emails, results):
+        if entry.get("Status") == "SUCCESS":
+            sent.append(addr)
+        else:
+            failed[addr] = entry.get("Error") or entry.get("Status") or "failed"
+    for addr in to_emails[len(results) :]:
+        failed[addr] = "no result from SES"
+    return sent, failed, None
 
-        msg_id = None
-        if response.headers and "X-Message-Id" in response.headers:
-            msg_id = response.headers.get("X-Message-Id")
-        if not msg_id and hasattr(response, "headers") and response.headers:
-            msg_id = getattr(response.headers, "get", lambda k: None)("X-Message-Id")
 
-        return "sendgrid", msg_id or str(response.status_code)
+def _send_via_sendgrid(
+    *,
+    to_email: str,
+    subject: str,
+    body_text: str,
+    body_html: Optional[str],
+    from_email: str,
+    from_name: str,
+    reply_to: Optional[str] = None,
+    bcc: Optional[str] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        payload = _sendgrid_mail(
+            [to_email],
+            subject,
+            body_text,
+            body_html,
+            from_email,
+            from_name,
+            reply_to=reply_to,
+            bcc=bcc,
+        )
+        msg_id = call_with_retries("sendgrid", 1, lambda: _sendgrid_post(payload))
+        return "sendgrid", msg_id
     except Exception as e:
         return None, str(e)
 
@@ -125,35 +449,31 @@ def _send_via_ses(
     reply_to: Optional[str] = None,
     bcc: Optional[str] = None,
 ) -> Tuple[Optional[str], Optional[str]]:
+    body = {"Text": {"Data": body_text, "Charset": "UTF-8"}}
+    if body_html:
+        body["Html"] = {"Data": body_html, "Charset": "UTF-8"}
+
+    destination: dict = {"ToAddresses": [to_email]}
+    if bcc:
+        destination["BccAddresses"] = [bcc]
+
+    kwargs: dict = {
+        "Source": f"{from_name} <{from_email}>",
+        "Destination": destination,
+        "Message": {
+            "Subject": {"Data": subject, "Charset": "UTF-8"},
+            "Body": body,
+        },
+    }
+    if reply_to:
+        kwargs["ReplyToAddresses"] = [reply_to]
+
     try:
-        import boto3
-        from botocore.exceptions import ClientError
-
-        client = boto3.client("ses", region_name=os.getenv("AWS_REGION", "us-east-1"))
-
-        body = {"Text": {"Data": body_text, "Charset": "UTF-8"}}
-        if body_html:
-            body["Html"] = {"Data": body_html, "Charset": "UTF-8"}
-
-        destination: dict = {"ToAddresses": [to_email]}
-        if bcc:
-            destination["BccAddresses"] = [bcc]
-
-        kwargs: dict = {
-            "Source": f"{from_name} <{from_email}>",
-            "Destination": destination,
-            "Message": {
-                "Subject": {"Data": subject, "Charset": "UTF-8"},
-                "Body": body,
-            },
-        }
-        if reply_to:
-            kwargs["ReplyToAddresses"] = [reply_to]
-
-        response = client.send_email(**kwargs)
-        msg_id = response.get("MessageId")
-        return "ses", msg_id or "unknown"
-    except ClientError as e:
-        return None, str(e.response.get("Error", {}).get("Message", str(e)))
+        response = call_with_retries(
+            "ses",
+            2 if bcc else 1,
+            lambda: _ses_call("ses", "send_email", **kwargs),
+        )
+        return "ses", response.get("MessageId") or "unknown"
     except Exception as e:
         return None, str(e)
@@ -0,0 +1,97 @@
+"""
+Offline stand-in for the parts of the `stripe` module used by fee
+reconciliation (BalanceTransaction.list with created-range filters and
+cursor pagination), so reconcile_stripe_fees(client=FakeStripe()) runs offline.
+"""
+
+from __future__ import annotations
+
+import itertools
+import time
+from typing import Any
+
+_ids = itertools.count(1)
+
+
+class _BalanceTransactionAPI:
+    def __init__(self, owner: "FakeStripe"):
+        self._owner = owner
+
+    def list(
+        self,
+        *,
+        created: dict[str, int] | None = None,
+        limit: int = 10,
+        starting_after: str | None = None,
+        expand: list[str] | None = None,
+        **_params: Any,
+    ) -> dict[str, Any]:
+        self._owner.list_calls.append(
+            {"created": created, "limit": limit, "starting_after": starting_after}
+        )
+        created = created or {}
+        # Stripe lists newest first; starting_after continues with older objects.
+        rows = sorted(
+            self._owner.balance_transactions,
+            key=lambda bt: (bt["created"], bt["id"]),
+            reverse=True,
+        )
+        rows = [
+            bt
+            for bt in rows
+            if bt["created"] >= created.get("gte", bt["created"])
+            and bt["created"] <= created.get("lte", bt["created"])
+        ]
+        if starting_after:
+            ids = [bt["id"] for bt in rows]
+            rows = (
+                rows[ids.index(starting_after) + 1 :] if starting_after in ids else []
+            )
+        page = rows[: max(1, min(int(limit), 100))]
+        expand_source = "data.source" in (expand or [])
+        data = []
+        for bt in page:
+            out = dict(bt)
+            if expand_source:
+                out["source"] = dict(self._owner.charges[bt["source"]])
+            data.append(out)
+        return {"object": "list", "data": data, "has_more": len(rows) > len(page)}
+
+
+class FakeStripe:
+    def __init__(self):
+        self.balance_transactions: list[dict[str, Any]] = []
+        self.charges: dict[str, dict[str, Any]] = {}
+        self.list_calls: list[dict[str, Any]] = []
+        self.BalanceTransaction = _BalanceTransactionAPI(self)
+
+    def add_charge(
+        self,
+        *,
+        payment_intent: str,
+        amount: int,
+        fee: int,
+        created: int | None = None,
+        type: str = "charge",
+    ) -> dict[str, Any]:
+        """Record a charge and its balance transaction; returns the balance transaction."""
+        n = next(_ids)
+        charge_id = f"ch_fake_{n}"
+        self.charges[charge_id] = {
+            "id": charge_id,
+            "object": "charge",
+            "amount": int(amount),
+            "payment_intent": payment_intent,
+        }
+        bt = {
+            "id": f"txn_fake_{n}",
+            "object": "balance_transaction",
+            "amount": int(amount),
+            "fee": int(fee),
+            "net": int(amount) - int(fee),
+            "created": int(created if created is not None else time.time()),
+            "type": type,
+            "source": charge_id,
+        }
+        self.balance_transactions.append(bt)
+        return bt
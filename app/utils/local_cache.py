@@ -0,0 +1,238 @@
+"""In-process L1 cache (bounded LRU + TTL) in front of Redis for hot keys.
+
+Each process keeps a few named caches (public campaign payloads, campaign
+progress, subdomain -> org_id). Entries expire after a short TTL, and
+invalidate_local() drops a key here and broadcasts the drop over Redis
+pub/sub so every container forgets it at the same time. The listener
+clears everything after a reconnect, since messages sent while it was
+disconnected are lost; the TTL bounds staleness if pub/sub is down.
+
+Values must not be None (None means "not cached") and must be treated as
+read-only by callers, since every request sees the same object.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from app.utils.cache import r
+from app.utils.metrics import (
+    L1_CACHE_BYTES,
+    L1_CACHE_ENTRIES,
+    L1_CACHE_EVICTIONS,
+    L1_CACHE_LOOKUPS,
+)
+
+logger = logging.getLogger(__name__)
+
+L1_CACHE_ENABLED = os.getenv("L1_CACHE_ENABLED", "1") == "1"
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "2000"))
+L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+L1_CACHE_TTL_SECONDS = float(os.getenv("L1_CACHE_TTL_SECONDS", "5"))
+INVALIDATION_CHANNEL = "cache:l1:invalidate"
+
+_ORIGIN = uuid.uuid4().hex
+
+
+def _approx_size(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value) + 48
+    if isinstance(value, dict):
+        return 64 + sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 56 + sum(_approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """Thread-safe LRU with per-entry expiry and an approximate byte budget."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int = L1_CACHE_MAX_ENTRIES,
+        max_bytes: int = L1_CACHE_MAX_BYTES,
+        ttl_seconds: float = L1_CACHE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.max_entries = max_entries if L1_CACHE_ENABLED else 0
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+        self._bytes = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def epoch(self) -> int:
+        """Bumped by every delete/clear; pass to set() to skip racing fills."""
+        return self._epoch
+
+    def get(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] <= now:
+                self._remove(key)
+                L1_CACHE_EVICTIONS.labels(cache=self.name, reason="expired").inc()
+                item = None
+            if item is None:
+                L1_CACHE_LOOKUPS.labels(cache=self.name, result="miss").inc()
+                return None
+            self._data.move_to_end(key)
+        L1_CACHE_LOOKUPS.labels(cache=self.name, result="hit").inc()
+        return item[2]
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        *,
+        ttl_seconds: float | None = None,
+        epoch: int | None = None,
+    ) -> None:
+        """
+        Store value. With epoch (from epoch() taken before loading value), the
+        write is dropped if an invalidation happened meanwhile, so a load that
+        raced an update cannot repopulate the old value.
+        """
+        if self.max_entries <= 0 or value is None:
+            return
+        size = _approx_size(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (
+            self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        )
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires, size, value)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                L1_CACHE_EVICTIONS.labels(cache=self.name, reason="capacity").inc()
+            self._report()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._epoch += 1
+            if key in self._data:
+                self._remove(key)
+                L1_CACHE_EVICTIONS.labels(cache=self.name, reason="invalidated").inc()
+                self._report()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+            self._bytes = 0
+            self._report()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: str) -> None:
+        _expires, size, _value = self._data.pop(key)
+        self._bytes -= size
+
+    def _report(self) -> None:
+        L1_CACHE_ENTRIES.labels(cache=self.name).set(len(self._data))
+        L1_CACHE_BYTES.labels(cache=self.name).set(self._bytes)
+
+
+_caches: dict[str, LocalCache] = {}
+_caches_lock = threading.Lock()
+
+
+def local_cache(name: str, **kwargs: Any) -> LocalCache:
+    """The process-wide cache called name (created on first use)."""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = LocalCache(name, **kwargs)
+        return cache
+
+
+def invalidate_local(name: str, key: str) -> None:
+    """Drop key from cache name here and, via pub/sub, in every other process."""
+    cache = _caches.get(name)
+    if cache is not None:
+        cache.delete(key)
+    try:
+        r().publish(
+            INVALIDATION_CHANNEL,
+            json.dumps({"cache": name, "key": key, "origin": _ORIGIN}),
+        )
+    except Exception as e:
+        logger.debug("l1 invalidation publish skipped: %s", e)
+
+
+def handle_invalidation_message(data: str | bytes) -> None:
+    try:
+        msg = json.loads(data)
+    except (TypeError, ValueError):
+        return
+    if msg.get("origin") == _ORIGIN:
+        return  # already dropped locally by invalidate_local
+    cache = _caches.get(msg.get("cache") or "")
+    if cache is not None and msg.get("key") is not None:
+        cache.delete(str(msg["key"]))
+
+
+def clear_all_local_caches() -> None:
+    for cache in list(_caches.values()):
+        cache.clear()
+
+
+def _listen_forever() -> None:
+    backoff = 1.0
+    while True:
+        pubsub = None
+        try:
+            pubsub = r().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Anything published while we were not subscribed is lost.
+            clear_all_local_caches()
+            backoff = 1.0
+            for message in pubsub.listen():
+                if message.get("type") == "message":
+                    handle_invalidation_message(message.get("data"))
+        except Exception as e:
+            logger.warning("l1 invalidation listener reconnecting: %s", e)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+        clear_all_local_caches()
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
+
+
+_listener_started = False
+
+
+def start_invalidation_listener() -> None:
+    """Subscribe to invalidation broadcasts in a daemon (green) thread, once."""
+    global _listener_started
+    if _listener_started or not L1_CACHE_ENABLED:
+        return
+    _listener_started = True
+    threading.Thread(
+        target=_listen_forever, name="l1-cache-invalidation", daemon=True
+    ).start()
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 REQUEST_COUNT = Counter(
     "app_http_requests_total",
@@ -17,3 +17,162 @@ RATE_LIMIT_HITS = Counter(
     "Total requests rejected by rate limiting",
     ["path"],
 )
+
+DB_POOL_IN_USE = Gauge(
+    "app_db_pool_connections_in_use",
+    "Database connections currently checked out of the pool",
+)
+
+DB_POOL_IDLE = Gauge(
+    "app_db_pool_connections_idle",
+    "Open database connections sitting idle in the pool",
+)
+
+DB_POOL_WAITING = Gauge(
+    "app_db_pool_waiters",
+    "Callers (green threads) waiting for a pooled database connection",
+)
+
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "app_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    "app_db_pool_checkout_timeouts_total",
+    "Connection checkouts rejected because the pool stayed exhausted",
+    ["reason"],
+)
+
+TOTAL_RAISED_DRIFT_CORRECTIONS = Counter(
+    "app_total_raised_drift_corrections_total",
+    "Campaigns whose incrementally maintained totals were corrected by the verifier",
+)
+
+STRIPE_EVENTS_PROCESSED = Counter(
+    "app_stripe_events_processed_total",
+    "Queued Stripe webhook events handled by the consumer, by outcome",
+    ["outcome"],
+)
+
+STRIPE_EVENT_LAG_SECONDS = Histogram(
+    "app_stripe_event_lag_seconds",
+    "Time from receiving a Stripe webhook to finishing its processing",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900, 3600),
+)
+
+STRIPE_EVENTS_PENDING = Gauge(
+    "app_stripe_events_pending",
+    "Stripe webhook events persisted but not yet processed",
+)
+
+STRIPE_EVENT_OLDEST_PENDING_SECONDS = Gauge(
+    "app_stripe_event_oldest_pending_seconds",
+    "Age of the oldest unprocessed Stripe webhook event",
+)
+
+OUTBOX_DELIVERIES = Counter(
+    "app_outbox_deliveries_total",
+    "Outbox side effects delivered, by kind and outcome",
+    ["kind", "outcome"],
+)
+
+OUTBOX_PENDING = Gauge(
+    "app_outbox_events_pending",
+    "Outbox side effects recorded but not yet delivered",
+)
+
+OUTBOX_OLDEST_PENDING_SECONDS = Gauge(
+    "app_outbox_oldest_pending_seconds",
+    "Age of the oldest undelivered outbox side effect",
+)
+
+PUBLIC_CACHE_LOOKUPS = Counter(
+    "app_public_cache_lookups_total",
+    "Public campaign payload cache lookups by result (hit, stale, miss)",
+    ["result"],
+)
+
+PUBLIC_CACHE_REBUILDS = Counter(
+    "app_public_cache_rebuilds_total",
+    "Public campaign payloads rebuilt from the database",
+)
+
+PUBLIC_CACHE_REBUILD_SECONDS = Histogram(
+    "app_public_cache_rebuild_seconds",
+    "Time spent rebuilding a public campaign payload",
+)
+
+L1_CACHE_LOOKUPS = Counter(
+    "app_l1_cache_lookups_total",
+    "In-process cache lookups by cache and result (hit, miss)",
+    ["cache", "result"],
+)
+
+L1_CACHE_EVICTIONS = Counter(
+    "app_l1_cache_evictions_total",
+    "In-process cache removals by reason (capacity, expired, invalidated)",
+    ["cache", "reason"],
+)
+
+L1_CACHE_ENTRIES = Gauge(
+    "app_l1_cache_entries",
+    "Entries held by an in-process cache",
+    ["cache"],
+)
+
+L1_CACHE_BYTES = Gauge(
+    "app_l1_cache_bytes",
+    "Approximate memory held by an in-process cache",
+    ["cache"],
+)
+
+EMAIL_DISPATCH_QUEUE_DEPTH = Gauge(
+    "app_email_dispatch_queue_depth",
+    "Email sends submitted to the dispatcher pool and not yet finished",
+)
+
+EMAIL_SEND_SECONDS = Histogram(
+    "app_email_send_seconds",
+    "Latency of one email provider API call",
+    ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+EMAIL_THROTTLE_WAIT_SECONDS = Histogram(
+    "app_email_throttle_wait_seconds",
+    "Time an email send waited for its provider's token bucket",
+    ["provider"],
+    buckets=(0, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30),
+)
+
+EMAIL_PROVIDER_ERRORS = Counter(
+    "app_email_provider_errors_total",
+    "Failed email provider calls by kind (throttled, server, client, transport)",
+    ["provider", "kind"],
+)
+
+EMAIL_SEND_RETRIES = Counter(
+    "app_email_send_retries_total",
+    "Email provider calls retried after a throttling or server error",
+    ["provider"],
+)
+
+REALTIME_FRAMES_SENT = Counter(
+    "app_realtime_frames_sent_total",
+    "Aggregated Socket.IO frames broadcast to rooms, by event",
+    ["event"],
+)
+
+REALTIME_EVENTS_COALESCED = Counter(
+    "app_realtime_events_coalesced_total",
+    "Events merged into a frame with earlier events instead of sent alone",
+    ["event"],
+)
+
+REALTIME_FANOUT_LATENCY_SECONDS = Histogram(
+    "app_realtime_fanout_latency_seconds",
+    "Time from the oldest event in a frame arriving to the frame being broadcast",
+    ["event"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
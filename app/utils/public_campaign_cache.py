@@ -1,68 +1,329 @@
-"""HTTP caching (ETag, Cache-Control) and optional Redis for public campaign JSON."""
+"""HTTP caching (ETag, Cache-Control) and optional Redis for public campaign JSON.
+
+Redis entries are never deleted on change. invalidate_public_campaign_cache
+bumps a per-campaign version, which marks the stored payload stale. Stale
+payloads keep being served while exactly one request (holding a short
+Redis lease) rebuilds them, so a burst of donations on a busy campaign
+does not turn every page view into a campaign query.
+
+Each entry is a Redis hash holding the finished response: serialized JSON
+bytes, their ETag, and gzip / brotli variants, all computed once at build
+time. A hit is one pipelined round trip that fetches the ETag plus the
+single variant the client accepts. A matching If-None-Match is answered
+from the ETag alone. The stored ETag belongs to the JSON bytes; compressed
+variants are sent with it suffixed by their coding ("<hash>-gzip"), since a
+strong validator must differ between content-codings.
+
+In front of Redis sits a short-lived in-process copy (app.utils.local_cache)
+of fresh entries, so hot campaigns are served without any round trip;
+invalidation is broadcast to every process.
+"""
 
 from __future__ import annotations
 
+import gzip
 import hashlib
 import json
 import logging
-from typing import Any
+import os
+import time
+import uuid
+from typing import Any, Callable
 
 from flask import jsonify, make_response, request
 
-from app.utils.cache import r
+from app.utils.cache import r_bytes
+from app.utils.local_cache import invalidate_local, local_cache
+from app.utils.metrics import (
+    PUBLIC_CACHE_LOOKUPS,
+    PUBLIC_CACHE_REBUILD_SECONDS,
+    PUBLIC_CACHE_REBUILDS,
+)
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
 PUBLIC_JSON_REDIS_TTL = 30
 PUBLIC_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=120"
+# How long a payload may still be served stale after its fresh window.
+PUBLIC_JSON_STALE_TTL = int(os.getenv("PUBLIC_CACHE_STALE_TTL", "600"))
+PUBLIC_REBUILD_LEASE_MS = int(os.getenv("PUBLIC_CACHE_REBUILD_LEASE_MS", "5000"))
+# On a cold miss, wait this long for the lease holder before building anyway.
+PUBLIC_MISS_WAIT_SECONDS = float(os.getenv("PUBLIC_CACHE_MISS_WAIT_SECONDS", "1.0"))
+_VERSION_TTL = 7 * 24 * 3600
+L1_NAME = "public_campaign"
+
+IDENTITY = "identity"
+_META_FIELDS = ("v", "t", "etag")
+
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0
+"""
 
 
 def _cache_key(campaign_id: str) -> str:
-    return f"public:json:v1:{campaign_id}"
+    return f"public:json:v3:{campaign_id}"
+
+
+def _version_key(campaign_id: str) -> str:
+    return f"public:json:ver:{campaign_id}"
+
+
+def _lease_key(campaign_id: str) -> str:
+    return f"public:json:lease:{campaign_id}"
 
 
 def invalidate_public_campaign_cache(campaign_id: str) -> None:
+    """Mark the cached payload stale (served until one request rebuilds it)."""
+    invalidate_local(L1_NAME, str(campaign_id))
     try:
-        r().delete(_cache_key(campaign_id))
+        pipe = r_bytes().pipeline()
+        pipe.incr(_version_key(campaign_id))
+        pipe.expire(_version_key(campaign_id), _VERSION_TTL)
+        pipe.execute()
     except Exception as e:
         logger.debug("public campaign cache invalidate skipped: %s", e)
 
 
-def _etag_for_dict(body: dict[str, Any]) -> str:
-    raw = json.dumps(body, sort_keys=True, default=str)
-    h = hashlib.sha256(raw.encode()).hexdigest()[:32]
-    return f'"{h}"'
+def encode_public_payload(body: dict[str, Any], version: int = 0) -> dict[str, Any]:
+    """Serialize once: JSON bytes, ETag and compressed variants."""
+    data = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str).encode()
+    entry: dict[str, Any] = {
+        "v": version,
+        "t": time.time(),
+        "etag": f'"{hashlib.sha256(data).hexdigest()[:32]}"',
+        IDENTITY: data,
+        "gzip": gzip.compress(data, compresslevel=6, mtime=0),
+    }
+    if brotli is not None:
+        entry["br"] = brotli.compress(data, quality=5)
+    return entry
 
 
-def respond_public_campaign_json(resp_dict: dict[str, Any], campaign_id: str):
+def _read(campaign_id: str, encoding: str | None) -> tuple[int, dict[str, Any] | None]:
+    """(current version, entry with meta fields + the requested body variant)."""
+    fields = list(_META_FIELDS) + ([encoding] if encoding else [])
+    pipe = r_bytes().pipeline()
+    pipe.get(_version_key(campaign_id))
+    pipe.hmget(_cache_key(campaign_id), fields)
+    version_raw, values = pipe.execute()
+    if values[0] is None:
+        return int(version_raw or 0), None
+    entry: dict[str, Any] = {
+        "v": int(values[0]),
+        "t": float(values[1] or 0),
+        "etag": (values[2] or b"").decode(),
+    }
+    if encoding and values[3] is not None:
+        entry[encoding] = values[3]
+    return int(version_raw or 0), entry
+
+
+def _read_body(campaign_id: str, entry: dict[str, Any], encoding: str) -> str:
     """
-    Merge Redis cache (optional), set ETag + Cache-Control, honor If-None-Match → 304.
+    Make sure entry holds a body for encoding (second fetch only after a 304
+    check failed, or when the builder lacked that codec). Returns the
+    encoding actually available.
     """
-    key = _cache_key(campaign_id)
-    body: dict[str, Any] | None = None
+    if encoding in entry:
+        return encoding
+    for enc in (encoding, IDENTITY):
+        raw = r_bytes().hget(_cache_key(campaign_id), enc)
+        if raw is not None:
+            entry[enc] = raw
+            return enc
+    raise KeyError("public cache entry has no body")
+
+
+def _is_fresh(entry: dict[str, Any], version: int) -> bool:
+    return (
+        entry.get("v") == version
+        and time.time() - float(entry.get("t") or 0) < PUBLIC_JSON_REDIS_TTL
+    )
+
+
+def _acquire_lease(campaign_id: str) -> str | None:
+    token = uuid.uuid4().hex
     try:
-        cached = r().get(key)
-        if cached:
-            body = json.loads(cached)
+        if r_bytes().set(
+            _lease_key(campaign_id), token, nx=True, px=PUBLIC_REBUILD_LEASE_MS
+        ):
+            return token
     except Exception as e:
-        logger.debug("public campaign redis read skipped: %s", e)
+        logger.debug("public campaign lease skipped: %s", e)
+    return None
+
+
+def _release_lease(campaign_id: str, token: str) -> None:
+    try:
+        r_bytes().eval(_RELEASE_LEASE, 1, _lease_key(campaign_id), token)
+    except Exception as e:
+        logger.debug("public campaign lease release skipped: %s", e)
+
 
+def _rebuild(
+    campaign_id: str, version: int, build: Callable[[], dict[str, Any] | None]
+) -> dict[str, Any] | None:
+    started = time.perf_counter()
+    body = build()
     if body is None:
-        body = resp_dict
+        # The campaign is gone: drop the stale entry so readers waiting out
+        # another rebuild stop serving it.
+        invalidate_local(L1_NAME, str(campaign_id))
         try:
-            r().setex(key, PUBLIC_JSON_REDIS_TTL, json.dumps(resp_dict, default=str))
+            r_bytes().delete(_cache_key(campaign_id))
         except Exception as e:
-            logger.debug("public campaign redis write skipped: %s", e)
+            logger.debug("public campaign redis delete skipped: %s", e)
+        return None
+    # Stamped with the version read before building: an invalidation that
+    # lands mid-build leaves this entry stale instead of hiding the change.
+    entry = encode_public_payload(body, version)
+    PUBLIC_CACHE_REBUILDS.inc()
+    PUBLIC_CACHE_REBUILD_SECONDS.observe(time.perf_counter() - started)
+    try:
+        key = _cache_key(campaign_id)
+        pipe = r_bytes().pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping=entry)
+        pipe.expire(key, PUBLIC_JSON_REDIS_TTL + PUBLIC_JSON_STALE_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.debug("public campaign redis write skipped: %s", e)
+    return entry
+
 
-    etag = _etag_for_dict(body)
-    inm = request.headers.get("If-None-Match")
-    if inm and inm.strip() == etag:
+def get_public_campaign_entry(
+    campaign_id: str,
+    build: Callable[[], dict[str, Any] | None],
+    encoding: str | None = IDENTITY,
+) -> dict[str, Any] | None:
+    """
+    Cached encoded payload (see encode_public_payload); only the meta fields
+    and the requested encoding are fetched. build() runs only on a miss or
+    stale entry, and then in at most one request per campaign at a time.
+    Returns None if build() reports the campaign does not exist.
+    """
+    l1 = local_cache(L1_NAME)
+    cached = l1.get(campaign_id)
+    if cached is not None and (encoding is None or encoding in cached):
+        return cached
+    epoch = l1.epoch()
+    try:
+        version, entry = _read(campaign_id, encoding)
+    except Exception as e:
+        logger.debug("public campaign redis read skipped: %s", e)
+        PUBLIC_CACHE_LOOKUPS.labels(result="miss").inc()
+        body = build()
+        return encode_public_payload(body) if body is not None else None
+
+    if entry is not None and _is_fresh(entry, version):
+        PUBLIC_CACHE_LOOKUPS.labels(result="hit").inc()
+        if cached is not None and cached.get("etag") == entry["etag"]:
+            # Same payload, new variant: keep the ones already held.
+            entry = {**cached, **entry}
+        l1.set(campaign_id, entry, epoch=epoch)
+        return entry
+
+    PUBLIC_CACHE_LOOKUPS.labels(result="stale" if entry is not None else "miss").inc()
+    token = _acquire_lease(campaign_id)
+    if token is not None:
+        try:
+            entry = _rebuild(campaign_id, version, build)
+        finally:
+            _release_lease(campaign_id, token)
+        l1.set(campaign_id, entry, epoch=epoch)
+        return entry
+
+    if entry is not None:
+        # Someone else is rebuilding: serve what we have.
+        return entry
+
+    # Cold miss with a rebuild in flight: wait briefly for its result.
+    deadline = time.monotonic() + PUBLIC_MISS_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        try:
+            _version, entry = _read(campaign_id, encoding)
+        except Exception:
+            break
+        if entry is not None:
+            return entry
+    return _rebuild(campaign_id, version, build)
+
+
+def _etag_for(etag: str, encoding: str) -> str:
+    """The entry's ETag for the variant sent with this content-coding."""
+    if encoding == IDENTITY:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored.
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _preferred_encoding() -> str:
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") > 0:
+        return "br"
+    if accepted.quality("gzip") > 0:
+        return "gzip"
+    return IDENTITY
+
+
+def respond_public_campaign_json(
+    campaign_id: str, build: Callable[[], dict[str, Any] | None]
+):
+    """
+    Serve the cached payload bytes (see get_public_campaign_entry) with ETag +
+    Cache-Control, honoring If-None-Match → 304 and Accept-Encoding.
+    """
+    inm = (request.headers.get("If-None-Match") or "").strip()
+    encoding = _preferred_encoding()
+    # With a validator, fetch only the ETag first; most such requests end in 304.
+    entry = get_public_campaign_entry(
+        campaign_id, build, encoding=None if inm else encoding
+    )
+    if entry is None:
+        return jsonify({"error": "campaign not found"}), 404
+
+    etag = _etag_for(entry["etag"], encoding)
+    if inm and _etag_matches(inm, etag):
         out = make_response("", 304)
         out.headers["ETag"] = etag
         out.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
+        out.headers["Vary"] = "Accept-Encoding"
         return out
 
-    out = make_response(jsonify(body), 200)
+    try:
+        encoding = _read_body(campaign_id, entry, encoding)
+    except Exception as e:
+        logger.debug("public campaign body fetch failed, rebuilding: %s", e)
+        body = build()
+        if body is None:
+            return jsonify({"error": "campaign not found"}), 404
+        entry = encode_public_payload(body)
+        encoding = encoding if encoding in entry else IDENTITY
+    # The variant actually sent (identity when the builder lacked the codec).
+    etag = _etag_for(entry["etag"], encoding)
+
+    out = make_response(entry[encoding], 200)
+    out.headers["Content-Type"] = "application/json"
+    if encoding != IDENTITY:
+        out.headers["Content-Encoding"] = encoding
+    out.headers["Vary"] = "Accept-Encoding"
     out.headers["ETag"] = etag
     out.headers["Cache-Control"] = PUBLIC_CACHE_CONTROL
     return out
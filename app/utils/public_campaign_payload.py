@@ -3,6 +3,21 @@
 from typing import Any
 
 from app.models.campaign import get_latest_winner_public
+from app.utils.db import get_db_connection
+
+_PUBLIC_CAMPAIGN_SQL = """
+  SELECT c.id, c.title, c.slug, c.status,
+         COALESCE(c.goal, 0) AS goal,
+         COALESCE(c.total_raised, 0) AS total_raised,
+         c.giveaway_prize_cents,
+         c.page_layout,
+         c.ai_site_recipe,
+         COALESCE(s.donations_count, 0) AS donations_count,
+         s.last_donation_at::text AS last_donation_at
+  FROM campaigns c
+  LEFT JOIN campaign_donation_stats s ON s.campaign_id = c.id
+  WHERE c.id = %s
+"""
 
 
 def build_public_campaign_dict(
@@ -10,7 +25,7 @@ def build_public_campaign_dict(
 ) -> dict[str, Any]:
     """
     row columns: id, title, slug, status, goal, total_raised, giveaway_prize_cents,
-    page_layout, ai_site_recipe
+    page_layout, ai_site_recipe[, donations_count, last_donation_at]
     """
     resp: dict[str, Any] = {
         "id": str(row[0]),
@@ -27,7 +42,20 @@ def build_public_campaign_dict(
         resp["page_layout"] = row[7]
     if row[8] is not None:
         resp["ai_site_recipe"] = row[8]
+    if len(row) > 10:
+        resp["donations_count"] = int(row[9] or 0)
+        resp["last_donation_at"] = row[10]
     latest = get_latest_winner_public(campaign_id_str)
     if latest:
         resp["latest_winner"] = latest
     return resp
+
+
+def load_public_campaign(campaign_id: str) -> dict[str, Any] | None:
+    """Public campaign dict by id (cache rebuild path), or None if not found."""
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(_PUBLIC_CAMPAIGN_SQL, (campaign_id,))
+        row = cur.fetchone()
+    if not row:
+        return None
+    return build_public_campaign_dict(row, str(row[0]))
@@ -0,0 +1,145 @@
+"""Cached subdomain -> org_id and (org_id, slug) -> campaign_id resolution.
+
+Public routes resolve these on every request before the payload cache is
+consulted, so both mappings live in the in-process L1 and in Redis.
+Unknown names are cached too (as ""), for a shorter time, so scanners
+probing random subdomains do not reach Postgres.
+
+Invalidation (after the change commits) replaces the Redis value with a
+short tombstone instead of deleting it. Fills use SET NX, so a request
+that read the old mapping just before the change cannot write it back;
+while the tombstone lives lookups go to the database uncached.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Callable
+
+from app.utils.cache import r
+from app.utils.db import get_db_connection
+from app.utils.local_cache import invalidate_local, local_cache
+
+logger = logging.getLogger(__name__)
+
+RESOLVE_TTL = int(os.getenv("PUBLIC_RESOLVE_TTL", "3600"))
+RESOLVE_NEGATIVE_TTL = int(os.getenv("PUBLIC_RESOLVE_NEGATIVE_TTL", "60"))
+_L1_TTL = float(os.getenv("PUBLIC_RESOLVE_L1_TTL", "60"))
+_TOMBSTONE = "!"
+_TOMBSTONE_TTL = 10
+
+SUBDOMAIN_L1 = "org_subdomain"
+CAMPAIGN_SLUG_L1 = "campaign_slug"
+
+
+def _subdomain_key(subdomain: str) -> str:
+    return f"resolve:sub:{subdomain}"
+
+
+def _slug_key(org_id: str, slug: str) -> str:
+    return f"resolve:camp:{org_id}:{slug}"
+
+
+def _resolve(
+    l1_name: str, l1_key: str, redis_key: str, load: Callable[[], str | None]
+) -> str | None:
+    l1 = local_cache(l1_name, ttl_seconds=_L1_TTL)
+    cached = l1.get(l1_key)
+    if cached is not None:
+        return cached or None
+    epoch = l1.epoch()
+
+    try:
+        raw = r().get(redis_key)
+    except Exception as e:
+        logger.debug("resolve cache read skipped: %s", e)
+        return load()
+    if raw == _TOMBSTONE:
+        return load()
+
+    if raw is None:
+        value = load()
+        raw = value or ""
+        try:
+            r().set(
+                redis_key,
+                raw,
+                ex=RESOLVE_TTL if raw else RESOLVE_NEGATIVE_TTL,
+                nx=True,
+            )
+        except Exception as e:
+            logger.debug("resolve cache write skipped: %s", e)
+
+    l1.set(
+        l1_key,
+        raw,
+        ttl_seconds=_L1_TTL if raw else min(_L1_TTL, RESOLVE_NEGATIVE_TTL),
+        epoch=epoch,
+    )
+    return raw or None
+
+
+def _invalidate(l1_name: str, l1_key: str, redis_key: str) -> None:
+    invalidate_local(l1_name, l1_key)
+    try:
+        r().set(redis_key, _TOMBSTONE, ex=_TOMBSTONE_TTL)
+    except Exception as e:
+        logger.debug("resolve cache invalidate skipped: %s", e)
+
+
+def _load_org_id(subdomain: str) -> str | None:
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM organizations WHERE subdomain=%s", (subdomain,))
+        row = cur.fetchone()
+    return str(row[0]) if row else None
+
+
+def _load_campaign_id(org_id: str, slug: str) -> str | None:
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT id FROM campaigns WHERE org_id=%s AND slug=%s",
+            (org_id, slug),
+        )
+        row = cur.fetchone()
+    return str(row[0]) if row else None
+
+
+def resolve_org_id(subdomain: str) -> str | None:
+    if not subdomain:
+        return None
+    return _resolve(
+        SUBDOMAIN_L1,
+        subdomain,
+        _subdomain_key(subdomain),
+        lambda: _load_org_id(subdomain),
+    )
+
+
+def resolve_campaign_id(org_id: str, slug: str) -> str | None:
+    if not org_id or not slug:
+        return None
+    return _resolve(
+        CAMPAIGN_SLUG_L1,
+        f"{org_id}:{slug}",
+        _slug_key(org_id, slug),
+        lambda: _load_campaign_id(org_id, slug),
+    )
+
+
+def resolve_public_campaign(subdomain: str, slug: str) -> tuple[str | None, str | None]:
+    """(org_id, campaign_id) for a public URL; either may be None if unknown."""
+    org_id = resolve_org_id(subdomain)
+    if not org_id:
+        return None, None
+    return org_id, resolve_campaign_id(org_id, slug)
+
+
+def invalidate_org_subdomain(subdomain: str | None) -> None:
+    if subdomain:
+        _invalidate(SUBDOMAIN_L1, subdomain, _subdomain_key(subdomain))
+
+
+def invalidate_campaign_slug(org_id, slug: str | None) -> None:
+    if org_id and slug:
+        _invalidate(CAMPAIGN_SLUG_L1, f"{org_id}:{slug}", _slug_key(str(org_id), slug))
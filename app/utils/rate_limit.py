@@ -3,63 +3,165 @@ Redis-backed rate limiter with in-memory fallback.
 
 Configure via RATE_LIMIT_ENABLED (default: 1) and RATE_LIMIT_PER_MINUTE (default: 200).
 Auth endpoints use RATE_LIMIT_AUTH_PER_MINUTE (default: 10).
+
+Limits are a sliding window counter: a key keeps the count for the
+current fixed window and the previous one, and a request is allowed while
+previous * (share of the window not yet elapsed) + current stays below the
+limit. In Redis that state is one small hash per key and window, read and
+updated by a Lua script in a single round trip (EVALSHA) using the Redis
+server's clock; rejected requests are not counted.
 """
 
 from __future__ import annotations
+import math
 import os
 import time
-import uuid
-from collections import defaultdict
+from dataclasses import dataclass
 from threading import Lock
 from app.utils.cache import r
 
 _lock = Lock()
-_counts: dict[str, list[float]] = defaultdict(list)
+_counters: dict[str, tuple[int, int, int]] = {}
+_LOCAL_MAX_KEYS = 100_000
 _window = 60  # seconds
 
+# KEYS[1]: counter hash. ARGV: limit, window in ms.
+# Returns {allowed, previous count, current count, ms into the window}.
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window_ms = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now_ms = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local bucket = math.floor(now_ms / window_ms)
+local elapsed = now_ms - bucket * window_ms
+local h = redis.call('HMGET', KEYS[1], 'b', 'c', 'p')
+local curr = tonumber(h[2]) or 0
+local prev = tonumber(h[3]) or 0
+if tonumber(h[1]) ~= bucket then
+  if tonumber(h[1]) == bucket - 1 then prev = curr else prev = 0 end
+  curr = 0
+end
+local allowed = 0
+if prev * (window_ms - elapsed) / window_ms + curr + 1 <= limit then
+  allowed = 1
+  curr = curr + 1
+  redis.call('HSET', KEYS[1], 'b', bucket, 'c', curr, 'p', prev)
+  redis.call('PEXPIRE', KEYS[1], window_ms * 2)
+end
+return {allowed, prev, curr, elapsed}
+"""
 
-def _clean_old(ts_list: list[float], window: int) -> None:
-    now = time.time()
-    cutoff = now - window
-    while ts_list and ts_list[0] < cutoff:
-        ts_list.pop(0)
-
-
-def is_rate_limited(key: str, limit: int, window_seconds: int | None = None) -> bool:
-    """Return True if the key has exceeded the limit within the window.
+_script = None
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """Outcome of one check; times are in seconds."""
+
+    limited: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+
+def _sliding_window_script():
+    global _script
+    if _script is None:
+        _script = r().register_script(_SLIDING_WINDOW_LUA)
+    return _script
+
+
+def _result(
+    limit: int, window_ms: int, allowed: bool, prev: int, curr: int, elapsed: int
+) -> RateLimitResult:
+    remaining_share = (window_ms - elapsed) / window_ms
+    used = prev * remaining_share + curr
+    if allowed:
+        return RateLimitResult(
+            limited=False,
+            limit=limit,
+            remaining=max(0, math.floor(limit - used)),
+            reset_after=(window_ms - elapsed) / 1000.0,
+        )
+    # When does previous * share + current drop to limit - 1?
+    if prev > 0 and curr <= limit - 1:
+        wait_ms = max(0.0, window_ms * (1 - (limit - 1 - curr) / prev) - elapsed)
+    else:
+        # Not within this window: the current count becomes the previous one.
+        wait_ms = (window_ms - elapsed) + window_ms * max(
+            0.0, 1 - (limit - 1) / max(curr, 1)
+        )
+    retry_after = wait_ms / 1000.0
+    return RateLimitResult(
+        limited=True,
+        limit=limit,
+        remaining=0,
+        reset_after=retry_after,
+        retry_after=retry_after,
+    )
+
+
+def _check_local(key: str, limit: int, window_ms: int) -> RateLimitResult:
+    # The same algorithm as the Lua script, for one process.
+    now_ms = int(time.time() * 1000)
+    bucket, elapsed = divmod(now_ms, window_ms)
+    with _lock:
+        if key not in _counters and len(_counters) >= _LOCAL_MAX_KEYS:
+            _counters.clear()  # bound memory while Redis is down
+        b, curr, prev = _counters.get(key, (bucket, 0, 0))
+        if b != bucket:
+            prev = curr if b == bucket - 1 else 0
+            curr = 0
+        allowed = prev * (window_ms - elapsed) / window_ms + curr + 1 <= limit
+        if allowed:
+            curr += 1
+        _counters[key] = (bucket, curr, prev)
+    return _result(limit, window_ms, allowed, prev, curr, elapsed)
+
+
+def check_rate_limit(
+    key: str, limit: int, window_seconds: int | None = None
+) -> RateLimitResult:
+    """Count a request against key and return whether it is over the limit.
     Uses default 60s window unless window_seconds is set (e.g. 3600 for per-hour).
 
-    Primary backend: Redis sorted sets (shared across instances).
-    Fallback backend: in-memory list (single process only).
+    Primary backend: one Redis hash per key (shared across instances).
+    Fallback backend: in-memory counters (single process only).
     """
     if limit <= 0:
-        return False
+        return RateLimitResult(limited=False, limit=0, remaining=0, reset_after=0.0)
     window = window_seconds if window_seconds is not None else _window
-    now = time.time()
+    window_ms = int(window * 1000)
+    redis_key = f"ratelimit:{key}:{window}:sw"
 
     try:
-        client = r()
-        now_ms = int(now * 1000)
-        cutoff_ms = int((now - window) * 1000)
-        redis_key = f"ratelimit:{key}:{window}"
-
-        client.zremrangebyscore(redis_key, 0, cutoff_ms)
-        current_count = int(client.zcard(redis_key))
-        if current_count >= limit:
-            return True
-
-        member = f"{now_ms}:{uuid.uuid4().hex}"
-        client.zadd(redis_key, {member: now_ms})
-        client.expire(redis_key, window + 5)
-        return False
+        allowed, prev, curr, elapsed = _sliding_window_script()(
+            keys=[redis_key], args=[limit, window_ms]
+        )
     except Exception:
         # Redis unavailable: degrade to process-local limiter to preserve protection.
-        with _lock:
-            _clean_old(_counts[key], window)
-            if len(_counts[key]) >= limit:
-                return True
-            _counts[key].append(now)
-            return False
+        return _check_local(redis_key, limit, window_ms)
+    return _result(
+        limit, window_ms, bool(int(allowed)), int(prev), int(curr), int(elapsed)
+    )
+
+
+def is_rate_limited(key: str, limit: int, window_seconds: int | None = None) -> bool:
+    """Return True if the key has exceeded the limit within the window."""
+    return check_rate_limit(key, limit, window_seconds).limited
+
+
+def rate_limit_headers(result: RateLimitResult) -> dict[str, str]:
+    """X-RateLimit-* headers for result (reset is in seconds from now)."""
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(math.ceil(result.reset_after)),
+    }
+    if result.limited:
+        headers["Retry-After"] = str(max(1, math.ceil(result.retry_after)))
+    return headers
 
 
 def rate_limit_key() -> str:
@@ -72,11 +174,18 @@ def rate_limit_key() -> str:
     return request.remote_addr or "unknown"
 
 
-def rate_limit_exceeded_response(limit: int):
+def rate_limit_exceeded_response(limit: int, result: RateLimitResult | None = None):
     """Return 429 response."""
     from flask import jsonify
 
-    return jsonify({"error": "rate limit exceeded", "retry_after": 60}), 429
+    if result is None:
+        return jsonify({"error": "rate limit exceeded", "retry_after": 60}), 429
+    retry_after = max(1, math.ceil(result.retry_after))
+    return (
+        jsonify({"error": "rate limit exceeded", "retry_after": retry_after}),
+        429,
+        rate_limit_headers(result),
+    )
 
 
 def rate_limit_decorator(limit_per_minute: int, key_prefix: str = ""):
@@ -91,8 +200,9 @@ def rate_limit_decorator(limit_per_minute: int, key_prefix: str = ""):
                 return fn(*args, **kwargs)
             prefix = key_prefix or str(limit_per_minute)
             key = f"{prefix}:{rate_limit_key()}"
-            if is_rate_limited(key, limit_per_minute):
-                return rate_limit_exceeded_response(limit_per_minute)
+            result = check_rate_limit(key, limit_per_minute)
+            if result.limited:
+                return rate_limit_exceeded_response(limit_per_minute, result)
             return fn(*args, **kwargs)
 
         return wrapper
@@ -76,6 +76,94 @@ def delete_object(key: str) -> None:
     s3.delete_object(Bucket=S3_BUCKET, Key=key)
 
 
+def presign_get(key: str, expires: int = 900, filename: str | None = None) -> str:
+    """Time-limited download URL (private objects such as exports)."""
+    params = {"Bucket": S3_BUCKET, "Key": key}
+    if filename:
+        params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+    return _client().generate_presigned_url(
+        ClientMethod="get_object", Params=params, ExpiresIn=expires
+    )
+
+
+# S3 rejects parts under 5 MiB except the last one.
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUpload:
+    """
+    Write-only file-like object that uploads to key in parts of part_size
+    bytes, so arbitrarily large objects are written with bounded memory.
+    close() completes the upload; abort() discards it.
+    """
+
+    def __init__(self, key: str, content_type: str, part_size: int = 8 * 1024 * 1024):
+        self.key = key
+        self.part_size = max(part_size, MULTIPART_MIN_PART_SIZE)
+        self._s3 = _client()
+        self._upload_id = self._s3.create_multipart_upload(
+            Bucket=S3_BUCKET, Key=key, ContentType=content_type
+        )["UploadId"]
+        self._parts: list[dict] = []
+        self._buf = bytearray()
+        self._size = 0
+        self.closed = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        self._size += len(data)
+        while len(self._buf) >= self.part_size:
+            self._upload_part(bytes(self._buf[: self.part_size]))
+            del self._buf[: self.part_size]
+        return len(data)
+
+    def tell(self) -> int:
+        return self._size
+
+    def flush(self) -> None:
+        pass
+
+    def _upload_part(self, body: bytes) -> None:
+        number = len(self._parts) + 1
+        resp = self._s3.upload_part(
+            Bucket=S3_BUCKET,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=number,
+            Body=body,
+        )
+        self._parts.append({"PartNumber": number, "ETag": resp["ETag"]})
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self._buf or not self._parts:
+            self._upload_part(bytes(self._buf))
+            self._buf.clear()
+        self._s3.complete_multipart_upload(
+            Bucket=S3_BUCKET,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+        self.closed = True
+
+    def abort(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._s3.abort_multipart_upload(
+            Bucket=S3_BUCKET, Key=self.key, UploadId=self._upload_id
+        )
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
 def public_url(key: str) -> str:
     if USE_PATH:
         return f"{S3_ENDPOINT.rstrip('/')}/{S3_BUCKET}/{key}"
@@ -0,0 +1,109 @@
+"""Weighted sampling without replacement over a stream, in O(k) memory.
+
+Uses the Efraimidis-Spirakis scheme: every item gets the key u ** (1 / w)
+for a uniform u in (0, 1), and the k items with the largest keys are the
+sample. That is distributed exactly like drawing k times one after
+another, each time with probability proportional to weight among the
+items not yet drawn. Keys are kept in log space (log(u) / w) so large
+weights do not underflow.
+
+Once the reservoir is full, the "exponential jumps" variant (A-ExpJ)
+draws how much weight to skip before the next replacement instead of a
+key per item, so only O(k log(n / k)) random numbers are needed and the
+per-item cost is a subtraction.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import math
+import random
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+class HashRandom(random.Random):
+    """
+    Deterministic generator: output n is SHA-256(seed || n). Unlike the
+    Mersenne Twister it is specified entirely here, so a draw replayed from
+    its seed gives the same result on any Python version.
+    """
+
+    def __init__(self, seed: bytes):
+        self._seed_bytes = bytes(seed)
+        self._counter = 0
+        super().__init__(0)
+
+    def seed(self, a=None, version=2) -> None:
+        # The seed is fixed at construction; reseeding just rewinds.
+        self._counter = 0
+
+    def _block(self) -> bytes:
+        block = hashlib.sha256(
+            self._seed_bytes + self._counter.to_bytes(8, "big")
+        ).digest()
+        self._counter += 1
+        return block
+
+    def random(self) -> float:
+        return (int.from_bytes(self._block()[:7], "big") >> 3) / (1 << 53)
+
+    def getrandbits(self, k: int) -> int:
+        if k < 0:
+            raise ValueError("number of bits must be non-negative")
+        out = b""
+        while len(out) * 8 < k:
+            out += self._block()
+        return int.from_bytes(out, "big") >> (len(out) * 8 - k)
+
+
+def _uniform_open(rng: random.Random) -> float:
+    """Uniform in (0, 1)."""
+    u = rng.random()
+    while u == 0.0:
+        u = rng.random()
+    return u
+
+
+def weighted_sample(
+    items: Iterable[T],
+    k: int,
+    weight: Callable[[T], float],
+    rng: random.Random | None = None,
+) -> list[T]:
+    """
+    Up to k distinct items from a single pass over items, each draw weighted
+    by weight(item). Items with weight <= 0 are never picked. The result is
+    in draw order (the first element is the first winner).
+    """
+    if k <= 0:
+        return []
+    rng = rng or random.SystemRandom()
+    heap: list[tuple[float, int, T]] = []  # min-heap on log key, size <= k
+    skip = 0.0  # weight left to pass over before the next replacement
+    for seq, item in enumerate(items):
+        w = weight(item)
+        if w <= 0:
+            continue
+        if len(heap) < k:
+            heapq.heappush(heap, (math.log(_uniform_open(rng)) / w, seq, item))
+            if len(heap) == k:
+                skip = _next_skip(heap[0][0], rng)
+            continue
+        skip -= w
+        if skip > 0:
+            continue
+        # This item's key is uniform between the threshold and the maximum.
+        floor = math.exp(heap[0][0] * w)
+        u = 1.0 - (1.0 - floor) * _uniform_open(rng)
+        heapq.heapreplace(heap, (math.log(u) / w, seq, item))
+        skip = _next_skip(heap[0][0], rng)
+    return [item for _key, _seq, item in sorted(heap, reverse=True)]
+
+
+def _next_skip(threshold: float, rng: random.Random) -> float:
+    if threshold >= 0.0:
+        return math.inf  # nothing can beat a key of 1
+    return math.log(_uniform_open(rng)) / threshold
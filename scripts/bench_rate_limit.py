@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Redis rate limiter against the previous sorted-set version.
+
+Runs the same stream of checks (R requests spread over K client keys,
+limit L per 60s) through the previous implementation (ZREMRANGEBYSCORE,
+ZCARD, ZADD and EXPIRE as four calls, one sorted-set member per request)
+and through app.utils.rate_limit.check_rate_limit (one EVALSHA against a
+small hash). Reports checks per second, per-check latency and Redis memory
+per client key.
+
+Usage:
+  poetry run python scripts/bench_rate_limit.py --requests 20000 --keys 200 --limit 200
+Requires: a reachable Redis (--redis-url, default REDIS_URL).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _zset_is_rate_limited(client, key: str, limit: int, window: int) -> bool:
+    """The previous implementation of is_rate_limited (Redis path)."""
+    now = time.time()
+    now_ms = int(now * 1000)
+    cutoff_ms = int((now - window) * 1000)
+    redis_key = f"ratelimit:{key}:{window}"
+
+    client.zremrangebyscore(redis_key, 0, cutoff_ms)
+    current_count = int(client.zcard(redis_key))
+    if current_count >= limit:
+        return True
+
+    member = f"{now_ms}:{uuid.uuid4().hex}"
+    client.zadd(redis_key, {member: now_ms})
+    client.expire(redis_key, window + 5)
+    return False
+
+
+def _run(name, check, keys, requests):
+    latencies = []
+    limited = 0
+    started = time.perf_counter()
+    for n in range(requests):
+        t0 = time.perf_counter()
+        limited += bool(check(keys[n % len(keys)]))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<16} {requests / elapsed:9.0f} checks/s  "
+        f"p50 {statistics.median(latencies) * 1e6:7.0f} us  "
+        f"p99 {p99 * 1e6:7.0f} us  limited {limited}"
+    )
+
+
+def _memory_per_key(client, pattern: str) -> float:
+    keys = list(client.scan_iter(match=pattern, count=1000))
+    if not keys:
+        return 0.0
+    return sum(client.memory_usage(k) or 0 for k in keys) / len(keys)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=200, help="distinct clients")
+    parser.add_argument("--limit", type=int, default=200, help="per 60s window")
+    parser.add_argument(
+        "--redis-url",
+        default=os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"),
+    )
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    sys.path.insert(0, ROOT)
+    from app.utils.cache import r
+    from app.utils.rate_limit import check_rate_limit
+
+    client = r()
+    client.ping()
+    run = uuid.uuid4().hex[:8]
+    window = 60
+    zset_keys = [f"bench-{run}-zset:{n}" for n in range(args.keys)]
+    lua_keys = [f"bench-{run}-lua:{n}" for n in range(args.keys)]
+
+    print(
+        f"requests={args.requests} keys={args.keys} limit={args.limit}/{window}s "
+        f"redis={args.redis_url}"
+    )
+    try:
+        _run(
+            "zset (4 calls)",
+            lambda key: _zset_is_rate_limited(client, key, args.limit, window),
+            zset_keys,
+            args.requests,
+        )
+        _run(
+            "lua (1 call)",
+            lambda key: check_rate_limit(key, args.limit, window).limited,
+            lua_keys,
+            args.requests,
+        )
+        print(
+            f"memory/key       zset {_memory_per_key(client, f'ratelimit:bench-{run}-zset:*'):.0f} B  "
+            f"lua {_memory_per_key(client, f'ratelimit:bench-{run}-lua:*'):.0f} B"
+        )
+    finally:
+        stale = list(client.scan_iter(match=f"ratelimit:bench-{run}-*", count=1000))
+        if stale:
+            client.delete(*stale)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark Socket.IO room broadcasts fanned out through the Redis message queue.
+
+Starts N local Socket.IO server processes sharing one Redis channel (the
+same RedisManager setup app.realtime uses), connects C clients to each and
+joins them to one room, then publishes E events from a separate write-only
+emitter (like an RQ worker calling app.realtime.broadcast). Reports
+publish rate, deliveries per second across all clients and the
+publish-to-receive latency.
+
+Usage:
+  poetry run python scripts/bench_socketio_fanout.py --processes 4 --clients 25 --events 500
+Requires: a reachable Redis (--redis-url, default REDIS_URL).
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+ROOM = "bench"
+
+
+def _serve(port: int, redis_url: str, channel: str) -> None:
+    import eventlet
+
+    eventlet.monkey_patch()
+    import eventlet.wsgi
+    import socketio
+
+    sio = socketio.Server(
+        async_mode="eventlet",
+        client_manager=socketio.RedisManager(redis_url, channel=channel),
+    )
+
+    @sio.on("join")
+    def _join(sid, _data=None):
+        sio.enter_room(sid, ROOM)
+        return True
+
+    eventlet.wsgi.server(
+        eventlet.listen(("127.0.0.1", port)), socketio.WSGIApp(sio), log_output=False
+    )
+
+
+def _wait_for_port(port: int, timeout: float = 15.0) -> None:
+    import socket
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=25, help="clients per process")
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--base-port", type=int, default=5600)
+    parser.add_argument(
+        "--redis-url",
+        default=os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0"),
+    )
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    import socketio
+
+    channel = f"bench-{uuid.uuid4().hex[:8]}"
+    ctx = multiprocessing.get_context("spawn")
+    servers = [
+        ctx.Process(
+            target=_serve,
+            args=(args.base_port + i, args.redis_url, channel),
+            daemon=True,
+        )
+        for i in range(args.processes)
+    ]
+    for p in servers:
+        p.start()
+
+    latencies: list[float] = []
+    received = 0
+    lock = threading.Lock()
+    done = threading.Event()
+    expected = args.events * args.processes * args.clients
+    clients = []
+    try:
+        for i in range(args.processes):
+            _wait_for_port(args.base_port + i)
+        for i in range(args.processes):
+            for _ in range(args.clients):
+                client = socketio.Client()
+
+                @client.on("tick")
+                def _tick(data):
+                    nonlocal received
+                    now = time.time()
+                    with lock:
+                        received += 1
+                        latencies.append(now - data["t"])
+                        if received >= expected:
+                            done.set()
+
+                client.connect(
+                    f"http://127.0.0.1:{args.base_port + i}", transports=["polling"]
+                )
+                client.call("join", {})
+                clients.append(client)
+
+        emitter = socketio.RedisManager(
+            args.redis_url, channel=channel, write_only=True
+        )
+        started = time.perf_counter()
+        for n in range(args.events):
+            emitter.emit("tick", {"n": n, "t": time.time()}, room=ROOM, namespace="/")
+        published = time.perf_counter() - started
+        done.wait(args.timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        for client in clients:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+        for p in servers:
+            p.terminate()
+
+    print(
+        f"processes={args.processes} clients={args.processes * args.clients} "
+        f"events={args.events}"
+    )
+    print(f"published   {args.events / published:10.0f} events/s")
+    print(
+        f"delivered   {received}/{expected} in {elapsed:.2f}s "
+        f"({received / elapsed:.0f} deliveries/s)"
+    )
+    if latencies:
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"latency     p50 {statistics.median(latencies) * 1000:.1f} ms  "
+            f"p99 {p99 * 1000:.1f} ms"
+        )
+    return 0 if received >= expected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,81 @@
 import os
 import sys
 
+import pytest
+
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store = {}
+        self.published = []
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    def setex(self, key, _ttl, value):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def hset(self, key, mapping):
+        self.store.setdefault(key, {}).update(
+            {
+                k: v if isinstance(v, bytes) else str(v).encode()
+                for k, v in mapping.items()
+            }
+        )
+
+    def hmget(self, key, fields):
+        h = self.store.get(key) or {}
+        return [h.get(f) for f in fields]
+
+    def hget(self, key, field):
+        return (self.store.get(key) or {}).get(field)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key) or 0) + 1)
+        return int(self.store[key])
+
+    def expire(self, _key, _ttl):
+        return True
+
+    def eval(self, _script, _numkeys, key, token):
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+
+    def pipeline(self):
+        redis = self
+
+        class Pipe:
+            def __init__(self):
+                self.ops = []
+
+            def __getattr__(self, name):
+                return lambda *a, **k: self.ops.append((name, a, k))
+
+            def execute(self):
+                return [getattr(redis, n)(*a, **k) for n, a, k in self.ops]
+
+        return Pipe()
+
+
+@pytest.fixture
+def fake_redis():
+    """In-memory stand-in for the Redis client (strings, hashes, pipelines)."""
+    return FakeRedis()
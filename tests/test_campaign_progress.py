@@ -0,0 +1,54 @@
+import uuid
+
+from flask import Flask
+
+from app.routes import campaign_routes
+from app.services import campaign_progress_service
+from app.utils import local_cache
+
+
+def test_progress_reads_campaign_and_rollup_in_one_call(monkeypatch, fake_redis):
+    app = Flask(__name__)
+    cid = str(uuid.uuid4())
+    calls = []
+
+    def fake_stats(campaign_id):
+        calls.append(campaign_id)
+        return {
+            "id": campaign_id,
+            "goal": 1000,
+            "total_raised": 250,
+            "status": "active",
+            "fee_option": "donor_pays",
+            "fee_policy_version": "v1",
+            "fee_option_locked": True,
+            "donations_count": 3,
+            "last_donation_at": "2026-01-01 00:00:00+00",
+            "platform_fee_cents": 500,
+            "stripe_fee_cents": 800,
+            "net_payout_cents": 23700,
+        }
+
+    monkeypatch.setattr(campaign_progress_service, "r", lambda: fake_redis)
+    monkeypatch.setattr(local_cache, "_caches", {})
+    monkeypatch.setattr(
+        campaign_progress_service, "get_campaign_with_donation_stats", fake_stats
+    )
+
+    with app.test_request_context():
+        resp, status = campaign_routes.campaign_progress(cid)
+
+    body = resp.get_json()
+    assert status == 200
+    assert calls == [cid]
+    assert body["percent"] == 25.0
+    assert body["donations_count"] == 3
+    assert body["last_donation_at"] == "2026-01-01 00:00:00+00"
+    assert body["stripe_fee_cents"] == 800
+    assert body["net_to_org_cents"] == 23700
+    assert f"campaign:{cid}:progress:v1" in fake_redis.store
+
+    with app.test_request_context():
+        again, _status = campaign_routes.campaign_progress(cid)
+    assert again.get_json() == body
+    assert calls == [cid]
@@ -0,0 +1,204 @@
+import threading
+import time
+
+import psycopg2.extensions
+import pytest
+
+from app.utils import db
+from app.utils.db import (
+    CooperativeConnectionPool,
+    PoolTimeout,
+    after_commit,
+    get_db_connection,
+    savepoint,
+    unit_of_work,
+)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, sql, _params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+        self.conn.statements.append(sql)
+        if sql == "FAIL":
+            self.conn.tx_status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+            raise psycopg2.IntegrityError("duplicate key")
+        if sql.startswith("ROLLBACK TO SAVEPOINT"):
+            self.conn.tx_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.rolled_back = 0
+        self.commits = 0
+        self.statements = []
+        self.tx_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rolled_back += 1
+        self.tx_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def get_transaction_status(self):
+        return self.tx_status
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(**kwargs):
+    opened: list[FakeConn] = []
+
+    def connect():
+        conn = FakeConn()
+        opened.append(conn)
+        return conn
+
+    defaults = {"minconn": 0, "maxconn": 1, "timeout": 0.05}
+    defaults.update(kwargs)
+    return CooperativeConnectionPool(connect, **defaults), opened
+
+
+def test_reuses_returned_connection_and_rolls_back_open_transaction():
+    pool, opened = _pool()
+    conn = pool.getconn()
+    conn.tx_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+
+    assert conn.rolled_back == 1
+    assert pool.getconn() is conn
+    assert len(opened) == 1
+
+
+def test_exhausted_pool_times_out_instead_of_raising_immediately():
+    pool, _opened = _pool(timeout=0.05)
+    pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.04
+
+
+def test_full_wait_queue_fails_fast():
+    pool, _opened = _pool(timeout=5, max_waiters=0)
+    pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started < 1
+
+
+def test_waiter_receives_connection_when_released():
+    pool, _opened = _pool(timeout=2)
+    conn = pool.getconn()
+    got = {}
+
+    def waiter():
+        got["conn"] = pool.getconn()
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.05)
+    assert pool.stats()["waiting"] == 1
+    pool.putconn(conn)
+    t.join(timeout=2)
+
+    assert got["conn"] is conn
+    assert pool.stats() == {"in_use": 1, "idle": 0, "waiting": 0, "max": 1}
+
+
+def test_expired_connection_is_replaced():
+    pool, opened = _pool(max_lifetime=0)
+    first = pool.getconn()
+    pool.putconn(first)
+    second = pool.getconn()
+
+    assert first.closed
+    assert second is not first
+    assert len(opened) == 2
+
+
+def test_pre_ping_discards_dead_idle_connection():
+    pool, opened = _pool(pre_ping_after=0)
+    first = pool.getconn()
+    pool.putconn(first)
+    first.broken = True
+
+    second = pool.getconn()
+    assert second is not first
+    assert first.closed
+    assert len(opened) == 2
+
+
+def test_unit_of_work_shares_one_connection_and_commits_once(monkeypatch):
+    pool, opened = _pool(maxconn=2)
+    monkeypatch.setattr(db, "_get_pool", lambda: pool)
+    events = []
+
+    with unit_of_work():
+        with get_db_connection() as a:
+            a.commit()
+        with get_db_connection() as b:
+            b.commit()
+        after_commit(lambda: events.append("committed"))
+        assert events == []
+
+    assert len(opened) == 1
+    assert opened[0].commits == 1
+    assert events == ["committed"]
+    assert pool.stats()["in_use"] == 0
+
+
+def test_unit_of_work_rolls_back_and_drops_callbacks_on_error(monkeypatch):
+    pool, opened = _pool()
+    monkeypatch.setattr(db, "_get_pool", lambda: pool)
+    events = []
+
+    with pytest.raises(RuntimeError):
+        with unit_of_work():
+            get_db_connection().cursor()
+            after_commit(lambda: events.append("committed"))
+            raise RuntimeError("boom")
+
+    assert opened[0].commits == 0
+    assert opened[0].rolled_back == 1
+    assert events == []
+    assert pool.stats()["in_use"] == 0
+
+
+def test_savepoint_keeps_the_unit_of_work_usable_after_a_failed_statement(
+    monkeypatch,
+):
+    pool, opened = _pool()
+    monkeypatch.setattr(db, "_get_pool", lambda: pool)
+
+    with unit_of_work():
+        with pytest.raises(psycopg2.IntegrityError):
+            with savepoint("dedupe"):
+                with get_db_connection() as conn, conn.cursor() as cur:
+                    cur.execute("FAIL")
+
+    assert opened[0].statements == [
+        "SAVEPOINT dedupe",
+        "FAIL",
+        "ROLLBACK TO SAVEPOINT dedupe",
+    ]
+    assert opened[0].commits == 1
@@ -0,0 +1,218 @@
+import contextlib
+import csv
+import gzip
+import io
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import donation
+from app.services import donation_export_service as svc
+from app.utils import s3_helpers
+
+
+def _donation(n):
+    return {
+        "id": f"don_{n}",
+        "amount_cents": 100 * n,
+        "currency": None,
+        "donor_email": f"d{n}@example.com",
+        "status": "succeeded",
+        "created_at": datetime(2026, 1, n, tzinfo=timezone.utc),
+    }
+
+
+def test_csv_is_produced_incrementally():
+    consumed = []
+
+    def rows():
+        for n in range(1, 6):
+            consumed.append(n)
+            yield _donation(n)
+
+    chunks = svc.iter_csv_chunks(rows(), rows_per_chunk=2)
+    first = next(chunks)
+    assert consumed == [1, 2]  # nothing read beyond the first chunk
+
+    text = first + "".join(chunks)
+    parsed = list(csv.reader(io.StringIO(text)))
+    assert parsed[0] == svc.EXPORT_COLUMNS
+    assert len(parsed) == 6
+    assert parsed[1][:3] == ["don_1", "100", "usd"]
+    assert parsed[5][-1] == "2026-01-05T00:00:00+00:00"
+
+
+def test_rows_come_from_a_named_server_side_cursor(monkeypatch):
+    opened = {}
+
+    class FakeNamedCursor:
+        def __init__(self, name):
+            opened["name"] = name
+            self.itersize = None
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            opened["closed"] = True
+            return False
+
+        def execute(self, sql, params):
+            opened["itersize"] = self.itersize
+            opened["params"] = params
+
+        def __iter__(self):
+            yield ("don_1",) + (None,) * 15
+
+    class FakeConn:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            return False
+
+        def cursor(self, name=None):
+            return FakeNamedCursor(name)
+
+    monkeypatch.setattr(donation, "get_db_connection", lambda: FakeConn())
+
+    rows = list(donation.iter_donations_by_campaign("camp", chunk_size=50))
+
+    assert rows[0]["id"] == "don_1"
+    assert opened["name"].startswith("donations_export_")
+    assert opened["itersize"] == 50
+    assert opened["params"] == ("camp",)
+    assert opened["closed"]
+
+    list(donation.iter_donations_by_campaign("camp", status="succeeded"))
+    assert opened["params"] == ("camp", "succeeded")
+
+
+class FakeS3:
+    def __init__(self):
+        self.parts = {}
+        self.completed = {}
+        self.aborted = []
+
+    def create_multipart_upload(self, Bucket, Key, ContentType):
+        self.parts[Key] = []
+        return {"UploadId": f"up-{Key}"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.parts[Key].append(Body)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        assert [p["PartNumber"] for p in MultipartUpload["Parts"]] == list(
+            range(1, len(self.parts[Key]) + 1)
+        )
+        self.completed[Key] = b"".join(self.parts[Key])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted.append(Key)
+
+
+def _patch(monkeypatch, rows, *, version=7):
+    s3 = FakeS3()
+    monkeypatch.setattr(s3_helpers, "_client", lambda: s3)
+    monkeypatch.setattr(s3_helpers, "MULTIPART_MIN_PART_SIZE", 16 * 1024)
+    monkeypatch.setattr(svc, "EXPORT_PART_SIZE", 16 * 1024)
+    monkeypatch.setattr(svc, "_PROGRESS_EVERY", 1000)
+    export = {
+        "id": "exp-1",
+        "campaign_id": "camp-1",
+        "format": "csv",
+        "status": "queued",
+    }
+    updates = []
+
+    def update_export(export_id, **fields):
+        updates.append(fields)
+        export.update(fields)
+        return dict(export)
+
+    monkeypatch.setattr(svc, "get_export", lambda _id: dict(export))
+    monkeypatch.setattr(svc, "update_export", update_export)
+    monkeypatch.setattr(svc, "get_campaign_rows_version", lambda _cid: version)
+    monkeypatch.setattr(svc, "count_campaign_donations", lambda _cid: len(rows))
+    monkeypatch.setattr(
+        svc, "iter_donations_by_campaign", lambda _cid, **_kw: iter(rows)
+    )
+    return s3, updates
+
+
+def _rows(n):
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "amount_cents": 100 + i,
+            "donor_email": f"{uuid.uuid4().hex}@example.com",
+            "status": "succeeded",
+        }
+        for i in range(n)
+    ]
+
+
+def test_csv_export_streams_gzip_through_multipart_upload(monkeypatch):
+    rows = _rows(3000)
+    s3, updates = _patch(monkeypatch, rows)
+
+    result = svc.run_donation_export("exp-1")
+
+    key = "exports/camp-1/v7-exp-1.csv.gz"
+    assert result["status"] == "succeeded" and result["s3_key"] == key
+    assert len(s3.parts[key]) > 1
+    parsed = list(csv.reader(io.StringIO(gzip.decompress(s3.completed[key]).decode())))
+    assert parsed[0] == svc.EXPORT_COLUMNS
+    assert [r[0] for r in parsed[1:]] == [r["id"] for r in rows]
+    assert result["size_bytes"] == len(s3.completed[key])
+    progress = [u["progress_percent"] for u in updates if "progress_percent" in u]
+    assert progress == [0, 33, 66, 99, 100]
+
+
+def test_failed_export_aborts_the_upload(monkeypatch):
+    def broken_rows():
+        yield _rows(1)[0]
+        raise RuntimeError("connection lost")
+
+    s3, _updates = _patch(monkeypatch, [])
+    monkeypatch.setattr(
+        svc, "iter_donations_by_campaign", lambda _cid, **_kw: broken_rows()
+    )
+
+    result = svc.run_donation_export("exp-1")
+
+    assert result["status"] == "failed"
+    assert "connection lost" in result["error_message"]
+    assert s3.aborted == ["exports/camp-1/v7-exp-1.csv.gz"]
+    assert s3.completed == {}
+
+
+def test_unchanged_campaign_reuses_previous_export(monkeypatch):
+    previous = {"id": "exp-0", "status": "succeeded", "rows_version": 7}
+    calls = []
+    monkeypatch.setattr(svc, "unit_of_work", contextlib.nullcontext)
+    monkeypatch.setattr(
+        svc, "lock_export_requests", lambda cid, fmt: calls.append(("lock", fmt))
+    )
+    monkeypatch.setattr(
+        svc,
+        "fail_stale_exports",
+        lambda cid, fmt, seconds: calls.append(("stale", seconds)),
+    )
+    monkeypatch.setattr(svc, "get_campaign_rows_version", lambda _cid: 7)
+    monkeypatch.setattr(
+        svc,
+        "find_reusable_export",
+        lambda cid, fmt, version: previous if version == 7 else None,
+    )
+    monkeypatch.setattr(svc, "create_export", lambda **_kw: pytest.fail("should reuse"))
+
+    export, created = svc.request_donation_export("camp-1", "csv")
+
+    assert export is previous and created is False
+    # Locked before anything is read; stalled exports are never reused.
+    assert calls == [("lock", "csv"), ("stale", svc.EXPORT_JOB_TIMEOUT_SECONDS)]
+    with pytest.raises(svc.ExportError):
+        svc.request_donation_export("camp-1", "xlsx")
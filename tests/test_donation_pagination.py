@@ -0,0 +1,133 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models import donation
+
+
+class FakeCursor:
+    def __init__(self, rows, executed):
+        self.rows = rows
+        self.executed = executed
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, sql, params):
+        self.executed.append((sql, list(params)))
+        if "COUNT(*)" in sql:
+            self._result = [(len(self.rows),)]
+        else:
+            self._result = self.rows[: params[-1]]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+def _patch(monkeypatch, rows):
+    executed = []
+
+    class FakeConn:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *_exc):
+            return False
+
+        def cursor(self):
+            return FakeCursor(rows, executed)
+
+    monkeypatch.setattr(donation, "get_db_connection", lambda: FakeConn())
+    return executed
+
+
+def _rows(count):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for n in range(count, 0, -1):  # created_at desc
+        created = base + timedelta(minutes=n)
+        out.append(
+            (str(uuid.UUID(int=n)), "camp", 100, "usd", None, None, "succeeded")
+            + (None,) * 6
+            + (created, created, created)
+        )
+    return out
+
+
+def test_first_page_returns_next_cursor_and_seeks_from_it(monkeypatch):
+    rows = _rows(5)
+    executed = _patch(monkeypatch, rows)
+
+    first = donation.list_donations_paginated("camp", per_page=2)
+    assert [item["id"] for item in first["items"]] == [rows[0][0], rows[1][0]]
+    assert first["total"] == 5 and first["total_exact"] is True
+    assert first["prev_cursor"] is None and first["next_cursor"]
+    assert executed[0][0].startswith("SELECT COUNT(*)::int FROM donations")  # exact
+
+    executed.clear()
+    capped = donation.list_donations_paginated("camp", per_page=2, total="capped")
+    assert "LIMIT %s) t" in executed[0][0]
+    assert capped["total"] == 5 and capped["total_exact"] is True
+
+    executed.clear()
+    donation.list_donations_paginated(
+        "camp", per_page=2, cursor=first["next_cursor"], total="none"
+    )
+    ((sql, params),) = executed
+    assert "(created_at, id) < (%s, %s)" in sql
+    assert "OFFSET" not in sql
+    assert params[-3:] == [rows[1][-1].isoformat(), rows[1][0], 3]
+
+
+def test_prev_cursor_scans_backwards_and_restores_order(monkeypatch):
+    rows = _rows(3)
+    executed = _patch(monkeypatch, list(reversed(rows)))
+    cursor = donation._encode_cursor("created_at", "desc", "prev", "x", rows[2][0])
+
+    out = donation.list_donations_paginated(
+        "camp", per_page=2, cursor=cursor, total="none"
+    )
+
+    sql, _params = executed[0]
+    assert "(created_at, id) > (%s, %s)" in sql
+    assert "ORDER BY created_at ASC, id ASC" in sql
+    # Fetched ascending (oldest first), returned in the requested desc order.
+    assert [item["id"] for item in out["items"]] == [rows[1][0], rows[2][0]]
+    assert out["prev_cursor"] and out["next_cursor"]
+
+
+def test_rejects_tampered_or_mismatched_cursor(monkeypatch):
+    _patch(monkeypatch, [])
+    cursor = donation._encode_cursor(
+        "amount_cents", "desc", "next", 500, uuid.UUID(int=1)
+    )
+    with pytest.raises(ValueError):
+        donation.list_donations_paginated("camp", sort="created_at", cursor=cursor)
+    with pytest.raises(ValueError):
+        donation.list_donations_paginated("camp", cursor="not-a-cursor")
+
+
+def test_search_uses_trigram_predicates_and_ranks_by_relevance(monkeypatch):
+    rows = [r + (0.75,) for r in _rows(2)]
+    executed = _patch(monkeypatch, rows)
+
+    out = donation.list_donations_paginated(
+        "camp", search="  Jane_D ", sort="relevance", total="exact"
+    )
+
+    count_sql, count_params = executed[0]
+    assert "FROM donations, (SELECT %s::text AS term) s" in count_sql
+    assert count_params == ["jane_d", "camp", "%jane\\_d%", "%jane\\_d%"]
+    page_sql, _params = executed[1]
+    assert "lower(COALESCE(donor_email::text, '')) LIKE %s" in page_sql
+    assert "ORDER BY GREATEST(similarity(" in page_sql
+    assert out["items"][0]["relevance"] == 0.75
+    assert out["total"] == 2
@@ -0,0 +1,85 @@
+import httpx
+import pytest
+
+from app.utils import email_dispatcher as ed
+from app.utils import email_sender
+
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = ed.TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    # A cost above the burst is allowed and pushes later callers back.
+    assert bucket.reserve(5) == pytest.approx(0.6, abs=0.02)
+    assert ed.TokenBucket(rate=0).reserve(1000) == 0
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    slept = []
+    monkeypatch.setattr(ed.time, "sleep", slept.append)
+    monkeypatch.setenv("EMAIL_RATE_TESTP", "0")
+    monkeypatch.setattr(ed, "_buckets", {})
+    return slept
+
+
+def test_throttled_calls_are_retried_with_backoff(no_sleep):
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ed.EmailSendError("slow down", kind="throttled", retry_after=2)
+        return "ok"
+
+    assert ed.call_with_retries("testp", 1, call) == "ok"
+    assert len(attempts) == 3
+    assert len(no_sleep) == 2 and all(
+        2 <= s <= ed.EMAIL_BACKOFF_MAX_SECONDS for s in no_sleep
+    )
+
+
+def test_client_errors_are_not_retried(no_sleep):
+    attempts = []
+
+    def call():
+        attempts.append(1)
+        raise ed.EmailSendError("bad address", kind="client", status=400)
+
+    with pytest.raises(ed.EmailSendError):
+        ed.call_with_retries("testp", 1, call)
+    assert len(attempts) == 1 and not no_sleep
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = {ed.backoff_seconds(10) for _ in range(20)}
+    assert len(delays) > 1
+    assert all(0 <= d <= ed.EMAIL_BACKOFF_MAX_SECONDS for d in delays)
+
+
+def test_run_all_keeps_order_and_runs_nested_fan_out_inline():
+    dispatcher = ed.EmailDispatcher(max_workers=2, max_pending=4)
+
+    def nested(n):
+        return dispatcher.run_all([lambda: n, lambda: n + 1])
+
+    results = dispatcher.run_all([lambda n=n: nested(n) for n in range(0, 10, 2)])
+    assert results == [[n, n + 1] for n in range(0, 10, 2)]
+
+
+def test_sendgrid_429_maps_to_a_retryable_error(monkeypatch):
+    def handler(request):
+        assert request.headers["Authorization"] == "Bearer key"
+        return httpx.Response(429, headers={"Retry-After": "3"}, text="busy")
+
+    monkeypatch.setenv("SENDGRID_API_KEY", "key")
+    monkeypatch.setattr(
+        email_sender,
+        "_clients",
+        {"sendgrid": httpx.Client(transport=httpx.MockTransport(handler))},
+    )
+    with pytest.raises(ed.EmailSendError) as exc:
+        email_sender._sendgrid_post({"personalizations": []})
+    assert exc.value.kind == "throttled"
+    assert exc.value.retryable and exc.value.retry_after == 3
@@ -0,0 +1,73 @@
+import pytest
+from jinja2.exceptions import SecurityError
+
+from app.models import email_receipt, org_email_settings
+from app.utils import local_cache
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    store = {"org": {"receipt_subject": "Thanks, {{ donor_email }}"}}
+    fetches = []
+
+    def get_email_settings(org_id):
+        fetches.append(org_id)
+        return dict(store[org_id]) if org_id in store else None
+
+    monkeypatch.setattr(local_cache, "_caches", {})
+    monkeypatch.setattr(org_email_settings, "get_email_settings", get_email_settings)
+    monkeypatch.setattr(
+        email_receipt, "get_campaign", lambda cid: {"id": cid, "title": "Camp"}
+    )
+    return store, fetches
+
+
+def _donation(n):
+    return {
+        "id": f"d{n}",
+        "campaign_id": "c1",
+        "amount_cents": 1250,
+        "donor_email": f"<d{n}>@x.org",
+    }
+
+
+def test_repeated_renders_fetch_settings_and_compile_once(monkeypatch, settings):
+    _, fetches = settings
+    compiled = []
+    real_from_string = email_receipt._TEMPLATE_ENV.from_string
+    monkeypatch.setattr(
+        email_receipt._TEMPLATE_ENV,
+        "from_string",
+        lambda src: compiled.append(src) or real_from_string(src),
+    )
+
+    out = [email_receipt.render_receipt_content("org", _donation(n)) for n in range(3)]
+
+    assert fetches == ["org"]
+    assert len(compiled) == 3
+    # Autoescaped like Flask's render_template_string.
+    assert out[1]["subject"] == "Thanks, &lt;d1&gt;@x.org"
+    assert "$12.50" in out[0]["body_text"]
+
+
+def test_settings_change_invalidates_cached_templates(monkeypatch, settings):
+    store, fetches = settings
+    monkeypatch.setattr(local_cache, "r", lambda: None)  # no pub/sub here
+    assert email_receipt.render_receipt_content("org", _donation(1))["subject"] == (
+        "Thanks, &lt;d1&gt;@x.org"
+    )
+
+    store["org"]["receipt_subject"] = "Receipt {{ donation.id }}"
+    org_email_settings.invalidate_email_settings("org")
+
+    assert email_receipt.render_receipt_content("org", _donation(1))["subject"] == (
+        "Receipt d1"
+    )
+    assert fetches == ["org", "org"]
+
+
+def test_templates_cannot_reach_unsafe_attributes(settings):
+    store, _ = settings
+    store["org"]["receipt_subject"] = "{{ donor_email.__class__.__mro__ }}"
+    with pytest.raises(SecurityError):
+        email_receipt.render_receipt_content("org", _donation(1))
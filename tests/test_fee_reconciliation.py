@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+
+from app.services import fee_reconciliation_service as svc
+from app.utils.fake_stripe import FakeStripe
+
+
+def _donation(n, pi, created, *, fee_option="platform_absorbs"):
+    return {
+        "id": f"don_{n}",
+        "campaign_id": "camp_1",
+        "amount_cents": 10000,
+        "stripe_payment_intent_id": pi,
+        "stripe_balance_transaction_id": None,
+        "fee_option": fee_option,
+        "platform_fee_percent": 8.0,
+        "platform_fee_cents": 800,
+        "created_at": datetime.fromtimestamp(created, tz=timezone.utc),
+        "stripe_fee_checked_at": None,
+    }
+
+
+def _patch(monkeypatch, pending, settlement_status="pending"):
+    written = []
+    rebuilt = []
+    checked = []
+    monkeypatch.setattr(
+        svc, "list_unreconciled_fee_donations", lambda **_kwargs: list(pending)
+    )
+    monkeypatch.setattr(
+        svc,
+        "bulk_update_donation_fees",
+        lambda rows, page_size: written.append(list(rows)) or len(rows),
+    )
+    monkeypatch.setattr(
+        svc,
+        "get_campaign_settlement",
+        lambda _cid: {"status": settlement_status},
+    )
+    monkeypatch.setattr(svc, "build_campaign_settlement", rebuilt.append)
+    monkeypatch.setattr(
+        svc, "mark_donation_fees_checked", lambda ids, at: checked.append((ids, at))
+    )
+    monkeypatch.setattr(svc, "invalidate_campaign_progress_cache", lambda _cid: None)
+    monkeypatch.setattr(svc, "invalidate_public_campaign_cache", lambda _cid: None)
+    return written, rebuilt, checked
+
+
+def test_reconciles_actual_fees_across_pages_in_batches(monkeypatch):
+    stripe = FakeStripe()
+    base = 1_700_000_000
+    pending = [_donation(i, f"pi_{i}", base + i) for i in range(5)]
+    for i in range(5):
+        stripe.add_charge(
+            payment_intent=f"pi_{i}", amount=10000, fee=320 + i, created=base + i + 5
+        )
+    # Unrelated activity in the same window must be skipped.
+    stripe.add_charge(payment_intent="pi_other", amount=500, fee=45, created=base + 2)
+    written, rebuilt, checked = _patch(monkeypatch, pending)
+
+    monkeypatch.setattr(svc, "_CREATED_SLACK_SECONDS", 0)
+    out = svc.reconcile_stripe_fees(client=stripe, batch_size=2)
+
+    assert out == {"checked": 5, "matched": 5, "updated": 5, "campaigns": 1}
+    assert [len(batch) for batch in written] == [2, 2, 1]
+    rows = {row["id"]: row for batch in written for row in batch}
+    assert rows["don_3"]["stripe_processing_fee_cents"] == 323
+    assert rows["don_3"]["platform_absorbed_fee_cents"] == 323
+    assert rows["don_3"]["net_to_org_cents"] == 10000 - 800 - 323
+    assert rows["don_3"]["stripe_balance_transaction_id"].startswith("txn_fake_")
+    assert len(stripe.list_calls) >= 1
+    assert stripe.list_calls[0]["created"]["gte"] == base
+    assert rebuilt == ["camp_1"]
+    assert checked[0][0] == []  # every donation matched
+
+
+def test_next_run_lists_only_since_the_last_unmatched_search(monkeypatch):
+    stripe = FakeStripe()
+    base = 1_700_000_000
+    lost = _donation(1, None, base)  # no PI or BT: never matches
+    fresh = _donation(2, "pi_2", base + 5000)
+    stripe.add_charge(payment_intent="pi_2", amount=10000, fee=330, created=base + 5001)
+    _written, _rebuilt, checked = _patch(monkeypatch, [lost, fresh])
+
+    out = svc.reconcile_stripe_fees(client=stripe)
+    assert out["matched"] == 1
+    ((ids, searched_to),) = checked
+    assert ids == ["don_1"]
+
+    lost["stripe_fee_checked_at"] = searched_to
+    _patch(monkeypatch, [lost])
+    svc.reconcile_stripe_fees(client=stripe)
+    assert stripe.list_calls[-1]["created"]["gte"] == (
+        int(searched_to.timestamp()) - svc._CREATED_SLACK_SECONDS
+    )
+
+
+def test_paginates_until_all_donations_matched(monkeypatch):
+    stripe = FakeStripe()
+    base = 1_700_000_000
+    pending = [_donation(1, "pi_old", base)]
+    stripe.add_charge(payment_intent="pi_old", amount=10000, fee=330, created=base + 1)
+    for i in range(150):
+        stripe.add_charge(
+            payment_intent=f"pi_new_{i}", amount=100, fee=33, created=base + 10 + i
+        )
+    written, _rebuilt, _checked = _patch(monkeypatch, pending, settlement_status="paid")
+
+    out = svc.reconcile_stripe_fees(client=stripe)
+
+    assert out["matched"] == 1
+    assert len(stripe.list_calls) == 2
+    assert stripe.list_calls[1]["starting_after"] is not None
+    assert written[0][0]["stripe_processing_fee_cents"] == 330
+
+
+def test_skips_without_stripe_credentials(monkeypatch):
+    monkeypatch.setattr(svc, "STRIPE_SECRET", "")
+    assert svc.reconcile_stripe_fees() == {"skipped": "stripe not configured"}
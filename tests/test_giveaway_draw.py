@@ -0,0 +1,222 @@
+import hashlib
+import random
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services import giveaway_service as gs
+from app.utils.weighted_sampling import HashRandom, weighted_sample
+
+
+def test_weighted_sample_is_without_replacement_and_skips_zero_weights():
+    items = [("a", 0), ("b", 1), ("c", 5), ("d", 2)]
+    picked = weighted_sample(iter(items), 5, lambda i: i[1], rng=random.Random(1))
+    assert sorted(i[0] for i in picked) == ["b", "c", "d"]
+    assert weighted_sample(items, 0, lambda i: i[1]) == []
+
+
+def test_weighted_sample_odds_follow_weights():
+    rng = random.Random(42)
+    wins = Counter(
+        weighted_sample([("x", 1), ("y", 3)], 1, lambda i: i[1], rng=rng)[0][0]
+        for _ in range(4000)
+    )
+    assert 0.70 < wins["y"] / 4000 < 0.80
+
+
+def test_amount_weighting_caps_entries_and_drops_sub_unit_amounts():
+    entrants = [("d1", "a@x.org", 50), ("d2", "b@x.org", 250), ("d3", None, 10_000)]
+    result = gs.draw_from_entrants(
+        iter(entrants),
+        winners=3,
+        weighting="amount",
+        cents_per_entry=100,
+        max_entries=10,
+        rng=random.Random(7),
+    )
+    assert result["population_count"] == 2
+    assert result["total_entries"] == 12
+    entries = {w["donation_id"]: w["entries"] for w in result["winners"]}
+    assert entries == {"d2": 2, "d3": 10}
+
+
+def test_uniform_hash_matches_the_original_population_hash():
+    entrants = [("d1", None, 100), ("d2", None, 500)]
+    result = gs.draw_from_entrants(entrants, mode="per_donation", min_amount_cents=100)
+    expected = hashlib.sha256(b"per_donation|100|d1,d2").hexdigest()
+    assert result["population_hash"] == expected
+
+
+def test_hash_random_is_reproducible_from_its_seed():
+    a, b = HashRandom(b"seed"), HashRandom(b"seed")
+    assert [a.random() for _ in range(5)] == [b.random() for _ in range(5)]
+    assert HashRandom(b"other").random() != HashRandom(b"seed").random()
+    assert 0 <= a.getrandbits(70) < 2**70
+
+
+def _patch_campaign(monkeypatch, entrants):
+    logs = []
+    cutoff = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    monkeypatch.setattr(gs, "giveaway_population_cutoff", lambda: cutoff)
+    monkeypatch.setattr(
+        gs,
+        "get_campaign_by_id",
+        lambda cid: {"id": cid, "org_id": "org", "title": "Camp"},
+    )
+    monkeypatch.setattr(gs, "get_user_role_in_org", lambda uid, oid: "owner")
+    monkeypatch.setattr(
+        gs, "iter_giveaway_entrants", lambda cid, **kw: iter(list(entrants))
+    )
+    monkeypatch.setattr(gs, "get_donation", lambda did: None)
+    monkeypatch.setattr(gs, "send_winner_email", lambda *a, **kw: None)
+    monkeypatch.setattr(
+        gs,
+        "render_winner_contents",
+        lambda org, title, emails, **kw: [{}] * len(emails),
+    )
+    monkeypatch.setattr(
+        gs, "insert_giveaway_log", lambda **kw: logs.append(kw) or dict(kw)
+    )
+    commitments = {}
+
+    def create_commitment(**kw):
+        row = dict(
+            kw,
+            id=f"c{len(commitments)}",
+            population_cutoff=cutoff,
+            created_at=cutoff,
+            draw_id=None,
+            used_at=None,
+        )
+        commitments[row["id"]] = row
+        return dict(row)
+
+    def use_commitment(cid, commitment_id, draw_id):
+        row = commitments.get(commitment_id)
+        if not row or row["draw_id"]:
+            return None
+        row["draw_id"] = draw_id
+        return dict(row)
+
+    monkeypatch.setattr(gs, "create_giveaway_commitment", create_commitment)
+    monkeypatch.setattr(
+        gs,
+        "get_giveaway_commitment",
+        lambda cid, i: dict(commitments.get(i) or {}) or None,
+    )
+    monkeypatch.setattr(gs, "use_giveaway_commitment", use_commitment)
+    return logs
+
+
+def test_draw_multiple_winners_logs_one_row_per_winner(monkeypatch):
+    entrants = [(f"d{n}", f"u{n}@x.org", 100 * n) for n in range(1, 6)]
+    logs = _patch_campaign(monkeypatch, entrants)
+
+    status, payload = gs.draw_winner_for_campaign(
+        "camp", "user", winners=3, weighting="amount", max_entries=3
+    )
+
+    assert status == 200
+    assert [w["rank"] for w in payload["winners"]] == [1, 2, 3]
+    assert len({w["id"] for w in payload["winners"]}) == 3
+    assert payload["winner"] == payload["winners"][0]
+    assert payload["draw"]["total_entries"] == 1 + 2 + 3 + 3 + 3
+    assert [log["winner_rank"] for log in logs] == [1, 2, 3]
+    assert len({log["draw_id"] for log in logs}) == 1
+
+
+def test_failed_winner_insert_records_and_notifies_nothing(monkeypatch):
+    entrants = [(f"d{n}", f"u{n}@x.org", 100) for n in range(1, 6)]
+    logs = _patch_campaign(monkeypatch, entrants)
+    notified = []
+    monkeypatch.setattr(gs, "_notify_winners", lambda *a: notified.append(a))
+
+    def insert(**kw):
+        if kw["winner_rank"] == 2:
+            raise RuntimeError("insert failed")
+        logs.append(kw)
+        return dict(kw)
+
+    monkeypatch.setattr(gs, "insert_giveaway_log", insert)
+    with pytest.raises(RuntimeError):
+        gs.draw_winner_for_campaign("camp", "user", winners=3)
+    assert notified == []  # the draw rolled back, so nobody is told they won
+
+    monkeypatch.setattr(gs, "insert_giveaway_log", lambda **kw: dict(kw))
+    assert gs.draw_winner_for_campaign("camp", "user", winners=3)[0] == 200
+    assert len(notified) == 1 and len(notified[0][2]) == 3
+
+
+def test_draw_rejects_bad_options_before_reading_donations(monkeypatch):
+    _patch_campaign(monkeypatch, [])
+    assert gs.draw_winner_for_campaign("camp", "user", winners=0)[0] == 400
+    assert gs.draw_winner_for_campaign("camp", "user", weighting="x")[0] == 400
+    assert gs.draw_winner_for_campaign("camp", "user", mode="everyone")[0] == 400
+    status, payload = gs.draw_winner_for_campaign("camp", "user")
+    assert status == 400 and payload["error"] == "no eligible donations"
+
+
+def test_recorded_draw_replays_from_its_seed(monkeypatch):
+    entrants = [(f"d{n}", f"u{n}@x.org", 100 * n) for n in range(1, 50)]
+    logs = _patch_campaign(monkeypatch, entrants)
+    status, payload = gs.draw_winner_for_campaign(
+        "camp", "user", winners=3, weighting="amount"
+    )
+    assert status == 200
+    assert payload["draw"]["commitment"] is None and logs[0]["commitment_id"] is None
+    assert "seed" not in payload["draw"]
+
+    monkeypatch.setattr(gs, "get_giveaway_draw", lambda cid, did: logs)
+    status, report = gs.verify_giveaway_draw("camp", logs[0]["draw_id"], "user")
+    assert status == 200
+    assert report["verified"] is True
+    assert report["population_changed_since_draw"] is False
+
+    # A donation dropped from the population since is detected.
+    del entrants[10]
+    status, report = gs.verify_giveaway_draw("camp", logs[0]["draw_id"], "user")
+    assert report["verified"] is False
+    assert report["checks"]["population_hash"] is False
+    assert report["population_changed_since_draw"] is True
+
+
+def test_committed_seed_is_published_before_and_revealed_after_the_draw(
+    monkeypatch,
+):
+    entrants = [(f"d{n}", f"u{n}@x.org", 100 * n) for n in range(1, 50)]
+    logs = _patch_campaign(monkeypatch, entrants)
+
+    status, commitment = gs.commit_giveaway_seed("camp", "user")
+    assert status == 201
+    assert commitment["seed"] is None and commitment["draw_id"] is None
+    public = gs.get_giveaway_commitment_public("camp", commitment["id"])[1]
+    assert public["seed"] is None
+    assert public["seed_sha256"] == commitment["seed_sha256"]
+
+    status, payload = gs.draw_winner_for_campaign(
+        "camp", "user", winners=2, commitment_id=commitment["id"]
+    )
+    assert status == 200
+    revealed = gs.get_giveaway_commitment_public("camp", commitment["id"])[1]
+    assert revealed["draw_id"] == payload["draw"]["id"]
+    assert hashlib.sha256(bytes.fromhex(revealed["seed"])).hexdigest() == (
+        commitment["seed_sha256"]
+    )
+    assert logs[0]["seed_hex"] == revealed["seed"]
+
+    monkeypatch.setattr(gs, "get_giveaway_draw", lambda cid, did: logs)
+    status, report = gs.verify_giveaway_draw("camp", payload["draw"]["id"], "user")
+    assert report["verified"] is True and report["checks"]["commitment"] is True
+
+    status, _ = gs.draw_winner_for_campaign(
+        "camp", "user", commitment_id=commitment["id"]
+    )
+    assert status == 409  # a commitment drives one draw only
+
+
+def test_verify_refuses_draws_without_a_recorded_seed(monkeypatch):
+    _patch_campaign(monkeypatch, [])
+    legacy = {"mode": "per_donation", "seed_hex": None, "draw_algorithm": None}
+    monkeypatch.setattr(gs, "get_giveaway_draw", lambda cid, did: [legacy])
+    assert gs.verify_giveaway_draw("camp", "draw", "user")[0] == 409
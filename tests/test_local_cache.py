@@ -0,0 +1,62 @@
+import json
+
+from app.utils import local_cache
+from app.utils.local_cache import LocalCache
+
+
+def test_lru_evicts_least_recently_used_within_limits():
+    cache = LocalCache("t", max_entries=2, max_bytes=10_000, ttl_seconds=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a becomes most recent
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+    small = LocalCache("t2", max_entries=100, max_bytes=200, ttl_seconds=60)
+    small.set("x", b"x" * 100)
+    small.set("y", b"y" * 100)
+    assert len(small) == 1 and small.get("y") is not None
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+    cache = LocalCache("t", max_entries=10, ttl_seconds=5)
+    cache.set("k", "v")
+    now[0] += 4.9
+    assert cache.get("k") == "v"
+    now[0] += 0.2
+    assert cache.get("k") is None
+
+
+def test_fill_racing_an_invalidation_is_dropped():
+    cache = LocalCache("t", max_entries=10, ttl_seconds=60)
+    epoch = cache.epoch()
+    cache.delete("k")  # an update lands while the old value is being loaded
+    cache.set("k", "old", epoch=epoch)
+    assert cache.get("k") is None
+
+
+def test_broadcast_invalidation_drops_key_in_other_processes(monkeypatch):
+    monkeypatch.setattr(local_cache, "_caches", {})
+    published = []
+    monkeypatch.setattr(
+        local_cache,
+        "r",
+        lambda: type("R", (), {"publish": lambda _s, ch, msg: published.append(msg)})(),
+    )
+    cache = local_cache.local_cache("progress")
+    cache.set("c1", {"total": 1})
+
+    local_cache.invalidate_local("progress", "c1")
+    assert cache.get("c1") is None
+    msg = json.loads(published[0])
+    assert msg["cache"] == "progress" and msg["key"] == "c1"
+
+    # Another process receiving the message.
+    cache.set("c1", {"total": 2})
+    local_cache.handle_invalidation_message(json.dumps({**msg, "origin": "other"}))
+    assert cache.get("c1") is None
@@ -0,0 +1,69 @@
+import pytest
+
+from app.services import outbox_service as outbox
+
+
+@pytest.fixture
+def store(monkeypatch):
+    state = {"rows": [], "done": [], "failed": [], "delivered": []}
+
+    def insert(events):
+        events = list(events)
+        for kind, payload in events:
+            state["rows"].append(
+                {
+                    "id": len(state["rows"]) + 1,
+                    "kind": kind,
+                    "payload": payload,
+                    "attempts": 0,
+                }
+            )
+        return len(events)
+
+    def claim(limit, lease):
+        claimed = [
+            r for r in state["rows"] if r["id"] not in state["done"] + state["failed"]
+        ][:limit]
+        for r in claimed:
+            r["attempts"] += 1
+        return [dict(r) for r in claimed]
+
+    def failure(event_id, error, *, max_attempts, retry_in_seconds):
+        state["failed"].append(event_id)
+        return "pending"
+
+    monkeypatch.setattr(outbox, "insert_outbox_events", insert)
+    monkeypatch.setattr(outbox, "claim_outbox_events", claim)
+    monkeypatch.setattr(outbox, "mark_outbox_events_done", state["done"].extend)
+    monkeypatch.setattr(outbox, "record_outbox_failure", failure)
+    monkeypatch.setattr(outbox, "_dispatcher_started", False)
+    monkeypatch.setitem(
+        outbox.OUTBOX_HANDLERS,
+        "campaign_caches",
+        lambda p: state["delivered"].append(("caches", p["campaign_id"])),
+    )
+    return state
+
+
+def test_side_effects_are_delivered_after_commit_with_coalescing(store):
+    # Outside a unit of work after_commit runs at once, so this drains inline.
+    outbox.add_side_effects(
+        [("campaign_caches", {"campaign_id": "c1"})] * 3
+        + [("campaign_caches", {"campaign_id": "c2"})]
+    )
+    assert store["delivered"] == [("caches", "c1"), ("caches", "c2")]
+    assert store["done"] == [1, 2, 3, 4]
+
+
+def test_failed_delivery_is_retried_not_lost(monkeypatch, store):
+    def broken(payload):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setitem(outbox.OUTBOX_HANDLERS, "socket_emit", broken)
+    store["rows"].append({"id": 1, "kind": "socket_emit", "payload": {}, "attempts": 0})
+    store["rows"].append({"id": 2, "kind": "unknown", "payload": {}, "attempts": 0})
+
+    counts = outbox.dispatch_outbox_batch()
+
+    assert counts == {"claimed": 2, "delivered": 0, "retrying": 2, "dead": 0}
+    assert store["failed"] == [1, 2] and store["done"] == []
@@ -0,0 +1,131 @@
+import gzip
+import json
+
+from flask import Flask
+
+from app.utils import local_cache
+from app.utils import public_campaign_cache as pcc
+
+
+def _setup(monkeypatch, redis):
+    monkeypatch.setattr(pcc, "r_bytes", lambda: redis)
+    monkeypatch.setattr(local_cache, "r", lambda: redis)
+    monkeypatch.setattr(local_cache, "_caches", {})
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"id": "c1", "total_raised": float(len(builds))}
+
+    return redis, builds, build
+
+
+def test_miss_builds_once_then_hits(monkeypatch, fake_redis):
+    _redis, builds, build = _setup(monkeypatch, fake_redis)
+
+    first = pcc.get_public_campaign_entry("c1", build)
+    second = pcc.get_public_campaign_entry("c1", build, encoding="gzip")
+
+    assert json.loads(first["identity"]) == {"id": "c1", "total_raised": 1.0}
+    assert gzip.decompress(second["gzip"]) == first["identity"]
+    assert second["etag"] == first["etag"]
+    assert len(builds) == 1
+
+
+def test_invalidate_serves_stale_while_lease_is_held_elsewhere(monkeypatch, fake_redis):
+    redis, builds, build = _setup(monkeypatch, fake_redis)
+    pcc.get_public_campaign_entry("c1", build)
+
+    pcc.invalidate_public_campaign_cache("c1")
+    assert pcc._cache_key("c1") in redis.store  # version bump, not a delete
+
+    redis.store[pcc._lease_key("c1")] = "other-worker"
+    stale = pcc.get_public_campaign_entry("c1", build)
+    assert json.loads(stale["identity"])["total_raised"] == 1.0
+    assert len(builds) == 1
+
+    del redis.store[pcc._lease_key("c1")]
+    fresh = pcc.get_public_campaign_entry("c1", build)
+    assert json.loads(fresh["identity"])["total_raised"] == 2.0
+    assert len(builds) == 2
+    assert pcc._lease_key("c1") not in redis.store
+    assert len(redis.published) == 1  # other processes drop their L1 copy
+
+
+def test_rebuild_that_finds_no_campaign_drops_the_stale_entry(monkeypatch, fake_redis):
+    redis, _builds, build = _setup(monkeypatch, fake_redis)
+    monkeypatch.setattr(pcc, "PUBLIC_MISS_WAIT_SECONDS", 0)
+    pcc.get_public_campaign_entry("c1", build)
+
+    pcc.invalidate_public_campaign_cache("c1")
+    assert pcc.get_public_campaign_entry("c1", lambda: None) is None
+    assert pcc._cache_key("c1") not in redis.store
+
+    redis.store[pcc._lease_key("c1")] = "other-worker"
+    assert pcc.get_public_campaign_entry("c1", lambda: None) is None
+
+
+def test_invalidation_during_rebuild_keeps_entry_stale(monkeypatch, fake_redis):
+    redis, builds, _build = _setup(monkeypatch, fake_redis)
+
+    def racing_build():
+        builds.append(1)
+        pcc.invalidate_public_campaign_cache("c1")
+        return {"id": "c1", "n": len(builds)}
+
+    pcc.get_public_campaign_entry("c1", racing_build)
+    pcc.get_public_campaign_entry("c1", racing_build)
+
+    assert len(builds) == 2
+
+
+def test_response_serves_stored_variant_and_304_from_etag(monkeypatch, fake_redis):
+    _redis, builds, build = _setup(monkeypatch, fake_redis)
+    app = Flask(__name__)
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        resp = pcc.respond_public_campaign_json("c1", build)
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(resp.get_data())) == {
+        "id": "c1",
+        "total_raised": 1.0,
+    }
+    etag = resp.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    with app.test_request_context(
+        headers={"If-None-Match": f'"old", W/{etag}', "Accept-Encoding": "gzip"}
+    ):
+        not_modified = pcc.respond_public_campaign_json("c1", build)
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+    assert not_modified.headers["ETag"] == etag
+
+    # The gzip validator does not match the identity body.
+    with app.test_request_context(headers={"If-None-Match": etag}):
+        identity = pcc.respond_public_campaign_json("c1", build)
+    assert identity.status_code == 200
+    assert identity.headers["ETag"] == etag.replace('-gzip"', '"')
+    assert "Content-Encoding" not in identity.headers
+    assert len(builds) == 1
+
+
+def test_l1_serves_hot_payload_without_redis(monkeypatch, fake_redis):
+    redis, builds, build = _setup(monkeypatch, fake_redis)
+    pcc.get_public_campaign_entry("c1", build)
+
+    def unreachable():
+        raise AssertionError("redis should not be consulted")
+
+    monkeypatch.setattr(pcc, "r_bytes", unreachable)
+    hit = pcc.get_public_campaign_entry("c1", build, encoding="gzip")
+    assert gzip.decompress(hit["gzip"]) == hit["identity"]
+    assert len(builds) == 1
+
+    local_cache.handle_invalidation_message(
+        json.dumps({"cache": pcc.L1_NAME, "key": "c1", "origin": "other"})
+    )
+    monkeypatch.setattr(pcc, "r_bytes", lambda: redis)
+    pcc.get_public_campaign_entry("c1", build)
+    assert len(redis.published) == 0
@@ -0,0 +1,92 @@
+from flask import Flask
+
+from app.routes import core_routes
+from app.utils import local_cache
+from app.utils import public_campaign_cache as pcc
+from app.utils import public_resolver as resolver
+
+
+def _setup(monkeypatch, redis, orgs=None, campaigns=None):
+    monkeypatch.setattr(resolver, "r", lambda: redis)
+    monkeypatch.setattr(local_cache, "r", lambda: redis)
+    monkeypatch.setattr(local_cache, "_caches", {})
+    loads = []
+    orgs = orgs if orgs is not None else {"demo": "org-1"}
+    campaigns = campaigns if campaigns is not None else {("org-1", "walk"): "c1"}
+
+    def load_org(subdomain):
+        loads.append(("org", subdomain))
+        return orgs.get(subdomain)
+
+    def load_campaign(org_id, slug):
+        loads.append(("campaign", org_id, slug))
+        return campaigns.get((org_id, slug))
+
+    monkeypatch.setattr(resolver, "_load_org_id", load_org)
+    monkeypatch.setattr(resolver, "_load_campaign_id", load_campaign)
+    return redis, loads
+
+
+def test_resolution_is_cached_in_redis_and_l1(monkeypatch, fake_redis):
+    redis, loads = _setup(monkeypatch, fake_redis)
+
+    assert resolver.resolve_public_campaign("demo", "walk") == ("org-1", "c1")
+    assert len(loads) == 2
+    assert resolver.resolve_public_campaign("demo", "walk") == ("org-1", "c1")
+
+    local_cache.clear_all_local_caches()  # another process: Redis only
+    assert resolver.resolve_public_campaign("demo", "walk") == ("org-1", "c1")
+    assert len(loads) == 2
+
+
+def test_unknown_subdomain_is_negatively_cached(monkeypatch, fake_redis):
+    redis, loads = _setup(monkeypatch, fake_redis)
+
+    for _ in range(3):
+        assert resolver.resolve_public_campaign("wp-admin", "x") == (None, None)
+    assert loads == [("org", "wp-admin")]
+    assert redis.store[resolver._subdomain_key("wp-admin")] == ""
+
+
+def test_invalidation_tombstone_blocks_racing_fill(monkeypatch, fake_redis):
+    orgs = {"demo": "org-1"}
+    redis, loads = _setup(monkeypatch, fake_redis, orgs=orgs)
+    assert resolver.resolve_org_id("demo") == "org-1"
+
+    orgs.pop("demo")  # subdomain renamed
+    resolver.invalidate_org_subdomain("demo")
+    assert redis.published  # other processes drop their L1 copy
+
+    # A request that read the old row before the change commits its fill now.
+    redis.set(resolver._subdomain_key("demo"), "org-1", nx=True)
+    assert resolver.resolve_org_id("demo") is None
+    assert resolver.resolve_org_id("demo") is None
+    assert loads.count(("org", "demo")) == 3  # uncached while tombstoned
+
+
+def test_cached_public_hit_needs_no_database(monkeypatch, fake_redis):
+    redis, loads = _setup(monkeypatch, fake_redis)
+    monkeypatch.setattr(pcc, "r_bytes", lambda: redis)
+    builds = []
+
+    def fake_load(cid):
+        builds.append(cid)
+        return {"id": cid, "total_raised": 5.0}
+
+    monkeypatch.setattr(core_routes, "load_public_campaign", fake_load)
+    app = Flask(__name__)
+    with app.test_request_context():
+        first = core_routes.campaign_public_no_subdomain("demo", "walk")
+    assert first.status_code == 200
+
+    def no_db(*_args, **_kwargs):
+        raise AssertionError("database queried on a cached hit")
+
+    monkeypatch.setattr(resolver, "_load_org_id", no_db)
+    monkeypatch.setattr(resolver, "_load_campaign_id", no_db)
+    monkeypatch.setattr(core_routes, "load_public_campaign", no_db)
+    with app.test_request_context():
+        second = core_routes.campaign_public_no_subdomain("demo", "walk")
+    assert second.status_code == 200
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert builds == ["c1"]
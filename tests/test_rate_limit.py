@@ -0,0 +1,43 @@
+import pytest
+
+from app.utils import rate_limit as rl
+
+
+@pytest.fixture
+def local_only(monkeypatch):
+    def unavailable():
+        raise ConnectionError("redis down")
+
+    clock = [1_000_000 * 60.0]  # the start of a 60s window
+    monkeypatch.setattr(rl, "_sliding_window_script", unavailable)
+    monkeypatch.setattr(rl, "_counters", {})
+    monkeypatch.setattr(rl.time, "time", lambda: clock[0])
+    return clock
+
+
+def test_limit_counts_down_and_reports_when_to_retry(local_only):
+    results = [rl.check_rate_limit("ip", 3) for _ in range(4)]
+    assert [res.remaining for res in results] == [2, 1, 0, 0]
+    assert [res.limited for res in results] == [False, False, False, True]
+    assert results[0].reset_after == 60
+    # Three requests in this window: one more fits once the window rolls
+    # over and a third of it has passed (3 * 2/3 = 2 < 3).
+    assert results[3].retry_after == pytest.approx(80)
+    assert rl.rate_limit_headers(results[3]) == {
+        "X-RateLimit-Limit": "3",
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Reset": "80",
+        "Retry-After": "80",
+    }
+
+
+def test_previous_window_is_weighted_by_how_much_of_it_overlaps(local_only):
+    for _ in range(4):
+        rl.check_rate_limit("ip", 4)
+    local_only[0] += 60 + 15  # previous window still counts 4 * 45/60 = 3
+    assert rl.check_rate_limit("ip", 4).remaining == 0
+    limited = rl.check_rate_limit("ip", 4)
+    assert limited.limited
+    assert limited.retry_after == pytest.approx(15)  # until 4 * 30/60 + 1 <= 3
+    local_only[0] += 15
+    assert not rl.is_rate_limited("ip", 4)
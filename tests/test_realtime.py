@@ -0,0 +1,256 @@
+from app import realtime
+
+
+def test_broadcast_outside_web_process_publishes_write_only(monkeypatch):
+    monkeypatch.setattr(realtime, "MESSAGE_QUEUE", "redis://127.0.0.1:6379/15")
+    monkeypatch.setattr(realtime, "_external", None)
+    emitter = realtime.get_emitter()
+    published = []
+    monkeypatch.setattr(
+        emitter.server.manager,
+        "_publish",
+        lambda data: published.append(data),
+    )
+
+    realtime.broadcast("donation", {"amount": 5}, room="campaign:c1")
+
+    assert emitter is not realtime.socketio and emitter.server.manager.write_only
+    assert published[0]["event"] == "donation"
+    assert published[0]["room"] == "campaign:c1"
+    assert published[0]["data"] == [{"amount": 5}]
+
+
+def test_broadcast_without_queue_or_server_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(realtime, "MESSAGE_QUEUE", "")
+    monkeypatch.setattr(realtime, "_external", None)
+    emitted = []
+    monkeypatch.setattr(
+        realtime.socketio, "emit", lambda *a, **kw: emitted.append((a, kw))
+    )
+
+    realtime.broadcast("donation", {}, room="campaign:c1")
+
+    assert realtime.get_emitter() is realtime.socketio
+    assert emitted == []
+    assert realtime._external is None  # no write-only publisher was created
+
+
+class FakeAggregatorRedis:
+    """Runs the aggregator's Lua scripts in Python, on a clock in ms."""
+
+    def __init__(self):
+        self.now = 100_000
+        self.lists, self.hashes, self.strings, self.expires = {}, {}, {}, {}
+        self.due = {}
+
+    def register_script(self, source):
+        from app.realtime import aggregator
+
+        add = aggregator._ADD_LUA in source
+        return lambda keys, args: self._run(add, keys, [str(a) for a in args])
+
+    def _run(self, add, keys, argv):
+        items, meta, slot, floor, due = keys
+        if add:
+            self.lists[items] = (self.lists.get(items, []) + [argv[2]])[-int(argv[5]) :]
+            h = self.hashes.setdefault(meta, {})
+            h["count"] = str(int(h.get("count", 0)) + 1)
+            h.setdefault("first", str(self.now))
+            if argv[3]:
+                h["state"] = argv[3]
+            if argv[4] and float(argv[4]) >= float(self.strings.get(floor, "-inf")):
+                self.strings[floor] = argv[4]
+        if not self.lists.get(items):
+            self.due.pop(argv[1], None)
+            return [0]
+        if self.expires.get(slot, 0) <= self.now:
+            self.expires[slot] = self.now + int(argv[0])
+            h = self.hashes.pop(meta)
+            self.due.pop(argv[1], None)
+            return [
+                1,
+                self.lists.pop(items),
+                h["count"],
+                h["first"],
+                h.get("state", ""),
+                self.strings.get(floor, ""),
+                self.now,
+            ]
+        self.due[argv[1]] = self.expires[slot]
+        return [0]
+
+    def zrangebyscore(self, _key, _min, max, start, num):
+        return [room for room, at in self.due.items() if at <= max][start:num]
+
+
+def test_aggregator_caps_frames_per_room_across_instances(monkeypatch):
+    from app.realtime import aggregator
+
+    redis = FakeAggregatorRedis()
+    monkeypatch.setattr(aggregator, "r", lambda: redis)
+    monkeypatch.setattr(aggregator, "_scripts", {})
+    monkeypatch.setattr(aggregator.time, "time", lambda: redis.now / 1000.0)
+    sent = []
+
+    def instance():
+        return aggregator.RoomAggregator(
+            "donation",
+            aggregator._donation_frame,
+            window_seconds=0.5,
+            max_batch=3,
+            monotonic="total_raised",
+            emit=lambda event, frame, room: sent.append((room, frame)),
+        )
+
+    web, worker = instance(), instance()
+
+    worker.add("campaign:a", {"amount": 1}, {"total_raised": 1})
+    assert len(sent) == 1  # a quiet room is sent at once
+    for n in (2, 3, 4, 6):
+        web.add("campaign:a", {"amount": n}, {"total_raised": n})
+    # Processed late on the worker: must not pull the total back.
+    worker.add("campaign:a", {"amount": 5}, {"total_raised": 5})
+    web.add("campaign:b", {"amount": 9}, {"total_raised": 9})
+    assert len(sent) == 2 and sent[-1][0] == "campaign:b"
+    assert web.flush() == 0 and worker.flush() == 0  # campaign:a's window is open
+
+    redis.now += 500
+    assert worker.flush() == 1 and web.flush() == 0
+    room, frame = sent[-1]
+    assert room == "campaign:a"
+    assert frame["count"] == 5 and frame["total_raised"] == 6
+    assert [d["amount"] for d in frame["donations"]] == [4, 6, 5]
+    assert frame["amount"] == 5
+
+
+def test_aggregator_sends_alone_when_redis_is_down(monkeypatch):
+    from app.realtime import aggregator
+
+    def down(_source):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(aggregator, "_script", down)
+    sent = []
+    agg = aggregator.RoomAggregator(
+        "donation",
+        aggregator._donation_frame,
+        window_seconds=0.5,
+        max_batch=3,
+        emit=lambda event, frame, room: sent.append((room, frame)),
+    )
+
+    agg.add("campaign:a", {"amount": 1}, {"total_raised": 1})
+    agg.add("campaign:a", {"amount": 2}, {"total_raised": 3})
+
+    assert [frame["count"] for _, frame in sent] == [1, 1]
+    assert sent[-1][1]["total_raised"] == 3
+
+
+class FakePipeline:
+    def __init__(self, seq, entries):
+        self.seq, self.entries = seq, entries
+
+    def get(self, key):
+        pass
+
+    def xrange(self, key, min, max, count):
+        self.start = int(min.split("-")[0])
+        self.count = count
+
+    def execute(self):
+        entries = [e for e in self.entries if int(e[0].split("-")[0]) >= self.start]
+        return [str(self.seq), entries[: self.count]]
+
+
+def _stream(monkeypatch, seq, first):
+    from app.realtime import stream
+
+    entries = [
+        (f"{n}-0", {"e": "donation", "d": f'{{"amount": {n}}}'})
+        for n in range(first, seq + 1)
+    ]
+    fake = type("R", (), {"pipeline": lambda self, **kw: FakePipeline(seq, entries)})
+    monkeypatch.setattr(stream, "r", lambda: fake())
+    return stream
+
+
+def test_events_since_replays_the_gap_or_asks_for_a_snapshot(monkeypatch):
+    stream = _stream(monkeypatch, seq=10, first=6)
+
+    missed, seq = stream.events_since("campaign:c1", 7)
+    assert seq == 10
+    assert missed == [("donation", {"amount": n, "seq": n}) for n in (8, 9, 10)]
+    assert stream.events_since("campaign:c1", 10) == ([], 10)
+    assert stream.events_since("campaign:c1", 3)[0] is None  # trimmed
+    assert stream.events_since("campaign:c1", 12)[0] is None  # log was reset
+
+
+def test_join_sends_missed_events_or_a_snapshot(monkeypatch):
+    from app.services import campaign_progress_service as cps
+
+    _stream(monkeypatch, seq=10, first=6)
+    sent = []
+    monkeypatch.setattr(realtime, "emit", lambda event, data: sent.append(event))
+    monkeypatch.setattr(cps, "get_campaign_progress", lambda cid: {"percent": 50.0})
+    monkeypatch.setattr(cps, "get_recent_donations", lambda cid: [])
+
+    resumed = realtime._join_payload("c1", "campaign:c1", 8)
+    assert resumed == {"room": "campaign:c1", "seq": 10, "resumed": True}
+    assert sent == ["donation", "donation"]
+
+    fresh = realtime._join_payload("c1", "campaign:c1", 2)
+    assert fresh["seq"] == 10 and not fresh["resumed"]
+    assert fresh["snapshot"] == {"progress": {"percent": 50.0}, "recent_donations": []}
+
+
+class FakeHashRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.ops = []
+
+    def pipeline(self, **kw):
+        return self
+
+    def hset(self, key, field, value):
+        self.ops.append(lambda: self.hashes.setdefault(key, {}).update({field: value}))
+
+    def hdel(self, key, *fields):
+        self.ops.append(lambda: [self.hashes.get(key, {}).pop(f, None) for f in fields])
+
+    def expire(self, key, ttl):
+        self.ops.append(lambda: True)
+
+    def hgetall(self, key):
+        self.ops.append(lambda: dict(self.hashes.get(key, {})))
+
+    def execute(self):
+        ops, self.ops = self.ops, []
+        return [op() for op in ops]
+
+
+def test_viewer_counts_sum_fresh_instances_and_drop_dead_ones(monkeypatch):
+    from app.realtime import presence as pr
+
+    redis = FakeHashRedis()
+    monkeypatch.setattr(pr, "r", lambda: redis)
+    now = pr.time.time()
+    redis.hashes["rt:viewers:campaign:a"] = {
+        "other": f"4:{int(now)}",
+        "dead": f"9:{int(now - pr.VIEWER_STALE_SECONDS - 5)}",
+    }
+
+    here = pr.RoomPresence("here")
+    here.join("s1", "campaign:a")
+    here.join("s1", "campaign:a")  # a repeated join counts once
+    here.join("s2", "campaign:a")
+    here.join("s2", "campaign:b")
+    here.leave("s2", "campaign:b")
+    assert here.local_count("campaign:a") == 2
+
+    assert here.heartbeat() == {"campaign:a": 6}
+    assert set(redis.hashes["rt:viewers:campaign:a"]) == {"other", "here"}
+
+    here.disconnect("s1")
+    here.disconnect("s2")
+    assert here.heartbeat() == {}
+    assert set(redis.hashes["rt:viewers:campaign:a"]) == {"other"}
@@ -0,0 +1,147 @@
+import contextlib
+import json
+
+from app.services import webhook_service
+from app.services.webhook_service import (
+    ingest_stripe_event,
+    process_pending_stripe_events,
+)
+
+
+def _queue(monkeypatch, events, *, fail=()):
+    state = {"pending": list(events), "handled": [], "enqueued": [], "failures": []}
+
+    def next_pending(_key):
+        if not state["pending"]:
+            return None
+        return dict(state["pending"][0])
+
+    def processed(event_id):
+        assert state["pending"][0]["event_id"] == event_id
+        state["pending"].pop(0)
+
+    def handle(ev_type, obj):
+        if obj["id"] in fail:
+            raise RuntimeError("stripe api down")
+        state["handled"].append(obj["id"])
+        return {"ok": True}
+
+    def failure(event_id, error, *, max_attempts, retry_in_seconds):
+        state["failures"].append((event_id, retry_in_seconds))
+        head = state["pending"][0]
+        if head["attempts"] + 1 >= max_attempts:
+            state["pending"].pop(0)
+            return {"status": "dead", "attempts": head["attempts"] + 1}
+        return {"status": "pending", "attempts": head["attempts"] + 1}
+
+    monkeypatch.setattr(webhook_service, "unit_of_work", contextlib.nullcontext)
+    monkeypatch.setattr(webhook_service, "try_lock_ordering_key", lambda _key: True)
+    monkeypatch.setattr(webhook_service, "get_next_pending_event", next_pending)
+    monkeypatch.setattr(webhook_service, "mark_pending_event_processed", processed)
+    monkeypatch.setattr(webhook_service, "handle_stripe_event", handle)
+    monkeypatch.setattr(webhook_service, "record_event_failure", failure)
+    monkeypatch.setattr(
+        webhook_service,
+        "enqueue_stripe_event_processing",
+        lambda key, delay_seconds=0: state["enqueued"].append((key, delay_seconds))
+        or True,
+    )
+    return state
+
+
+def _event(event_id, obj_id, attempts=0):
+    return {
+        "event_id": event_id,
+        "type": "payment_intent.succeeded",
+        "raw": {"type": "payment_intent.succeeded", "data": {"object": {"id": obj_id}}},
+        "ordering_key": "pi_1",
+        "attempts": attempts,
+        "created_at": None,
+        "due": True,
+        "next_attempt_at": None,
+    }
+
+
+def test_drains_events_for_key_in_order(monkeypatch):
+    state = _queue(monkeypatch, [_event("evt_1", "a"), _event("evt_2", "b")])
+
+    out = process_pending_stripe_events("pi_1")
+
+    assert out == {"processed": 2, "dead": 0, "state": "drained"}
+    assert state["handled"] == ["a", "b"]
+    assert state["enqueued"] == []
+
+
+def test_locked_key_returns_busy_without_waiting(monkeypatch):
+    state = _queue(monkeypatch, [_event("evt_1", "a")])
+    monkeypatch.setattr(webhook_service, "try_lock_ordering_key", lambda _key: False)
+
+    out = process_pending_stripe_events("pi_1")
+
+    assert out == {"processed": 0, "dead": 0, "state": "busy"}
+    assert state["handled"] == [] and state["enqueued"] == []
+
+
+def test_failed_event_blocks_key_and_schedules_retry(monkeypatch):
+    state = _queue(
+        monkeypatch, [_event("evt_1", "a"), _event("evt_2", "b")], fail={"a"}
+    )
+
+    out = process_pending_stripe_events("pi_1")
+
+    assert out["state"] == "retrying"
+    assert state["handled"] == []
+    assert [f[0] for f in state["failures"]] == ["evt_1"]
+    assert state["enqueued"][0][0] == "pi_1"
+    assert state["enqueued"][0][1] > 0
+
+
+def test_exhausted_event_is_dead_lettered_and_key_continues(monkeypatch):
+    monkeypatch.setattr(webhook_service, "STRIPE_EVENT_MAX_ATTEMPTS", 3)
+    state = _queue(
+        monkeypatch,
+        [_event("evt_1", "a", attempts=2), _event("evt_2", "b")],
+        fail={"a"},
+    )
+
+    out = process_pending_stripe_events("pi_1")
+
+    assert out == {"processed": 1, "dead": 1, "state": "drained"}
+    assert state["handled"] == ["b"]
+
+
+def test_ingest_persists_and_enqueues_without_processing(monkeypatch):
+    stored = []
+    enqueued = []
+    monkeypatch.setattr(
+        webhook_service,
+        "insert_pending_event",
+        lambda *args, **kwargs: stored.append((args, kwargs)) or True,
+    )
+    monkeypatch.setattr(
+        webhook_service,
+        "enqueue_stripe_event_processing",
+        lambda key, delay_seconds=0: enqueued.append(key) or True,
+    )
+    monkeypatch.setattr(
+        webhook_service,
+        "handle_stripe_event",
+        lambda *_a, **_k: (_ for _ in ()).throw(AssertionError("processed inline")),
+    )
+    payload = {
+        "id": "evt_9",
+        "created": 1700000000,
+        "type": "charge.refunded",
+        "data": {"object": {"id": "ch_1", "payment_intent": "pi_9"}},
+    }
+
+    status, body = ingest_stripe_event(
+        json.dumps(payload).encode("utf-8"), sig_header=None
+    )
+
+    assert status == 200
+    assert body == {"ok": True, "queued": True}
+    assert stored[0][0][0] == "evt_9"
+    assert stored[0][1]["ordering_key"] == "pi_9"
+    assert stored[0][1]["event_created"] == 1700000000
+    assert enqueued == ["pi_9"]
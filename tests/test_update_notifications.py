@@ -0,0 +1,216 @@
+import sys
+import types
+
+import pytest
+
+from app.services import update_notification_service as svc
+from app.utils import email_dispatcher, email_sender
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    monkeypatch.setenv("EMAIL_PROVIDER", "fake")
+    email_sender.FAKE_OUTBOX.clear()
+    yield email_sender.FAKE_OUTBOX
+    email_sender.FAKE_OUTBOX.clear()
+
+
+def test_fake_bulk_send_records_one_message_per_recipient(fake_provider):
+    to = [f"d{n}@example.com" for n in range(250)]
+    result = email_sender.send_bulk_email(to_emails=to, subject="Hi", body_text="Body")
+    assert result["provider"] == "fake"
+    assert result["sent"] == to and not result["failed"]
+    # Batches run concurrently, so the outbox is in no particular order.
+    assert sorted(m["to_email"] for m in fake_provider) == sorted(to)
+    # 100 per call -> three provider calls
+    assert len({m["message_id"] for m in fake_provider}) == 3
+
+
+def test_ses_bulk_sends_50_destinations_per_call(monkeypatch):
+    calls = []
+
+    class FakeSes:
+        def send_bulk_email(self, **kwargs):
+            calls.append(kwargs)
+            return {
+                "BulkEmailEntryResults": [
+                    (
+                        {"Status": "SUCCESS", "MessageId": "m"}
+                        if e["Destination"]["ToAddresses"][0] != "bad@example.com"
+                        else {"Status": "FAILED", "Error": "rejected"}
+                    )
+                    for e in kwargs["BulkEmailEntries"]
+                ]
+            }
+
+    monkeypatch.setenv("EMAIL_PROVIDER", "ses")
+    monkeypatch.setenv("EMAIL_RATE_SES", "0")
+    monkeypatch.setattr(email_dispatcher, "_buckets", {})
+    monkeypatch.setattr(email_sender, "_clients", {})
+    monkeypatch.setitem(
+        sys.modules, "boto3", types.SimpleNamespace(client=lambda *a, **kw: FakeSes())
+    )
+    to = [f"d{n}@example.com" for n in range(119)] + ["bad@example.com"]
+    result = email_sender.send_bulk_email(
+        to_emails=to, subject="Hi", body_text="Body", body_html="<p>Body</p>"
+    )
+
+    assert [len(c["BulkEmailEntries"]) for c in calls] == [50, 50, 20]
+    assert calls[0]["DefaultContent"]["Template"]["TemplateContent"] == {
+        "Subject": "Hi",
+        "Text": "Body",
+        "Html": "<p>Body</p>",
+    }
+    assert len(result["sent"]) == 119
+    assert result["failed"] == {"bad@example.com": "rejected"}
+
+
+class FakeSends:
+    """In-memory campaign_update_sends."""
+
+    def __init__(self):
+        self.rows = {}
+        self.now = 0.0
+
+    def create(self, update_id, idx, after, last, recipients):
+        return self.rows.setdefault(
+            idx,
+            {
+                "chunk_index": idx,
+                "after_email": after,
+                "last_email": last,
+                "recipients": recipients,
+                "status": "queued",
+                "last_sent_email": None,
+                "sent_count": 0,
+                "failed_count": 0,
+                "updated_at": self.now,
+            },
+        )
+
+    def claim(self, update_id, idx, stale):
+        row = self.rows.get(idx)
+        if not row or not (
+            row["status"] == "queued"
+            or (row["status"] == "sending" and row["updated_at"] < self.now - stale)
+        ):
+            return None
+        row["status"] = "sending"
+        row["updated_at"] = self.now
+        return dict(row)
+
+    def checkpoint(
+        self,
+        update_id,
+        idx,
+        *,
+        status=None,
+        last_sent_email=None,
+        sent=0,
+        failed=0,
+        last_error=None,
+    ):
+        row = self.rows[idx]
+        row["status"] = status or row["status"]
+        row["last_sent_email"] = last_sent_email or row["last_sent_email"]
+        row["sent_count"] += sent
+        row["failed_count"] += failed
+        row["updated_at"] = self.now
+
+
+@pytest.fixture
+def fan_out(monkeypatch, fake_provider):
+    store = FakeSends()
+    emails = sorted(f"donor{n:03d}@example.com" for n in range(230))
+
+    def donor_emails(campaign_id, after=None, through=None):
+        for e in emails:
+            if (after is None or e > after) and (through is None or e <= through):
+                yield e
+
+    monkeypatch.setattr(svc, "iter_campaign_donor_emails", donor_emails)
+    monkeypatch.setattr(svc, "create_update_send", store.create)
+    monkeypatch.setattr(svc, "claim_update_send", store.claim)
+    monkeypatch.setattr(svc, "checkpoint_update_send", store.checkpoint)
+    monkeypatch.setattr(svc, "get_update_send", lambda u, i: store.rows.get(i))
+    monkeypatch.setattr(
+        svc, "list_update_sends", lambda u: [store.rows[i] for i in sorted(store.rows)]
+    )
+    monkeypatch.setattr(
+        svc, "get_campaign", lambda cid: {"org_id": "org", "title": "Camp"}
+    )
+    monkeypatch.setattr(svc, "get_update", lambda uid: {"title": "News", "body": "B"})
+    monkeypatch.setattr(svc, "get_email_settings", lambda org_id: {})
+    return store, emails
+
+
+def test_update_reaches_every_donor_once_in_chunks(fan_out, fake_provider):
+    store, emails = fan_out
+    dispatched = []
+
+    def dispatch(cid, uid, idx):
+        dispatched.append(idx)
+        svc.send_update_notification_chunk(cid, uid, idx)
+
+    totals = svc.plan_update_notifications("camp", "upd", dispatch, chunk_size=100)
+
+    assert totals == {"chunks": 3, "recipients": 230}
+    assert dispatched == [0, 1, 2]
+    assert sorted(m["to_email"] for m in fake_provider) == emails
+    assert all(r["status"] == "done" for r in store.rows.values())
+    assert fake_provider[0]["subject"] == "New update: News – Camp"
+
+
+def test_failed_chunk_resumes_from_its_checkpoint(monkeypatch, fan_out, fake_provider):
+    store, emails = fan_out
+    real_send = email_sender.send_bulk_email
+    calls = {"n": 0}
+
+    def flaky_send(**kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:  # the provider call after the first 100 fails
+            to, kwargs["to_emails"] = kwargs["to_emails"], kwargs["to_emails"][:100]
+            result = real_send(**kwargs)
+            return dict(result, unsent=to[100:], error="503")
+        return real_send(**kwargs)
+
+    monkeypatch.setattr(svc, "send_bulk_email", flaky_send)
+    svc.plan_update_notifications("camp", "upd", lambda *a: None, chunk_size=230)
+
+    with pytest.raises(svc.ChunkSendError):
+        svc.send_update_notification_chunk("camp", "upd", 0)
+    assert store.rows[0]["status"] == "queued"
+    assert store.rows[0]["last_sent_email"] == emails[99]
+
+    svc.send_update_notification_chunk("camp", "upd", 0)  # the retry
+    assert sorted(m["to_email"] for m in fake_provider) == emails
+    assert store.rows[0]["sent_count"] == 230
+    assert store.rows[0]["status"] == "done"
+
+
+def test_chunk_left_sending_by_a_dead_worker_is_retried(
+    monkeypatch, fan_out, fake_provider
+):
+    store, emails = fan_out
+    real_send = email_sender.send_bulk_email
+
+    def killed(**kwargs):
+        # The first provider call goes out, then the worker dies (job timeout).
+        real_send(**kwargs)
+        raise SystemExit
+
+    monkeypatch.setattr(svc, "send_bulk_email", killed)
+    svc.plan_update_notifications("camp", "upd", lambda *a: None, chunk_size=230)
+    with pytest.raises(SystemExit):
+        svc.send_update_notification_chunk("camp", "upd", 0)
+    assert store.rows[0]["status"] == "sending"
+    monkeypatch.setattr(svc, "send_bulk_email", real_send)
+
+    store.now += 30  # first RQ retry: the claim is not stale yet
+    with pytest.raises(svc.ChunkBusyError):
+        svc.send_update_notification_chunk("camp", "upd", 0)
+
+    store.now += 120  # second retry takes the abandoned chunk over
+    svc.send_update_notification_chunk("camp", "upd", 0)
+    assert store.rows[0]["status"] == "done"
+    assert set(m["to_email"] for m in fake_provider) == set(emails)
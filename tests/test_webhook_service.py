@@ -1,36 +1,29 @@
+import contextlib
 import json
 
 from app.services.webhook_service import process_stripe_event
 
 
 def _patch_common(monkeypatch):
+    side_effects = []
     monkeypatch.setattr(
-        "app.services.webhook_service.mark_event_processed",
-        lambda *_args, **_kwargs: True,
-    )
-    monkeypatch.setattr(
-        "app.services.webhook_service.invalidate_public_campaign_cache",
-        lambda *_args, **_kwargs: None,
-    )
-    monkeypatch.setattr(
-        "app.services.webhook_service.recompute_total_raised",
-        lambda *_args, **_kwargs: {"total_raised": 12.34},
+        "app.services.webhook_service.add_side_effects", side_effects.extend
     )
     monkeypatch.setattr(
-        "app.services.webhook_service.record_platform_fee_if_goal_reached",
-        lambda *_args, **_kwargs: None,
+        "app.services.webhook_service.mark_event_processed",
+        lambda *_args, **_kwargs: True,
     )
     monkeypatch.setattr(
-        "app.services.webhook_service.r",
-        lambda: type("FakeRedis", (), {"delete": lambda *_args, **_kwargs: None})(),
+        "app.services.webhook_service.savepoint",
+        lambda _name: contextlib.nullcontext(),
     )
     monkeypatch.setattr(
-        "app.services.webhook_service.socketio",
-        type("FakeSocket", (), {"emit": lambda *_args, **_kwargs: None})(),
+        "app.services.webhook_service.apply_donation_transition",
+        lambda *_args, **_kwargs: {"total_raised": 12.34, "donations_count": 1},
     )
     monkeypatch.setattr(
-        "app.services.webhook_service.enqueue_receipt_email",
-        lambda *_args, **_kwargs: None,
+        "app.services.webhook_service.get_campaign_totals",
+        lambda *_args, **_kwargs: {"total_raised": 12.34, "donations_count": 1},
     )
     monkeypatch.setattr(
         "app.services.webhook_service.get_campaign",
@@ -46,10 +39,11 @@ def _patch_common(monkeypatch):
         "app.services.webhook_service.update_donation_accounting",
         lambda *_args, **_kwargs: None,
     )
+    return side_effects
 
 
 def test_payment_intent_succeeded_updates_status(monkeypatch):
-    _patch_common(monkeypatch)
+    side_effects = _patch_common(monkeypatch)
     calls = {"status_by_pi": None, "status_by_id": None}
 
     monkeypatch.setattr(
@@ -102,6 +96,13 @@ def test_payment_intent_succeeded_updates_status(monkeypatch):
     assert status_code == 200
     assert body["ok"] is True
     assert "succeeded" in {calls["status_by_pi"], calls["status_by_id"]}
+    assert [kind for kind, _payload in side_effects] == [
+        "receipt_email",
+        "campaign_goal",
+        "campaign_caches",
+        "donation_broadcast",
+    ]
+    assert side_effects[-1][1]["total_raised"] == 12.34
 
 
 def test_charge_refunded_marks_donation_refunded(monkeypatch):